@@ -0,0 +1,125 @@
+"""
+Micro-benchmark de l'extraction des champs (regex uniquement, sans PyMuPDF).
+
+Compare l'ancienne série d'appels safe_search à la table précompilée d'extracteur/champs.py
+et vérifie que les deux donnent les mêmes valeurs.
+
+    python benchmarks/bench_champs.py                  # texte d'exemple intégré
+    python benchmarks/bench_champs.py dossier_pdf/     # textes extraits de vrais rapports
+"""
+import os
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from extracteur.champs import extraire_champs
+
+PAGE1_EXEMPLE = """Rapport de contrôle
+Référence du rapport GP-2024-000123
+Opération BAR-TH-171 Pompe à chaleur air/eau
+"""
+
+PAGE2_EXEMPLE = """Adresse des travaux 12 rue des Lilas
+75000 Paris
+Nom du bénéficiaire Jean Dupont
+Raison sociale du professionnel ACME SARL
+Bénéficiaire joint OUI
+Numéro de téléphone erroné NON
+Contrôle réalisé OUI
+Date du contrôle 12/03/2024
+Système de régulation pièce par pièce installé OUI
+Réception de la température de consigne NON
+Si la réception n'est pas assurée émetteurs hors service
+Absence de non-qualité manifeste détectée par le bénéficiaire OUI
+Commentaire non-qualité relevée RAS
+Conclusion du contrôle SATISFAISANT
+"""
+
+
+def safe_search(pattern, text, group_index=1, default_value=""):
+    """Ancienne implémentation, conservée ici comme référence."""
+    match = re.search(pattern, text, re.IGNORECASE | re.DOTALL)
+    if match and len(match.groups()) >= group_index:
+        return match.group(group_index).strip().replace('\n', ' ')
+    return default_value
+
+
+def extraire_champs_historique(text_page1, text_page2):
+    """Série d'appels safe_search telle qu'elle existait dans extraire_donnees_pdf."""
+    data = {}
+    data["Reference Rapport"] = safe_search(r"Référence du rapport\s+(.*?)(?:\n|$)", text_page1)
+    data["FOS"] = safe_search(r"BAR-TH-\d+", text_page1 + text_page2)
+    data["Adresse Travaux"] = safe_search(r"Adresse des travaux\s+(.*?)\nNom du bénéficiaire", text_page2)
+    if not data["Adresse Travaux"]:
+        data["Adresse Travaux"] = safe_search(r"Adresse des travaux\s+(.*?)(?:\n\s*\n|\n[A-Z])", text_page2)
+    data["Nom Beneficiaire"] = safe_search(r"Nom du bénéficiaire\s+(.*?)(?:\n|$)", text_page2)
+    data["Raison Sociale Professionnel"] = safe_search(r"Raison sociale du professionnel\s+(.*?)(?:\n|$)", text_page2)
+    data["Beneficiaire Joint"] = safe_search(r"Bénéficiaire joint\s+(OUI|NON)", text_page2)
+    data["Telephone Errone"] = safe_search(r"Numéro de téléphone erroné\s+(OUI|NON)", text_page2)
+    data["Controle Realise"] = safe_search(r"Contrôle réalisé\s+(OUI|NON)", text_page2)
+    data["Date Controle"] = safe_search(r"Date du contrôle\s+([\d/]+)", text_page2)
+    data["Systeme Regulation Installe"] = safe_search(r"pièce par pièce installé\s+(OUI|NON)", text_page2)
+    data["Reception Consignes Emetteurs"] = safe_search(r"température de consigne\s+(OUI|NON)", text_page2)
+    data["Commentaire Non Reception"] = safe_search(r"n'est pas assurée\s+([^\n]*)", text_page2)
+    data["Absence Non Qualite Manifeste"] = safe_search(r"détectée par le bénéficiaire\s+(OUI|NON)", text_page2)
+    data["Commentaire Non Qualite Relevee"] = safe_search(r"non-qualité relevée\s+([^\n]*)", text_page2)
+    if "SATISFAISANT" in text_page2:
+        data["Conclusion Controle"] = "SATISFAISANT"
+    elif "NON SATISFAISANT" in text_page2:
+        data["Conclusion Controle"] = "NON SATISFAISANT"
+    else:
+        data["Conclusion Controle"] = safe_search(r"Conclusion du contrôle\s+([^\n]*)", text_page2)
+    return data
+
+
+def charger_textes(dossier):
+    """Textes (page 1, page 2) des PDF d'un dossier, comme dans extraire_donnees_pdf."""
+    import fitz  # PyMuPDF, uniquement si on benchmarke de vrais rapports
+
+    textes = []
+    for nom in sorted(os.listdir(dossier)):
+        if not nom.lower().endswith(".pdf"):
+            continue
+        with fitz.open(os.path.join(dossier, nom)) as doc:
+            text_page1 = doc.load_page(0).get_text("text") if len(doc) > 0 else ""
+            text_page2 = doc.load_page(1).get_text("text") if len(doc) > 1 else text_page1
+        textes.append((text_page1, text_page2))
+    return textes
+
+
+def mesurer(fonction, textes, repetitions):
+    """Temps moyen par document, en microsecondes."""
+    duree = timeit.timeit(lambda: [fonction(p1, p2) for p1, p2 in textes], number=repetitions)
+    return duree / (repetitions * len(textes)) * 1e6
+
+
+def main():
+    if len(sys.argv) > 1:
+        textes = charger_textes(sys.argv[1])
+    else:
+        page_unique = PAGE1_EXEMPLE + PAGE2_EXEMPLE
+        # Le second cas simule un document d'une seule page (text_page2 est text_page1)
+        textes = [(PAGE1_EXEMPLE, PAGE2_EXEMPLE), (page_unique, page_unique)]
+    if not textes:
+        print("Aucun PDF trouvé.")
+        return
+
+    for text_page1, text_page2 in textes:
+        attendu = extraire_champs_historique(text_page1, text_page2)
+        obtenu = extraire_champs(text_page1, text_page2)
+        if attendu != obtenu:
+            differences = {k: (attendu[k], obtenu.get(k)) for k in attendu if attendu[k] != obtenu.get(k)}
+            raise SystemExit(f"Valeurs différentes : {differences}")
+
+    repetitions = max(1, 20000 // len(textes))
+    avant = mesurer(extraire_champs_historique, textes, repetitions)
+    apres = mesurer(extraire_champs, textes, repetitions)
+    print(f"{len(textes)} document(s), valeurs identiques")
+    print(f"safe_search (historique) : {avant:8.1f} µs/document")
+    print(f"table précompilée        : {apres:8.1f} µs/document  (x{avant / apres:.1f})")
+
+
+if __name__ == "__main__":
+    main()
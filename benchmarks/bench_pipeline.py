@@ -0,0 +1,177 @@
+"""
+Benchmark du pipeline complet (lecture du ZIP, extraction, renommage, archive, récapitulatif Excel)
+sur des corpus synthétiques de plusieurs tailles.
+
+Chaque taille est mesurée dans un sous-processus neuf, pour que le pic de mémoire (RSS) lui soit propre.
+Les résultats sont écrits en JSON et peuvent être comparés à un run précédent :
+
+    python benchmarks/bench_pipeline.py --tailles 100 1000 10000 -j 8 --sortie bench_avant.json
+    python benchmarks/bench_pipeline.py --tailles 100 1000 10000 -j 8 --comparer bench_avant.json
+
+Les latences par document (p50/p99) sont le temps de traitement de chaque PDF (lecture, empreinte, analyse,
+renommage et copie), relevé par MesuresPerformance : en parallèle, l'attente d'un worker libre n'y est pas
+comptée.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import zipfile
+
+RACINE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RACINE)
+
+from benchmarks.corpus import corpus_en_cache
+from extracteur.performance import pic_rss_mo
+
+FORMAT_RESULTATS = 2 # 2 : latences = temps de traitement par PDF (1 : intervalle entre deux résultats)
+TAILLES_PAR_DEFAUT = [100, 1000, 10000]
+DOSSIER_CORPUS_PAR_DEFAUT = os.path.join(os.path.expanduser("~"), ".cache", "extracteur_pdf", "bench_corpus")
+
+
+def taille_dossier(dossier):
+    total = 0
+    for root, _, files in os.walk(dossier):
+        for nom in files:
+            total += os.path.getsize(os.path.join(root, nom))
+    return total
+
+
+def percentile(valeurs, p):
+    if not valeurs:
+        return None
+    if len(valeurs) == 1:
+        return valeurs[0]
+    return statistics.quantiles(valeurs, n=100, method="inclusive")[p - 1]
+
+
+def mesurer_une_taille(chemin_corpus, workers):
+    """Exécute le pipeline sur un corpus (dans ce processus) et retourne les mesures."""
+    from extracteur.archive import ArchiveSortie
+    from extracteur.export import RecapitulatifExcel
+    from extracteur.ingestion import lister_pdf_zip
+    from extracteur.performance import MesuresPerformance
+    from extracteur.traitement import BilanTraitement, iterer_traitements
+
+    dossier_temp = tempfile.mkdtemp(prefix="bench_extracteur_")
+    try:
+        debut = time.perf_counter()
+        with zipfile.ZipFile(chemin_corpus) as archive:
+            sources = lister_pdf_zip(archive)
+            sortie = ArchiveSortie(os.path.join(dossier_temp, "resultats.zip"))
+            recapitulatif = RecapitulatifExcel(os.path.join(dossier_temp, "recapitulatif.xlsx"))
+            bilan = BilanTraitement(len(sources), recapitulatif)
+            mesures = MesuresPerformance()
+            for resultat in iterer_traitements(sources, sortie, workers, None, None, lambda niveau, message: None,
+                                               mesures):
+                bilan.enregistrer(*resultat)
+        sortie.ajouter_fichier(recapitulatif.fermer())
+        sortie.fermer()
+        duree = time.perf_counter() - debut
+        latences = [sum(temps.values()) for _, temps in mesures.par_fichier]
+
+        statuts = bilan.stats()
+        return {
+            "documents": len(sources),
+            "duree_s": round(duree, 3),
+            "docs_par_s": round(len(sources) / duree, 1) if duree else None,
+            "latence_p50_ms": round(percentile(latences, 50) * 1000, 3) if latences else None,
+            "latence_p99_ms": round(percentile(latences, 99) * 1000, 3) if latences else None,
+            "rss_max_mo": pic_rss_mo(),
+            "disque_temp_octets": taille_dossier(dossier_temp),
+            "renommes": statuts["succeeded_rename"],
+            "extractions": statuts["succeeded_extraction"],
+            "echecs": statuts["failed"],
+        }
+    finally:
+        shutil.rmtree(dossier_temp, ignore_errors=True)
+
+
+def mesurer_dans_sous_processus(chemin_corpus, workers):
+    commande = [sys.executable, os.path.abspath(__file__), "--une-taille", chemin_corpus, "-j", str(workers)]
+    sortie = subprocess.run(commande, check=True, capture_output=True, text=True, cwd=RACINE).stdout
+    return json.loads(sortie.strip().splitlines()[-1])
+
+
+def version_code():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=RACINE, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def afficher(resultats):
+    print(f"{'taille':>8} {'docs/s':>9} {'p50 ms':>9} {'p99 ms':>9} {'RSS Mo':>8} {'disque Mo':>10} {'échecs':>7}")
+    for r in resultats:
+        rss = f"{r['rss_max_mo']:.1f}" if r['rss_max_mo'] is not None else "-"
+        print(f"{r['taille']:>8} {r['docs_par_s']:>9.1f} {r['latence_p50_ms']:>9.2f} {r['latence_p99_ms']:>9.2f} "
+              f"{rss:>8} {r['disque_temp_octets'] / 1e6:>10.1f} {r['echecs']:>7}")
+
+
+def comparer(resultats, chemin_precedent):
+    """Affiche l'écart relatif avec un fichier de résultats précédent, taille par taille."""
+    with open(chemin_precedent, encoding="utf-8") as f:
+        document = json.load(f)
+    precedent = {r["taille"]: r for r in document["resultats"]}
+    cles = ["docs_par_s", "latence_p50_ms", "latence_p99_ms", "rss_max_mo", "disque_temp_octets"]
+    if document.get("format", 1) < 2: # Latences mesurées autrement : non comparables
+        cles = [cle for cle in cles if not cle.startswith("latence_")]
+    print(f"\nComparaison avec {chemin_precedent} (positif = mieux pour docs/s, moins bien pour le reste)")
+    for r in resultats:
+        ancien = precedent.get(r["taille"])
+        if not ancien:
+            continue
+        ecarts = []
+        for cle in cles:
+            if ancien.get(cle) and r.get(cle) is not None:
+                ecarts.append(f"{cle} {100 * (r[cle] - ancien[cle]) / ancien[cle]:+.1f}%")
+        print(f"{r['taille']:>8} : " + ", ".join(ecarts))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tailles", type=int, nargs="+", default=TAILLES_PAR_DEFAUT,
+                        help="Tailles de corpus à mesurer (ex. 100 1000 10000 50000).")
+    parser.add_argument("-j", "--workers", type=int, default=1, help="Processus d'extraction (défaut : 1).")
+    parser.add_argument("--dossier-corpus", default=DOSSIER_CORPUS_PAR_DEFAUT,
+                        help="Où générer et réutiliser les corpus synthétiques.")
+    parser.add_argument("--sortie", help="Fichier JSON où écrire les résultats.")
+    parser.add_argument("--comparer", help="Fichier JSON d'un run précédent à comparer.")
+    parser.add_argument("--une-taille", help=argparse.SUPPRESS) # Usage interne : mesure dans un sous-processus
+    args = parser.parse_args()
+
+    if args.une_taille:
+        print(json.dumps(mesurer_une_taille(args.une_taille, args.workers)))
+        return
+
+    resultats = []
+    for taille in args.tailles:
+        print(f"Corpus de {taille} rapports...", file=sys.stderr)
+        chemin_corpus = corpus_en_cache(taille, args.dossier_corpus)
+        resultats.append({"taille": taille, **mesurer_dans_sous_processus(chemin_corpus, args.workers)})
+
+    document = {
+        "format": FORMAT_RESULTATS,
+        "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": version_code(),
+        "machine": {"plateforme": platform.platform(), "python": platform.python_version(), "cpu": os.cpu_count()},
+        "parametres": {"workers": args.workers},
+        "resultats": resultats,
+    }
+    afficher(resultats)
+    if args.sortie:
+        with open(args.sortie, "w", encoding="utf-8") as f:
+            json.dump(document, f, indent=2, ensure_ascii=False)
+    if args.comparer:
+        comparer(resultats, args.comparer)
+
+
+if __name__ == "__main__":
+    main()
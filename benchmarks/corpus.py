@@ -0,0 +1,109 @@
+"""
+Génération d'un corpus synthétique de rapports PDF (mise en page actuelle) pour les benchmarks.
+
+Les PDF sont écrits directement dans une archive ZIP, comme un lot uploadé :
+- page 1 : "Référence du rapport" et code FOS (BAR-TH-xxx) ;
+- page 2 : adresse, bénéficiaire, champs OUI/NON, date, commentaires, conclusion ;
+- une part de références en double (réinspections) et de rapports d'une seule page ;
+- quelques rapports sans référence (échec de renommage attendu).
+
+    python benchmarks/corpus.py 1000 corpus_1000.zip
+"""
+import os
+import random
+import sys
+import zipfile
+
+import fitz  # PyMuPDF
+
+PART_DOUBLONS = 0.05 # Références réutilisées
+PART_UNE_PAGE = 0.10 # Rapports tenant sur une seule page
+PART_SANS_REFERENCE = 0.01
+
+CODES_FOS = ["BAR-TH-104", "BAR-TH-106", "BAR-TH-112", "BAR-TH-113", "BAR-TH-143", "BAR-TH-159", "BAR-TH-171"]
+RUES = ["rue des Lilas", "avenue Jean Jaurès", "chemin des Vignes", "boulevard Victor Hugo", "place de la Mairie"]
+VILLES = ["75011 Paris", "69003 Lyon", "31000 Toulouse", "44000 Nantes", "59000 Lille"]
+NOMS = ["Jean Dupont", "Marie Martin", "Ahmed Benali", "Sophie Leroy", "Luc Moreau", "Claire Petit"]
+SOCIETES = ["ACME ÉNERGIE SARL", "THERMO CONFORT SAS", "ECO HABITAT", "CHAUFFAGE DU SUD"]
+COMMENTAIRES = ["RAS", "Émetteurs non raccordés", "Robinet thermostatique absent", "Calorifugeage incomplet", ""]
+
+
+def _oui_non(rng):
+    return rng.choice(["OUI", "OUI", "OUI", "NON"])
+
+
+def textes_rapport(rng, reference):
+    """Textes (page 1, page 2) d'un rapport, avec les libellés attendus par la table des champs."""
+    lignes_page1 = [
+        "RAPPORT DE CONTRÔLE SUR SITE",
+        f"Référence du rapport {reference}" if reference else "Référence du rapport",
+        f"Fiche d'opération standardisée {rng.choice(CODES_FOS)}",
+        f"Organisme d'inspection : Bureau de contrôle n°{rng.randint(1, 40)}",
+    ]
+    conclusion = rng.choice(["SATISFAISANT", "SATISFAISANT", "NON SATISFAISANT"])
+    lignes_page2 = [
+        f"Adresse des travaux {rng.randint(1, 200)} {rng.choice(RUES)}",
+        rng.choice(VILLES),
+        f"Nom du bénéficiaire {rng.choice(NOMS)}",
+        f"Raison sociale du professionnel {rng.choice(SOCIETES)}",
+        f"Bénéficiaire joint {_oui_non(rng)}",
+        f"Numéro de téléphone erroné {rng.choice(['OUI', 'NON', 'NON', 'NON'])}",
+        f"Contrôle réalisé {_oui_non(rng)}",
+        f"Date du contrôle {rng.randint(1, 28):02d}/{rng.randint(1, 12):02d}/{rng.randint(2022, 2025)}",
+        f"Système de régulation pièce par pièce installé {_oui_non(rng)}",
+        f"Réception par les émetteurs de la température de consigne {_oui_non(rng)}",
+        f"Si la réception n'est pas assurée {rng.choice(COMMENTAIRES)}",
+        f"Absence de non-qualité manifeste détectée par le bénéficiaire {_oui_non(rng)}",
+        f"Commentaire sur la non-qualité relevée {rng.choice(COMMENTAIRES)}",
+        f"Conclusion du contrôle {conclusion}",
+    ]
+    return "\n".join(lignes_page1) + "\n", "\n".join(lignes_page2) + "\n"
+
+
+def generer_pdf(rng, reference, une_page):
+    """Octets d'un rapport PDF synthétique."""
+    texte_page1, texte_page2 = textes_rapport(rng, reference)
+    pages = [texte_page1 + texte_page2] if une_page else [texte_page1, texte_page2]
+    doc = fitz.open()
+    try:
+        for texte in pages:
+            page = doc.new_page()
+            page.insert_text((50, 72), texte, fontsize=10)
+        return doc.tobytes(garbage=1, deflate=True)
+    finally:
+        doc.close()
+
+
+def generer_corpus(nombre, chemin_zip, graine=42):
+    """Écrit nombre rapports synthétiques dans chemin_zip (répartis dans des sous-dossiers)."""
+    rng = random.Random(graine)
+    references = []
+    with zipfile.ZipFile(chemin_zip, 'w', zipfile.ZIP_STORED) as zipf:
+        for i in range(nombre):
+            if references and rng.random() < PART_DOUBLONS:
+                reference = rng.choice(references)
+            elif rng.random() < PART_SANS_REFERENCE:
+                reference = ""
+            else:
+                reference = f"GP-{2020 + i % 6}-{i:06d}"
+                references.append(reference)
+            contenu = generer_pdf(rng, reference, une_page=rng.random() < PART_UNE_PAGE)
+            zipf.writestr(f"lot_{i // 1000:03d}/scan_{i:06d}.pdf", contenu)
+    return chemin_zip
+
+
+def corpus_en_cache(nombre, dossier, graine=42):
+    """Chemin d'un corpus de cette taille, généré seulement s'il n'existe pas déjà dans dossier."""
+    os.makedirs(dossier, exist_ok=True)
+    chemin = os.path.join(dossier, f"corpus_{nombre}_graine{graine}.zip")
+    if not os.path.exists(chemin):
+        temporaire = chemin + ".partiel"
+        generer_corpus(nombre, temporaire, graine)
+        os.replace(temporaire, chemin)
+    return chemin
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        raise SystemExit("Usage : python benchmarks/corpus.py NOMBRE chemin_sortie.zip")
+    generer_corpus(int(sys.argv[1]), sys.argv[2])
@@ -0,0 +1,65 @@
+"""
+Cœur de l'extracteur de rapports PDF (sans dépendance à Streamlit).
+
+Utilisable depuis un script ou une tâche planifiée :
+
+    from extracteur import ArchiveSortie, BilanTraitement, iterer_traitements, lister_pdf_dossier
+
+Ligne de commande : python -m extracteur --help (ou extracteur.main(argv))
+
+Le lot complet (traiter_lot), le fichier maître, la surveillance de dossier, le magasin de textes, les travaux
+en arrière-plan et la ligne de commande ne sont importés qu'à leur premier accès (__getattr__).
+"""
+import importlib
+
+from extracteur.extraction import VERSION_EXTRACTEUR, extraire_donnees_pdf, extraire_donnees_textes
+from extracteur.archive import ArchiveSortie, DossierSortie
+from extracteur.cache import CacheExtraction, chemin_cache_par_defaut
+from extracteur.doublons import DetecteurDoublons, separer_doublons
+from extracteur.export import COLONNES_ORDRE, RecapitulatifEnFlux, ecrire_recapitulatif, ouvrir_recapitulatif
+from extracteur.ingestion import SourcePDF, lister_pdf_dossier, lister_pdf_zip
+from extracteur.isolation import LimitesDocument, PoolIsole
+from extracteur.modeles import choisir_modele, enregistrer_modele, noms_modeles
+from extracteur.reprise import ManifesteTravail, reprendre_traitements
+from extracteur.traitement import BilanTraitement, iterer_traitements, renommer_et_copier, traiter_pdf_et_extraire
+
+# Nom public -> module qui le définit, importé au premier accès
+_IMPORTS_DIFFERES = {
+    "traiter_lot": "extracteur.lot",
+    "lire_maitre_parquet": "extracteur.maitre",
+    "ouvrir_maitre": "extracteur.maitre",
+    "Surveillance": "extracteur.surveillance",
+    "MagasinTextes": "extracteur.textes",
+    "chemin_textes_par_defaut": "extracteur.textes",
+    "reextraire_depuis_textes": "extracteur.textes",
+    "FileTravauxPleine": "extracteur.travaux",
+    "GestionnaireTravaux": "extracteur.travaux",
+    "main": "extracteur.cli",
+}
+
+__all__ = [
+    "VERSION_EXTRACTEUR", "extraire_donnees_pdf", "extraire_donnees_textes",
+    "ArchiveSortie", "DossierSortie",
+    "CacheExtraction", "chemin_cache_par_defaut",
+    "DetecteurDoublons", "separer_doublons",
+    "COLONNES_ORDRE", "RecapitulatifEnFlux", "ecrire_recapitulatif", "ouvrir_recapitulatif",
+    "SourcePDF", "lister_pdf_dossier", "lister_pdf_zip",
+    "LimitesDocument", "PoolIsole",
+    "choisir_modele", "enregistrer_modele", "noms_modeles",
+    "ManifesteTravail", "reprendre_traitements",
+    "BilanTraitement", "iterer_traitements", "renommer_et_copier", "traiter_pdf_et_extraire",
+    *_IMPORTS_DIFFERES,
+]
+
+
+def __getattr__(nom):
+    module = _IMPORTS_DIFFERES.get(nom)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {nom!r}")
+    valeur = getattr(importlib.import_module(module), nom)
+    globals()[nom] = valeur # Accès suivants sans passer par __getattr__
+    return valeur
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_IMPORTS_DIFFERES))
@@ -0,0 +1,128 @@
+import os
+import shutil
+import threading
+import time
+import zipfile
+
+
+class _SortieNommee:
+    """Noms des PDF renommés déjà écrits dans une sortie (archive ZIP ou dossier) et attribution du premier libre."""
+
+    def __init__(self, noms=()):
+        self.nb_pdf = 0
+        self._noms = set(noms)
+        self._suffixes = {} # base de nom -> dernier suffixe '_N' attribué (nom_libre)
+        self.verrou = threading.RLock()
+
+    def contient(self, nom):
+        """Vrai si un fichier de ce nom est déjà dans la sortie (remplace os.path.exists du dossier de sortie)."""
+        return nom in self._noms
+
+    def nom_libre(self, base, extension=".pdf"):
+        """
+        Premier nom absent de la sortie parmi base.pdf, base_1.pdf, base_2.pdf...
+        Le dernier suffixe attribué est gardé par base : le coût ne dépend pas du nombre de doublons déjà
+        présents, et il n'y a pas de limite au nombre de doublons. Le nom n'est pas réservé tant qu'il
+        n'est pas ajouté (un ajout en échec le laisse au fichier suivant, comme avant).
+        """
+        with self.verrou:
+            suffixe = self._suffixes.get(base, 0)
+            nom = f"{base}{extension}" if suffixe == 0 else f"{base}_{suffixe}{extension}"
+            while nom in self._noms: # Déjà pris : au plus une fois par nom ajouté depuis le dernier appel
+                suffixe += 1
+                nom = f"{base}_{suffixe}{extension}"
+            self._suffixes[base] = suffixe
+            return nom
+
+
+class ArchiveSortie(_SortieNommee):
+    """
+    Archive ZIP des résultats, alimentée au fil du traitement.
+    Les PDF (déjà compressés) sont stockés tels quels (ZIP_STORED), les autres fichiers (Excel) compressés.
+    Les ajouts sont protégés par verrou : nom_libre() puis ajouter_pdf() sous `with archive.verrou`
+    restent cohérents si plusieurs threads alimentent la même archive.
+    """
+
+    def __init__(self, chemin_zip):
+        super().__init__()
+        self.chemin_zip = chemin_zip
+        self._zipf = zipfile.ZipFile(chemin_zip, 'w', zipfile.ZIP_DEFLATED)
+
+    def ajouter_pdf(self, nom, pdf_path=None, contenu=None):
+        """Ajoute un PDF renommé à la racine de l'archive, depuis les octets fournis ou le fichier pdf_path."""
+        with self.verrou:
+            if contenu is not None:
+                info = zipfile.ZipInfo(nom, date_time=time.localtime()[:6])
+                info.compress_type = zipfile.ZIP_STORED
+                self._zipf.writestr(info, contenu)
+            else:
+                self._zipf.write(pdf_path, arcname=nom, compress_type=zipfile.ZIP_STORED)
+            self._noms.add(nom)
+            self.nb_pdf += 1
+
+    def ajouter_fichier(self, chemin, nom=None):
+        """Ajoute un fichier annexe (ex. Excel récapitulatif), compressé."""
+        nom = nom or os.path.basename(chemin)
+        with self.verrou:
+            self._zipf.write(chemin, arcname=nom, compress_type=zipfile.ZIP_DEFLATED)
+            self._noms.add(nom)
+
+    def est_vide(self):
+        return not self._noms
+
+    def fermer(self):
+        """Ferme l'archive. Retourne son chemin, ou None (et la supprime) si elle est vide."""
+        self._zipf.close()
+        if self.est_vide():
+            if os.path.exists(self.chemin_zip): os.remove(self.chemin_zip)
+            return None
+        return self.chemin_zip
+
+    def abandonner(self):
+        """Ferme et supprime l'archive après une erreur."""
+        try: self._zipf.close()
+        except Exception: pass
+        if os.path.exists(self.chemin_zip):
+            try: os.remove(self.chemin_zip)
+            except OSError: pass
+
+
+class DossierSortie(_SortieNommee):
+    """
+    Dossier des PDF renommés, alimenté au fil de l'eau (mode surveillance) : même interface qu'ArchiveSortie
+    pour renommer_et_copier. Les fichiers déjà présents comptent pour nom_libre (reprise après redémarrage).
+    Chaque PDF est écrit sous un nom temporaire puis renommé : le dossier ne contient jamais de PDF partiel.
+    """
+
+    def __init__(self, dossier):
+        os.makedirs(dossier, exist_ok=True)
+        super().__init__(os.listdir(dossier))
+        self.dossier = dossier
+
+    def ajouter_pdf(self, nom, pdf_path=None, contenu=None):
+        """Écrit un PDF renommé dans le dossier, depuis les octets fournis ou le fichier pdf_path."""
+        with self.verrou:
+            chemin = os.path.join(self.dossier, nom)
+            chemin_temp = os.path.join(self.dossier, f".{nom}.part")
+            try:
+                if contenu is not None:
+                    with open(chemin_temp, "wb") as f:
+                        f.write(contenu)
+                else:
+                    shutil.copyfile(pdf_path, chemin_temp)
+                os.replace(chemin_temp, chemin)
+            except BaseException:
+                try: os.remove(chemin_temp)
+                except OSError: pass
+                raise
+            self._noms.add(nom)
+            self.nb_pdf += 1
+
+    def retirer_pdf(self, nom):
+        """Supprime un PDF écrit par un lot annulé : son nom redevient libre. Sans effet s'il n'existe pas."""
+        with self.verrou:
+            try: os.remove(os.path.join(self.dossier, nom))
+            except FileNotFoundError: pass
+            if nom in self._noms:
+                self._noms.discard(nom)
+                self._suffixes.clear() # nom_libre repart du nom sans suffixe : le nom libéré est redonné
@@ -0,0 +1,178 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from extracteur.extraction import extraire_donnees_pdf, signaler_log, version_extraction
+from extracteur.modeles import CLE_DUREE_ANALYSE
+from extracteur.performance import noter
+
+TAILLE_BLOC_HASH = 1024 * 1024 # Lecture par blocs de 1 Mo pour ne pas charger le PDF en mémoire
+
+
+def chemin_cache_par_defaut():
+    """Emplacement du cache : $EXTRACTEUR_CACHE_DIR ou ~/.cache/extracteur_pdf."""
+    dossier = os.environ.get("EXTRACTEUR_CACHE_DIR") or os.path.join(os.path.expanduser("~"), ".cache", "extracteur_pdf")
+    return os.path.join(dossier, "extractions.sqlite")
+
+
+def hash_fichier(chemin):
+    """SHA-256 du contenu d'un fichier, lu par blocs."""
+    sha = hashlib.sha256()
+    with open(chemin, "rb") as f:
+        for bloc in iter(lambda: f.read(TAILLE_BLOC_HASH), b""):
+            sha.update(bloc)
+    return sha.hexdigest()
+
+
+class CacheExtraction:
+    """
+    Cache disque (SQLite) des dictionnaires retournés par extraire_donnees_pdf.
+    Clé : SHA-256 du PDF + version_extraction() (VERSION_EXTRACTEUR et registre des modèles).
+    Taille bornée, éviction des entrées les moins récemment lues.
+    La durée d'analyse (CLE_DUREE_ANALYSE) n'est pas gardée : elle ne vaut que pour le traitement qui l'a mesurée.
+    """
+
+    def __init__(self, chemin, taille_max_octets):
+        os.makedirs(os.path.dirname(chemin) or ".", exist_ok=True)
+        self.taille_max_octets = taille_max_octets
+        self.hits = 0
+        self.misses = 0
+        # Utilisé depuis l'étage d'extraction, un autre thread que celui qui l'a ouvert : accès protégés par verrou
+        self._verrou = threading.Lock()
+        self._conn = sqlite3.connect(chemin, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS extractions ("
+            " cle TEXT PRIMARY KEY, donnees TEXT NOT NULL, taille INTEGER NOT NULL, dernier_acces REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_extractions_acces ON extractions (dernier_acces)")
+        self._conn.commit()
+        self._taille_totale = self._calculer_taille_totale()
+
+    @staticmethod
+    def _cle(empreinte):
+        return f"{empreinte}:{version_extraction()}"
+
+    def lire(self, empreinte):
+        """Retourne les données en cache pour ce contenu, ou None."""
+        cle = self._cle(empreinte)
+        with self._verrou:
+            ligne = self._conn.execute("SELECT donnees FROM extractions WHERE cle = ?", (cle,)).fetchone()
+            if ligne is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._conn.execute("UPDATE extractions SET dernier_acces = ? WHERE cle = ?", (time.time(), cle))
+            self._conn.commit()
+        donnees = json.loads(ligne[0])
+        donnees.pop(CLE_DUREE_ANALYSE, None) # Entrée écrite par une version qui la gardait
+        return donnees
+
+    def compter_absent(self):
+        """Compte un PDF ré-analysé sans consulter le cache (comme une absence)."""
+        with self._verrou:
+            self.misses += 1
+
+    def ecrire(self, empreinte, donnees):
+        """Enregistre les données extraites puis évince si la taille max est dépassée."""
+        cle = self._cle(empreinte)
+        contenu = json.dumps({k: v for k, v in donnees.items() if k != CLE_DUREE_ANALYSE}, ensure_ascii=False)
+        taille = len(contenu.encode("utf-8"))
+        with self._verrou:
+            ancienne = self._conn.execute("SELECT taille FROM extractions WHERE cle = ?", (cle,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO extractions (cle, donnees, taille, dernier_acces) VALUES (?, ?, ?, ?)",
+                (cle, contenu, taille, time.time())
+            )
+            self._taille_totale += taille - (ancienne[0] if ancienne else 0)
+            if self._taille_totale > self.taille_max_octets:
+                self._evincer()
+            self._conn.commit()
+
+    def _calculer_taille_totale(self):
+        return self._conn.execute("SELECT COALESCE(SUM(taille), 0) FROM extractions").fetchone()[0]
+
+    def _evincer(self):
+        # Appelé sous le verrou. Recalcul exact : d'autres sessions peuvent écrire dans le même fichier
+        taille_totale = self._calculer_taille_totale()
+        a_supprimer = []
+        for cle, taille in self._conn.execute("SELECT cle, taille FROM extractions ORDER BY dernier_acces"):
+            if taille_totale <= self.taille_max_octets:
+                break
+            a_supprimer.append((cle,))
+            taille_totale -= taille
+        self._conn.executemany("DELETE FROM extractions WHERE cle = ?", a_supprimer)
+        self._taille_totale = taille_totale
+
+    def fermer(self):
+        with self._verrou:
+            try: self._conn.close()
+            except sqlite3.Error: pass
+
+
+def empreinte_ou_none(pdf_path, contenu=None):
+    """Hash du PDF (fichier ou octets déjà lus), ou None s'il est illisible (l'extraction signalera alors l'erreur)."""
+    if contenu is not None:
+        return hashlib.sha256(contenu).hexdigest()
+    try:
+        return hash_fichier(pdf_path)
+    except OSError:
+        return None
+
+
+def decider_analyse(source, pdf_path, contenu=None, cache=None, textes=None, manifeste=None, doublons=None,
+                    temps=None):
+    """
+    Ce qui dispense d'analyser un PDF déjà lu, vérifié dans cet ordre : doublon d'un PDF déjà vu du lot
+    (doublons : DetecteurDoublons), résultat rejouable depuis le manifeste de reprise, résultat en cache.
+    L'empreinte (SHA-256) n'est calculée qu'une fois, si le dédoublonnage, le cache, le magasin de textes ou le
+    manifeste en a besoin, et elle est rendue pour servir aux étapes suivantes. Un résultat en cache dont le texte manque au
+    magasin de textes est ignoré (PDF ré-analysé), pour que le magasin couvre tous les PDF traités.
+    Retourne: empreinte (ou None), echec ("doublon", "repris" ou None), donnees du cache (None : PDF à analyser)
+    """
+    if temps is not None: debut = time.perf_counter()
+    empreinte = None
+    if cache is not None or textes is not None or manifeste is not None or doublons is not None:
+        empreinte = empreinte_ou_none(pdf_path, contenu)
+        if temps is not None: debut = noter(temps, "cache", debut)
+    if doublons is not None:
+        gardee = doublons.gardee(source, empreinte)
+        if temps is not None: debut = noter(temps, "dedoublonnage", debut)
+        if gardee is not None:
+            return empreinte, "doublon", None
+    if manifeste is not None and empreinte is not None and manifeste.rejouable(source, empreinte):
+        return empreinte, "repris", None
+    donnees = None
+    if cache is not None and empreinte is not None:
+        if textes is None or textes.contient(empreinte):
+            donnees = cache.lire(empreinte)
+        else:
+            cache.compter_absent() # Ré-analysé pour enregistrer son texte dans le magasin
+        if temps is not None: noter(temps, "cache", debut)
+    return empreinte, None, donnees
+
+
+def analyser_et_mettre_en_cache(pdf_path, cache, empreinte, signaler=signaler_log, contenu=None, temps=None,
+                                pages=None):
+    """extraire_donnees_pdf, puis résultat écrit dans le cache sous empreinte (si cache et empreinte)."""
+    donnees = extraire_donnees_pdf(pdf_path, signaler, contenu, temps, pages)
+    # Les erreurs d'extraction ne sont pas mises en cache (elles peuvent être passagères)
+    if cache is not None and donnees is not None and empreinte is not None:
+        if temps is not None: debut = time.perf_counter()
+        cache.ecrire(empreinte, donnees)
+        if temps is not None: noter(temps, "cache", debut)
+    return donnees
+
+
+def extraire_donnees_pdf_cache(pdf_path, cache, signaler=signaler_log, contenu=None, temps=None):
+    """extraire_donnees_pdf, en passant d'abord par le cache s'il est fourni."""
+    if cache is None:
+        return extraire_donnees_pdf(pdf_path, signaler, contenu, temps)
+    empreinte, _, donnees = decider_analyse(pdf_path, pdf_path, contenu, cache, temps=temps)
+    if donnees is not None:
+        return donnees
+    return analyser_et_mettre_en_cache(pdf_path, cache, empreinte, signaler, contenu, temps)
@@ -0,0 +1,176 @@
+import re
+from collections import namedtuple
+
+# --- Table des champs ---
+# Chaque champ déclare la ou les pages à lire et ses variantes (libellé, suite du motif),
+# essayées dans l'ordre jusqu'à obtenir une valeur non vide.
+# La suite du motif est appliquée juste après le libellé ; le groupe 1 donne la valeur.
+# "mots_cles" (optionnel) : mots recherchés tels quels dans la page avant les variantes.
+CHAMPS = [
+    {"colonne": "Reference Rapport", "pages": (1,), "motifs": [
+        ("Référence du rapport", r"\s+(.*?)(?:\n|$)"),
+    ]},
+    {"colonne": "FOS", "pages": (1, 2), "motifs": [ # Recherche FOS sur les deux pages
+        ("BAR-TH-", r"\d+"),
+    ]},
+    {"colonne": "Adresse Travaux", "pages": (2,), "motifs": [
+        ("Adresse des travaux", r"\s+(.*?)\nNom du bénéficiaire"),
+        # Si Nom du bénéficiaire n'est pas juste après : s'arrêter avant un double saut de ligne ou une ligne commençant par une majuscule
+        ("Adresse des travaux", r"\s+(.*?)(?:\n\s*\n|\n[A-Z])"),
+    ]},
+    {"colonne": "Nom Beneficiaire", "pages": (2,), "motifs": [
+        ("Nom du bénéficiaire", r"\s+(.*?)(?:\n|$)"),
+    ]},
+    {"colonne": "Raison Sociale Professionnel", "pages": (2,), "motifs": [
+        ("Raison sociale du professionnel", r"\s+(.*?)(?:\n|$)"),
+    ]},
+    {"colonne": "Beneficiaire Joint", "pages": (2,), "motifs": [
+        ("Bénéficiaire joint", r"\s+(OUI|NON)"),
+    ]},
+    {"colonne": "Telephone Errone", "pages": (2,), "motifs": [
+        ("Numéro de téléphone erroné", r"\s+(OUI|NON)"),
+    ]},
+    {"colonne": "Controle Realise", "pages": (2,), "motifs": [
+        ("Contrôle réalisé", r"\s+(OUI|NON)"),
+    ]},
+    {"colonne": "Date Controle", "pages": (2,), "motifs": [
+        ("Date du contrôle", r"\s+([\d/]+)"),
+    ]},
+    {"colonne": "Systeme Regulation Installe", "pages": (2,), "motifs": [
+        ("pièce par pièce installé", r"\s+(OUI|NON)"),
+    ]},
+    {"colonne": "Reception Consignes Emetteurs", "pages": (2,), "motifs": [
+        ("température de consigne", r"\s+(OUI|NON)"),
+    ]},
+    {"colonne": "Commentaire Non Reception", "pages": (2,), "motifs": [
+        ("n'est pas assurée", r"\s+([^\n]*)"), # Capture la ligne après "assurée"
+    ]},
+    {"colonne": "Absence Non Qualite Manifeste", "pages": (2,), "motifs": [
+        ("détectée par le bénéficiaire", r"\s+(OUI|NON)"),
+    ]},
+    {"colonne": "Commentaire Non Qualite Relevee", "pages": (2,), "motifs": [
+        ("non-qualité relevée", r"\s+([^\n]*)"), # Capture la ligne après "relevée"
+    ]},
+    {"colonne": "Conclusion Controle", "pages": (2,), "mots_cles": ["SATISFAISANT", "NON SATISFAISANT"], "motifs": [
+        ("Conclusion du contrôle", r"\s+([^\n]*)"),
+    ]},
+]
+
+FLAGS = re.IGNORECASE | re.DOTALL
+
+
+# Table de champs compilée : champs = [(colonne, pages, mots_cles, [(libellé, motif compilé)])],
+# libelles = {page: libellés à repérer sur cette page}
+TableCompilee = namedtuple("TableCompilee", ["champs", "libelles"])
+
+
+def _compiler_champs(champs):
+    """Compile une fois les motifs de la table : (colonne, pages, mots_cles, [(libellé, motif compilé)])."""
+    compiles = []
+    for champ in champs:
+        motifs = [(libelle, re.compile(suite, FLAGS)) for libelle, suite in champ["motifs"]]
+        compiles.append((champ["colonne"], champ["pages"], champ.get("mots_cles", []), motifs))
+    return compiles
+
+
+def _libelles_par_page(champs_compiles):
+    libelles = {1: set(), 2: set()}
+    for _, pages, _, motifs in champs_compiles:
+        for page in pages:
+            libelles[page].update(libelle for libelle, _ in motifs)
+    return libelles
+
+
+_LIBELLES_REPLIES = {} # libellé -> libellé replié, pour toutes les tables compilées
+
+
+def compiler_table(champs):
+    """Compile une table de champs (format de CHAMPS) pour extraire_champs."""
+    compiles = _compiler_champs(champs)
+    libelles = _libelles_par_page(compiles)
+    _LIBELLES_REPLIES.update((libelle, libelle.casefold()) for libelle in libelles[1] | libelles[2])
+    return TableCompilee(compiles, libelles)
+
+
+_TABLE_PAR_DEFAUT = compiler_table(CHAMPS)
+
+
+def localiser_libelles(texte, libelles):
+    """
+    Repère toutes les occurrences des libellés dans le texte.
+    Retourne {libellé: [position juste après le libellé, ...]} dans l'ordre du texte.
+    """
+    positions = {}
+    texte_replie = texte.casefold()
+    if len(texte_replie) == len(texte):
+        # Le texte est replié une seule fois, puis str.find (C) remplace un parcours regex par champ
+        for libelle in libelles:
+            libelle_replie = _LIBELLES_REPLIES[libelle]
+            trouvees = []
+            i = texte_replie.find(libelle_replie)
+            while i >= 0:
+                trouvees.append(i + len(libelle_replie))
+                i = texte_replie.find(libelle_replie, i + 1)
+            positions[libelle] = trouvees
+    else:
+        # Caractères dont le repliement change la longueur (ß, ligatures...) : les positions ne
+        # correspondent plus, on repasse par la recherche regex insensible à la casse
+        for libelle in libelles:
+            motif = re.compile(re.escape(libelle), FLAGS)
+            trouvees = []
+            m = motif.search(texte)
+            while m:
+                trouvees.append(m.end())
+                m = motif.search(texte, m.start() + 1)
+            positions[libelle] = trouvees
+    return positions
+
+
+def _valeur_motif(texte, positions, motif):
+    """Équivalent de safe_search(libellé + motif) : première occurrence où le motif s'applique."""
+    for position in positions:
+        match = motif.match(texte, position)
+        if match:
+            if match.re.groups >= 1:
+                return match.group(1).strip().replace('\n', ' ') # Remplace les sauts de ligne par des espaces
+            return ""
+    return None
+
+
+def extraire_champs(text_page1, text_page2, table=None):
+    """
+    Applique une table de champs compilée (CHAMPS par défaut) aux textes des pages 1 et 2
+    (text_page2 peut être text_page1).
+    """
+    table = table or _TABLE_PAR_DEFAUT
+    textes = {1: text_page1, 2: text_page2}
+    if text_page2 is text_page1:
+        # Document d'une seule page : un seul repérage sert aux deux
+        index_unique = localiser_libelles(text_page1, table.libelles[1] | table.libelles[2])
+        index = {1: index_unique, 2: index_unique}
+    else:
+        index = {
+            1: localiser_libelles(text_page1, table.libelles[1]),
+            2: localiser_libelles(text_page2, table.libelles[2]),
+        }
+
+    data = {}
+    for colonne, pages, mots_cles, motifs in table.champs:
+        if text_page2 is text_page1:
+            pages = pages[:1]
+        valeur = ""
+        for mot in mots_cles:
+            if any(mot in textes[page] for page in pages):
+                valeur = mot
+                break
+        if not valeur:
+            for libelle, motif in motifs:
+                for page in pages:
+                    trouvee = _valeur_motif(textes[page], index[page][libelle], motif)
+                    if trouvee is not None:
+                        valeur = trouvee
+                        break
+                if valeur:
+                    break
+        data[colonne] = valeur
+    return data
@@ -0,0 +1,273 @@
+"""
+Traitement en ligne de commande, sans Streamlit.
+
+    python -m extracteur rapports.zip dossier_pdf/ -o resultats/ -f csv -j 8
+    python -m extracteur --surveiller depot_scanners/ -o resultats/ # Mode service
+    python -m extracteur --reextraire -o resultats/ # Récapitulatif refait depuis le texte déjà lu, sans PDF
+"""
+import argparse
+import logging
+import os
+import signal
+import sys
+import threading
+import zipfile
+
+from extracteur.cache import CacheExtraction, chemin_cache_par_defaut
+from extracteur.export import FORMATS_RECAPITULATIF, NOM_RECAPITULATIF
+from extracteur.ingestion import fichier_pdf_a_traiter, lister_pdf_dossier, lister_pdf_zip
+from extracteur.isolation import LimitesDocument
+from extracteur.lot import traiter_lot
+from extracteur.parallele import nombre_workers_par_defaut
+from extracteur.performance import MesuresPerformance, SuiviMemoire
+from extracteur.reprise import ManifesteTravail
+from extracteur.surveillance import STABILITE_PAR_DEFAUT, Surveillance
+from extracteur.textes import MagasinTextes, chemin_textes_par_defaut, reextraire_depuis_textes
+
+NOM_ARCHIVE_SORTIE = "rapports_greenprime_traites.zip"
+
+logger = logging.getLogger("extracteur")
+
+
+def construire_parser():
+    parser = argparse.ArgumentParser(
+        prog="python -m extracteur",
+        description="Extrait les données des rapports PDF, les renomme et génère le récapitulatif."
+    )
+    parser.add_argument("entrees", nargs="*", help="Dossiers, archives ZIP ou fichiers PDF à traiter.")
+    parser.add_argument("-o", "--sortie", default=".", help="Dossier de sortie (défaut : dossier courant).")
+    parser.add_argument("-f", "--format", default="xlsx", choices=FORMATS_RECAPITULATIF,
+                        help="Format du récapitulatif (défaut : xlsx).")
+    parser.add_argument("-j", "--workers", type=int, default=nombre_workers_par_defaut(),
+                        help="Processus d'extraction en parallèle (défaut : nombre de cœurs, 1 = séquentiel).")
+    parser.add_argument("--sans-cache", action="store_true", help="Ne pas utiliser le cache d'extraction.")
+    parser.add_argument("--taille-cache-mo", type=int, default=512, help="Taille max du cache en Mo (défaut : 512).")
+    parser.add_argument("--sans-textes", action="store_true",
+                        help="Ne pas enregistrer le texte des PDF dans le magasin de textes (voir --reextraire).")
+    parser.add_argument("--reextraire", action="store_true",
+                        help="Refait le récapitulatif (et le --maitre) depuis le magasin de textes, sans rouvrir les "
+                             "PDF : une ligne par PDF déjà traité, après correction de la table des champs.")
+    parser.add_argument("--garder-doublons", action="store_true",
+                        help="Traiter aussi les PDF au contenu identique à un autre PDF du lot (ignorés par défaut).")
+    parser.add_argument("--memoire-max-mo", type=int,
+                        help="Budget des PDF lus d'avance, en attente d'analyse ou d'archivage, en Mo (défaut : sans limite).")
+    parser.add_argument("--delai-max", type=float, metavar="SECONDES",
+                        help="Analyse chaque PDF dans un processus isolé, abandonné (statut timeout) après ce délai.")
+    parser.add_argument("--memoire-document-mo", type=int,
+                        help="Analyse chaque PDF dans un processus isolé dont la mémoire est plafonnée (Mo, Linux).")
+    parser.add_argument("--maitre", metavar="CHEMIN",
+                        help="Récapitulatif maître mis à jour par \"Reference Rapport\" (lignes du lot ajoutées ou "
+                             "remplacées) : fichier .xlsx (réécrit sans sa mise en forme), ou dossier Parquet (mise à "
+                             "jour sans relire l'historique).")
+    parser.add_argument("--travail", metavar="DOSSIER",
+                        help="Dossier de reprise : les PDF déjà traités lors d'un lancement interrompu ne sont pas "
+                             "ré-analysés, l'archive et le récapitulatif sont reconstruits.")
+    parser.add_argument("--surveiller", action="store_true",
+                        help="Mode service : surveille les dossiers donnés et traite au fil de l'eau les PDF et ZIP "
+                             "déposés (PDF renommés dans SORTIE/rapports_renommes, lignes ajoutées à "
+                             "SORTIE/recapitulatif_controles_greenprime.jsonl, ou mises à jour dans le --maitre s'il "
+                             "est donné, état dans SORTIE/etat_surveillance.json). Arrêt : Ctrl+C ou SIGTERM.")
+    parser.add_argument("--stabilite", type=float, default=STABILITE_PAR_DEFAUT, metavar="SECONDES",
+                        help="Mode service : délai sans changement avant de traiter un fichier déposé "
+                             f"(défaut : {STABILITE_PAR_DEFAUT:g}).")
+    parser.add_argument("--mesures", action="store_true",
+                        help="Mesure le temps de chaque étape (résumé + feuille 'Performance' du récapitulatif xlsx).")
+    parser.add_argument("-q", "--quiet", action="store_true", help="N'affiche que les erreurs.")
+    return parser
+
+
+def lister_entrees(entrees):
+    """
+    Liste les PDF à traiter à partir des chemins donnés (dossier, ZIP lu en place, ou PDF).
+    Retourne: sources, archives_ouvertes (à fermer après traitement)
+    """
+    sources = []
+    archives = []
+    for entree in entrees:
+        if os.path.isdir(entree):
+            sources.extend(lister_pdf_dossier(entree))
+        elif entree.lower().endswith(".zip"):
+            try:
+                archive = zipfile.ZipFile(entree, 'r')
+            except (OSError, zipfile.BadZipFile) as e:
+                logger.error(f"❌ Erreur lecture '{entree}' : {e}")
+                continue
+            archives.append(archive)
+            sources.extend(lister_pdf_zip(archive))
+        elif os.path.isfile(entree) and fichier_pdf_a_traiter(os.path.basename(entree)):
+            sources.append(entree)
+        else:
+            logger.warning(f"⚠️ Entrée ignorée (ni dossier, ni ZIP, ni PDF) : {entree}")
+    return sources, archives
+
+
+def ouvrir_cache(args):
+    """Cache d'extraction demandé par les options, ou None (désactivé ou indisponible)."""
+    if args.sans_cache:
+        return None
+    try:
+        return CacheExtraction(chemin_cache_par_defaut(), args.taille_cache_mo * 1024 * 1024)
+    except Exception as e:
+        logger.warning(f"⚠️ Cache d'extraction indisponible, traitement sans cache : {e}")
+        return None
+
+
+def ouvrir_textes(args):
+    """Magasin de textes demandé par les options, ou None (désactivé ou indisponible)."""
+    if args.sans_textes:
+        return None
+    try:
+        return MagasinTextes(chemin_textes_par_defaut())
+    except Exception as e:
+        logger.warning(f"⚠️ Magasin de textes indisponible, texte des PDF non enregistré : {e}")
+        return None
+
+
+def limites_document(args):
+    """LimitesDocument demandées par les options (analyse isolée), ou None."""
+    if not (args.delai_max or args.memoire_document_mo):
+        return None
+    return LimitesDocument(args.delai_max or None,
+                           args.memoire_document_mo * 1024 * 1024 if args.memoire_document_mo else None)
+
+
+def surveiller(args):
+    """Mode service (--surveiller) : tourne jusqu'à Ctrl+C ou SIGTERM."""
+    non_dossiers = [entree for entree in args.entrees if not os.path.isdir(entree)]
+    if non_dossiers:
+        logger.error(f"⚠️ --surveiller attend des dossiers : {', '.join(non_dossiers)}")
+        return 2
+    cache = ouvrir_cache(args)
+    textes = ouvrir_textes(args)
+    arret = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: arret.set())
+    try:
+        surveillance = Surveillance(args.entrees, args.sortie, max(1, args.workers), cache, args.maitre,
+                                    limites_document(args), args.stabilite, textes=textes)
+        logger.info(f"👀 Surveillance de {', '.join(surveillance.dossiers)} (Ctrl+C pour arrêter) ; "
+                    f"état : {surveillance.chemin_etat}")
+        try:
+            surveillance.executer(arret)
+        except KeyboardInterrupt:
+            pass
+        logger.info(f"⏹️ Surveillance arrêtée : {surveillance.nb_pdf} PDF traité(s) en {surveillance.nb_lots} lot(s).")
+    finally:
+        if cache is not None:
+            cache.fermer()
+        if textes is not None:
+            textes.fermer()
+    return 0
+
+
+def reextraire(args):
+    """Mode --reextraire : récapitulatif regénéré depuis le magasin de textes (table des champs seule)."""
+    chemin = chemin_textes_par_defaut()
+    if not os.path.exists(chemin):
+        logger.error(f"⚠️ Magasin de textes introuvable : {chemin}")
+        return 2
+    magasin = MagasinTextes(chemin)
+    os.makedirs(args.sortie, exist_ok=True)
+    recapitulatifs = {args.format: os.path.join(args.sortie, f"{NOM_RECAPITULATIF}.{args.format}")}
+    try:
+        logger.info(f"⚙️ Ré-extraction de {len(magasin)} PDF depuis {chemin}...")
+        nb_lignes, ecrits = reextraire_depuis_textes(magasin, recapitulatifs, args.maitre)
+    finally:
+        magasin.fermer()
+    if not nb_lignes:
+        logger.error("⚠️ Aucun texte enregistré : rien à ré-extraire.")
+        return 2
+    logger.info(f"✅ {nb_lignes} ligne(s) ré-extraite(s).")
+    if ecrits.get(args.format):
+        logger.info(f"📊 Récapitulatif : {ecrits[args.format]}")
+    if args.maitre:
+        logger.info(f"📚 Maître mis à jour : {args.maitre}")
+    return 0
+
+
+def main(argv=None):
+    parser = construire_parser()
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.ERROR if args.quiet else logging.INFO, format="%(message)s", stream=sys.stderr)
+    if args.reextraire:
+        if args.entrees:
+            parser.error("--reextraire ne prend pas d'entrées (le texte vient du magasin de textes)")
+        return reextraire(args)
+    if not args.entrees:
+        parser.error("au moins une entrée (dossier, ZIP ou PDF) est requise")
+    if args.surveiller:
+        return surveiller(args)
+
+    sources, archives = lister_entrees(args.entrees)
+    if not sources:
+        logger.error("⚠️ Aucun fichier PDF trouvé à traiter.")
+        return 2
+    logger.info(f"⚙️ Traitement de {len(sources)} fichier(s) PDF...")
+
+    cache = ouvrir_cache(args)
+    textes = ouvrir_textes(args)
+
+    os.makedirs(args.sortie, exist_ok=True)
+    mesures = MesuresPerformance() if args.mesures else None
+    manifeste = ManifesteTravail(args.travail) if args.travail else None
+    # Récapitulatif écrit au fil du traitement (mémoire constante quel que soit le nombre de PDF)
+    recapitulatifs = {args.format: os.path.join(args.sortie, f"{NOM_RECAPITULATIF}.{args.format}")}
+    memoire_max = args.memoire_max_mo * 1024 * 1024 if args.memoire_max_mo else None
+    limites = limites_document(args)
+    try:
+        with SuiviMemoire() as suivi_memoire:
+            bilan, chemin_zip, ecrits = traiter_lot(
+                sources, os.path.join(args.sortie, NOM_ARCHIVE_SORTIE), recapitulatifs, max(1, args.workers),
+                cache=cache, mesures=mesures, manifeste=manifeste, feuille_performance=True, memoire_max=memoire_max,
+                dedoublonner=not args.garder_doublons, limites=limites, maitre=args.maitre, textes=textes
+            )
+    finally:
+        for archive in archives:
+            archive.close()
+        if cache is not None:
+            cache.fermer()
+        if textes is not None:
+            textes.fermer()
+        if manifeste is not None:
+            manifeste.fermer()
+    chemin_recap = ecrits.get(args.format)
+
+    stats = bilan.stats()
+    logger.info(f"✅ {stats['succeeded_rename']} renommé(s), {stats['succeeded_extraction']} extraction(s) réussie(s), "
+                f"{stats['failed']} échec(s) sur {stats['found']} PDF.")
+    if cache is not None:
+        logger.info(f"♻️ Cache : {cache.hits} PDF déjà connu(s), {cache.misses} analysé(s).")
+    if textes is not None and textes.nb_enregistres:
+        logger.info(f"📝 Texte de {textes.nb_enregistres} PDF enregistré dans {textes.chemin}.")
+    if manifeste is not None:
+        logger.info(f"⏯️ Reprise : {manifeste.nb_repris} PDF déjà traité(s) repris du manifeste {manifeste.chemin}.")
+    for echec in stats["failures"]:
+        logger.info(f"   ❌ {echec['file']} : {echec['reason']}")
+    if stats["doublons"]:
+        logger.info(f"🧬 {len(stats['doublons'])} doublon(s) ignoré(s) :")
+        for doublon in stats["doublons"]:
+            logger.info(f"   {doublon['Fichier ignoré']} = {doublon['Identique à']}")
+    for modele in stats["modeles"]:
+        analyse = "aucun analysé (cache ou reprise)"
+        if modele["Analysés"]:
+            analyse = f"analyse moyenne {modele['Analyse moyenne (ms)']} ms sur {modele['Analysés']} analysé(s)"
+        logger.info(f"🗂️ Modèle {modele['Modèle']} : {modele['Documents']} document(s), {analyse}.")
+    if chemin_zip:
+        logger.info(f"📦 Archive : {chemin_zip}")
+    if chemin_recap:
+        logger.info(f"📊 Récapitulatif : {chemin_recap}")
+    if stats["maitre"] is not None:
+        logger.info(f"📚 Maître {stats['maitre']['chemin']} : {stats['maitre']['ajoutees']} ligne(s) ajoutée(s), "
+                    f"{stats['maitre']['mises_a_jour']} mise(s) à jour.")
+        for ligne in stats["maitre"]["ecartees"]:
+            logger.warning(f"   Même référence '{ligne['Clé']}' pour {ligne['Fichier écarté']} et {ligne['Fichier gardé']} : "
+                           f"seule la ligne de {ligne['Fichier gardé']} est gardée.")
+    if suivi_memoire.pic_mo is not None:
+        logger.info(f"🧠 Pic mémoire : {suivi_memoire.pic_mo:.0f} Mo (processus + workers).")
+    if mesures is not None:
+        logger.info("⏱️ Temps par étape :")
+        for ligne in mesures.lignes_totaux():
+            logger.info(f"   {ligne['Étape']} : {ligne['Temps (s)']:.3f} s ({ligne['Part (%)']} %)")
+        logger.info("⏱️ Fichiers les plus lents :")
+        for ligne in mesures.plus_lents():
+            logger.info(f"   {ligne['Fichier']} : {ligne['Total (ms)']} ms")
+    return 1 if stats["failed"] else 0
@@ -0,0 +1,95 @@
+import hashlib
+import os
+
+from extracteur.cache import TAILLE_BLOC_HASH, hash_fichier
+from extracteur.ingestion import SourcePDF, chemin_source
+
+
+def taille_source(source):
+    """Taille en octets d'une source (fichier ou SourcePDF), ou None si inconnue."""
+    if isinstance(source, SourcePDF):
+        return source.taille
+    try:
+        return os.path.getsize(source)
+    except OSError:
+        return None
+
+
+def empreinte_source(source):
+    """SHA-256 du contenu d'une source, lu par blocs quand c'est possible (fichier, membre de ZIP)."""
+    if not isinstance(source, SourcePDF):
+        return hash_fichier(source)
+    if source.ouvrir is None:
+        return hashlib.sha256(source.lire()).hexdigest()
+    sha = hashlib.sha256()
+    with source.ouvrir() as f:
+        for bloc in iter(lambda: f.read(TAILLE_BLOC_HASH), b""):
+            sha.update(bloc)
+    return sha.hexdigest()
+
+
+class DetecteurDoublons:
+    """
+    Repère au fil du lot les PDF au contenu identique à un PDF déjà vu (même fichier sous un autre nom, dans un
+    autre dossier ou un autre ZIP) : la première occurrence est gardée, les suivantes sont listées dans doublons.
+    Les sources sont examinées une à une, dans l'ordre du lot, sans attendre la fin du flux.
+    Seuls les fichiers dont la taille a déjà été vue sont hachés (la première source d'une taille ne l'est que
+    quand une deuxième arrive), sauf si leur empreinte est déjà connue. Une source illisible est gardée
+    (l'erreur sera signalée au traitement).
+    """
+
+    def __init__(self):
+        self.doublons = [] # (source, source_gardee)
+        self._tailles = {} # taille -> première source de cette taille pas encore hachée (None : déjà hachée)
+        self._premieres = {} # empreinte -> première source de ce contenu
+
+    def _ajouter(self, source, empreinte):
+        """Source déjà vue avec ce contenu, ou None (source enregistrée comme première de ce contenu)."""
+        premiere = self._premieres.get(empreinte)
+        if premiere is None:
+            self._premieres[empreinte] = source
+        return premiere
+
+    def gardee(self, source, empreinte=None):
+        """
+        Source déjà vue dont source est un doublon (ajouté à doublons), ou None si source est à traiter.
+        empreinte : SHA-256 du contenu, s'il est déjà calculé (il n'est alors pas recalculé). Le traitement la
+        fournit toujours (decider_analyse la calcule une fois pour tous ses usages) : le tri par taille ne sert
+        qu'à separer_doublons.
+        """
+        taille = taille_source(source)
+        if taille is not None:
+            if taille not in self._tailles:
+                self._tailles[taille] = source if empreinte is None else None
+                if empreinte is None:
+                    return None # Taille jamais vue : pas de doublon possible
+            elif self._tailles[taille] is not None:
+                seule, self._tailles[taille] = self._tailles[taille], None
+                try:
+                    self._ajouter(seule, empreinte_source(seule))
+                except Exception:
+                    pass
+        if empreinte is None:
+            try:
+                empreinte = empreinte_source(source)
+            except Exception:
+                return None
+        premiere = self._ajouter(source, empreinte)
+        if premiere is not None:
+            self.doublons.append((source, premiere))
+        return premiere
+
+
+def separer_doublons(sources):
+    """
+    Sépare d'un coup les PDF au contenu identique (voir DetecteurDoublons) ; sources est parcouru une seule fois.
+    Retourne: sources_uniques (première occurrence, ordre d'origine), doublons [(source, source_gardee), ...]
+    """
+    detecteur = DetecteurDoublons()
+    uniques = [source for source in sources if detecteur.gardee(source) is None]
+    return uniques, detecteur.doublons
+
+
+def lignes_doublons(doublons):
+    """Lignes de la feuille "Doublons" du récapitulatif et du résumé."""
+    return [{"Fichier ignoré": chemin_source(source), "Identique à": chemin_source(gardee)} for source, gardee in doublons]
@@ -0,0 +1,280 @@
+import csv
+import json
+import os
+
+# Ordre des colonnes du récapitulatif
+COLONNES_ORDRE = [
+    "Nom Fichier Original", "Nouveau Nom Fichier", "Reference Rapport", "FOS",
+    "Adresse Travaux", "Nom Beneficiaire", "Raison Sociale Professionnel",
+    "Beneficiaire Joint", "Telephone Errone", "Controle Realise", "Date Controle",
+    "Systeme Regulation Installe", "Reception Consignes Emetteurs",
+    "Commentaire Non Reception", "Absence Non Qualite Manifeste",
+    "Commentaire Non Qualite Relevee", "Conclusion Controle"
+]
+
+NOM_RECAPITULATIF = "recapitulatif_controles_greenprime"
+FORMATS_RECAPITULATIF = ("xlsx", "csv", "jsonl", "parquet")
+LIGNES_PAR_GROUPE_PARQUET = 10000 # Lignes gardées en mémoire avant d'écrire un groupe Parquet
+
+
+def _valeurs(ligne, colonnes=COLONNES_ORDRE):
+    return [ligne.get(colonne, "") for colonne in colonnes]
+
+
+def _supprimer(chemin):
+    try: os.remove(chemin)
+    except OSError: pass
+
+
+class RecapitulatifEnFlux:
+    """
+    Récapitulatif écrit ligne par ligne, au fil du traitement : la mémoire utilisée ne dépend pas
+    du nombre de lignes. S'utilise comme gestionnaire de contexte ou avec fermer() / abandonner().
+    """
+    extension = None
+    colonnes = COLONNES_ORDRE
+
+    def __init__(self, chemin):
+        self.chemin = chemin
+        self.nb_lignes = 0
+
+    def ajouter(self, ligne):
+        """Ajoute une ligne (dict colonne -> valeur ; colonnes absentes laissées vides)."""
+        self._ecrire(_valeurs(ligne, self.colonnes))
+        self.nb_lignes += 1
+
+    def ajouter_feuille(self, nom, lignes):
+        """Feuille annexe (ex. "Performance") : écrite en xlsx, ignorée dans les autres formats."""
+
+    def fermer(self):
+        """Termine le fichier et retourne son chemin."""
+        return self.chemin
+
+    def abandonner(self):
+        """Ferme et supprime le fichier (erreur, ou aucune ligne à écrire)."""
+        try: self.fermer()
+        except Exception: pass
+        if os.path.exists(self.chemin):
+            try: os.remove(self.chemin)
+            except OSError: pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.fermer()
+        else:
+            self.abandonner()
+
+
+class RecapitulatifExcel(RecapitulatifEnFlux):
+    """
+    XLSX en mode write-only d'openpyxl : chaque ligne est écrite sur disque dès son ajout.
+    colonnes et titre_feuille permettent de réécrire un classeur existant avec son en-tête et son nom de feuille
+    (récapitulatif maître).
+    """
+    extension = "xlsx"
+
+    def __init__(self, chemin, colonnes=None, titre_feuille="Sheet1"): # Même nom que l'ancien export pandas
+        super().__init__(chemin)
+        from openpyxl import Workbook # Import local : inutile pour les autres formats
+        from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+
+        if colonnes is not None:
+            self.colonnes = list(colonnes)
+        self._classeur = Workbook(write_only=True)
+        self._feuille = self._classeur.create_sheet(titre_feuille)
+        self._feuille.append(self._entete(self.colonnes))
+        self._ferme = False
+        self._caracteres_interdits = ILLEGAL_CHARACTERS_RE
+
+    def _entete(self, colonnes):
+        from openpyxl.cell import WriteOnlyCell
+        from openpyxl.styles import Font
+
+        cellules = []
+        for colonne in colonnes:
+            cellule = WriteOnlyCell(self._feuille, value=colonne)
+            cellule.font = Font(bold=True)
+            cellules.append(cellule)
+        return cellules
+
+    def _ecrire(self, valeurs):
+        # Caractères de contrôle interdits dans le XML d'un xlsx (texte PDF abîmé) : retirés plutôt que d'échouer
+        self._feuille.append([self._caracteres_interdits.sub("", v) if isinstance(v, str) else v for v in valeurs])
+
+    def ajouter_feuille(self, nom, lignes):
+        feuille = self._classeur.create_sheet(nom)
+        colonnes = list(lignes[0]) if lignes else []
+        feuille.append(self._entete(colonnes))
+        for ligne in lignes:
+            feuille.append([ligne.get(colonne, "") for colonne in colonnes])
+
+    def fermer(self):
+        if not self._ferme:
+            self._ferme = True
+            # Enregistré à côté puis renommé : pas de classeur à moitié écrit sous le nom final
+            chemin_temp = self.chemin + ".tmp"
+            try:
+                self._classeur.save(chemin_temp)
+                os.replace(chemin_temp, self.chemin)
+            except BaseException:
+                _supprimer(chemin_temp)
+                raise
+        return self.chemin
+
+    def abandonner(self):
+        if not self._ferme:
+            self._ferme = True # Rien à garder
+            # Seul save() ferme les feuilles write-only (et supprime leurs fichiers temporaires) par l'API
+            # publique : classeur enregistré dans un fichier à nous, supprimé aussitôt
+            chemin_temp = self.chemin + ".tmp"
+            try:
+                self._classeur.save(chemin_temp)
+            except Exception:
+                pass
+            _supprimer(chemin_temp)
+        super().abandonner()
+
+
+class RecapitulatifCsv(RecapitulatifEnFlux):
+    """CSV en UTF-8 avec BOM et ';' pour une ouverture directe dans Excel."""
+    extension = "csv"
+
+    def __init__(self, chemin):
+        super().__init__(chemin)
+        self._fichier = open(chemin, "w", newline="", encoding="utf-8-sig")
+        self._writer = csv.writer(self._fichier, delimiter=";")
+        self._writer.writerow(COLONNES_ORDRE)
+
+    def _ecrire(self, valeurs):
+        self._writer.writerow(valeurs)
+
+    def fermer(self):
+        self._fichier.close()
+        return self.chemin
+
+
+class RecapitulatifJsonl(RecapitulatifEnFlux):
+    """JSON Lines : un objet par PDF."""
+    extension = "jsonl"
+
+    def __init__(self, chemin):
+        super().__init__(chemin)
+        self._fichier = open(chemin, "w", encoding="utf-8")
+
+    def _ecrire(self, valeurs):
+        self._fichier.write(json.dumps(dict(zip(COLONNES_ORDRE, valeurs)), ensure_ascii=False) + "\n")
+
+    def fermer(self):
+        self._fichier.close()
+        return self.chemin
+
+
+class RecapitulatifJsonlEnAjout(RecapitulatifJsonl):
+    """
+    JSON Lines complété à chaque lot (mode service) : les lignes sont ajoutées à la fin du fichier existant,
+    sans le relire. abandonner() retire seulement les lignes de ce lot (le fichier est tronqué à sa taille
+    d'ouverture) : un lot en erreur ne laisse pas de lignes partielles.
+    """
+
+    def __init__(self, chemin):
+        RecapitulatifEnFlux.__init__(self, chemin)
+        self._fichier = open(chemin, "a", encoding="utf-8")
+        self._taille_initiale = self._fichier.tell()
+
+    def fermer(self):
+        if not self._fichier.closed:
+            self._fichier.flush()
+            os.fsync(self._fichier.fileno())
+        return super().fermer()
+
+    def abandonner(self):
+        if not self._fichier.closed:
+            self._fichier.flush()
+            self._fichier.truncate(self._taille_initiale)
+            self._fichier.close()
+
+
+class RecapitulatifParquet(RecapitulatifEnFlux):
+    """Parquet (pyarrow), colonnes texte, écrit par groupes de LIGNES_PAR_GROUPE_PARQUET lignes."""
+    extension = "parquet"
+
+    def __init__(self, chemin):
+        super().__init__(chemin)
+        import pyarrow as pa # Import local : dépendance lourde, seulement pour ce format
+        import pyarrow.parquet as pq
+
+        self._pa = pa
+        self._schema = pa.schema([(colonne, pa.string()) for colonne in COLONNES_ORDRE])
+        self._writer = pq.ParquetWriter(chemin, self._schema)
+        self._colonnes = [[] for _ in COLONNES_ORDRE]
+
+    def _ecrire(self, valeurs):
+        for colonne, valeur in zip(self._colonnes, valeurs):
+            colonne.append(valeur if valeur is None else str(valeur))
+        if len(self._colonnes[0]) >= LIGNES_PAR_GROUPE_PARQUET:
+            self._vider()
+
+    def _vider(self):
+        if self._colonnes[0]:
+            self._writer.write_table(self._pa.Table.from_arrays(self._colonnes, schema=self._schema))
+            self._colonnes = [[] for _ in COLONNES_ORDRE]
+
+    def fermer(self):
+        if self._writer is not None:
+            self._vider()
+            self._writer.close()
+            self._writer = None
+        return self.chemin
+
+
+class RecapitulatifMultiple(RecapitulatifEnFlux):
+    """Écrit les mêmes lignes dans plusieurs récapitulatifs (ex. XLSX + Parquet)."""
+
+    def __init__(self, recapitulatifs):
+        super().__init__(None)
+        self.recapitulatifs = list(recapitulatifs)
+
+    def _ecrire(self, valeurs):
+        ligne = dict(zip(COLONNES_ORDRE, valeurs))
+        for recapitulatif in self.recapitulatifs:
+            recapitulatif.ajouter(ligne)
+
+    def ajouter_feuille(self, nom, lignes):
+        for recapitulatif in self.recapitulatifs:
+            recapitulatif.ajouter_feuille(nom, lignes)
+
+    def fermer(self):
+        """Ferme chaque récapitulatif ; retourne la liste de leurs chemins."""
+        return [recapitulatif.fermer() for recapitulatif in self.recapitulatifs]
+
+    def abandonner(self):
+        for recapitulatif in self.recapitulatifs:
+            recapitulatif.abandonner()
+
+
+_CLASSES_RECAPITULATIF = {
+    "xlsx": RecapitulatifExcel, "csv": RecapitulatifCsv, "jsonl": RecapitulatifJsonl, "parquet": RecapitulatifParquet
+}
+
+
+def ouvrir_recapitulatif(chemin, format_sortie="xlsx"):
+    """Ouvre un récapitulatif en flux au format demandé : xlsx, csv, jsonl ou parquet."""
+    if format_sortie not in _CLASSES_RECAPITULATIF:
+        raise ValueError(f"Format de récapitulatif inconnu : {format_sortie}")
+    return _CLASSES_RECAPITULATIF[format_sortie](chemin)
+
+
+def ecrire_recapitulatif(lignes, chemin, format_sortie="xlsx", feuilles_supplementaires=None):
+    """
+    Écrit d'un coup un récapitulatif à partir d'une liste de lignes.
+    feuilles_supplementaires : {nom de feuille: liste de dicts}, écrites seulement en xlsx.
+    """
+    with ouvrir_recapitulatif(chemin, format_sortie) as recapitulatif:
+        for ligne in lignes:
+            recapitulatif.ajouter(ligne)
+        for nom_feuille, lignes_feuille in (feuilles_supplementaires or {}).items():
+            recapitulatif.ajouter_feuille(nom_feuille, lignes_feuille)
+
@@ -0,0 +1,107 @@
+import logging
+import os
+import time
+
+import fitz  # PyMuPDF
+
+from extracteur.champs import extraire_champs
+from extracteur.modeles import CLE_DUREE_ANALYSE, CLE_MODELE, choisir_modele, signature_modeles
+from extracteur.performance import noter
+
+logger = logging.getLogger(__name__)
+
+# À incrémenter dès que le résultat de l'extraction change (table des champs, nettoyage...) :
+# les entrées du cache calculées avec une autre version sont alors ignorées.
+VERSION_EXTRACTEUR = 2
+
+
+def version_extraction():
+    """VERSION_EXTRACTEUR et signature du registre des modèles (clé du cache et du manifeste de reprise)."""
+    return f"{VERSION_EXTRACTEUR}.{signature_modeles()}"
+
+
+def signaler_log(niveau, message):
+    """Signaleur par défaut : envoie les messages ("error", "warning", "info") dans le logging standard."""
+    if niveau == "error":
+        logger.error(message)
+    elif niveau == "info":
+        logger.info(message)
+    else:
+        logger.warning(message)
+
+
+def extraire_donnees_textes(text_page1, text_page2):
+    """
+    Analyse le texte des pages 1 et 2 (page 1 si le document n'en a qu'une) : choix du modèle de rapport,
+    table des champs, nettoyage des espaces. Le nom du modèle est ajouté aux données (CLE_MODELE).
+    Sert à l'extraction d'un PDF et à la ré-extraction depuis le magasin de textes (extracteur/textes.py).
+    """
+    # Page 1 : référence ; page 2 (ou page 1 si unique) : la plupart des infos
+    modele = choisir_modele(text_page1)
+    data = extraire_champs(text_page1, text_page2, modele.table)
+
+    # Nettoyage final (enlever les espaces superflus)
+    for key, value in data.items():
+         if isinstance(value, str):
+             data[key] = ' '.join(value.split())
+    data[CLE_MODELE] = modele.nom
+    return data
+
+
+def extraire_donnees_pdf(pdf_path, signaler=signaler_log, contenu=None, temps=None, pages=None):
+    """
+    Extrait les données structurées d'un PDF Greenprime.
+    signaler(niveau, message) reçoit les avertissements ("warning") et erreurs ("error").
+    Si contenu (octets du PDF) est fourni, le PDF est lu en mémoire et pdf_path ne sert qu'au nom.
+    Si temps (dict) est fourni, la durée des étapes ouverture / texte / champs y est ajoutée.
+    Si pages (liste) est fournie, le texte des pages lues (page 1, puis page 2 si elle existe) y est ajouté.
+    Le modèle de rapport est choisi d'après la page 1 (voir extracteur/modeles.py) ; son nom et la durée
+    de l'analyse sont ajoutés aux données (CLE_MODELE, CLE_DUREE_ANALYSE).
+    """
+    data = {}
+    doc = None
+    nom_fichier = os.path.basename(pdf_path)
+
+    try:
+        debut_analyse = time.perf_counter()
+        if temps is not None: debut = debut_analyse
+        if contenu is not None:
+            doc = fitz.open(stream=contenu, filetype="pdf")
+        else:
+            doc = fitz.open(pdf_path)
+        if temps is not None: debut = noter(temps, "ouverture", debut)
+        text_page1 = ""
+        text_page2 = ""
+        if len(doc) > 0:
+            text_page1 = doc.load_page(0).get_text("text")
+        if len(doc) > 1:
+            text_page2 = doc.load_page(1).get_text("text")
+        else:
+             # Si pas de page 2, on essaie quand même de trouver les infos sur la page 1
+             text_page2 = text_page1
+        if temps is not None: debut = noter(temps, "texte", debut)
+        if pages is not None:
+            pages.append(text_page1)
+            if len(doc) > 1: pages.append(text_page2)
+
+        # --- Extraction des champs (table précompilée du modèle, voir extracteur/champs.py et modeles.py) ---
+        data = extraire_donnees_textes(text_page1, text_page2)
+        if temps is not None: noter(temps, "champs", debut)
+        data[CLE_DUREE_ANALYSE] = round((time.perf_counter() - debut_analyse) * 1000, 2)
+
+
+        # Vérifier si des données essentielles (comme la référence) ont été trouvées
+        if not data.get("Reference Rapport"):
+            signaler("warning", f"⚠️ Référence non trouvée dans {nom_fichier}. Extraction de données peut être incomplète.")
+            # On retourne quand même ce qu'on a trouvé, mais la référence est clé
+            # return None # Optionnel: considérer l'extraction comme échouée si la ref manque
+
+        return data
+
+    except Exception as e:
+        signaler("error", f"❌ Erreur extraction données PDF '{nom_fichier}' : {type(e).__name__} - {e}")
+        return None # Retourne None en cas d'erreur majeure
+    finally:
+        if doc:
+            try: doc.close()
+            except: pass
@@ -0,0 +1,233 @@
+import functools
+import os
+import posixpath
+import shutil
+import zipfile
+from collections import namedtuple
+
+from extracteur.extraction import signaler_log
+from extracteur.pipeline import SourcesEnFlux
+
+# PDF lu sans passer par un fichier sur disque (membre de ZIP, fichier uploadé).
+# nom : chemin affiché (ex. "dossier/rapport.pdf") ; lire() : retourne le contenu en octets.
+# Facultatifs : ouvrir() retourne un flux du contenu (lecture par blocs), taille en octets (si connue).
+SourcePDF = namedtuple("SourcePDF", ["nom", "lire", "ouvrir", "taille"], defaults=[None, None])
+
+TAILLE_BLOC_COPIE = 8 * 1024 * 1024 # Octets copiés à la fois lors de l'enregistrement d'un upload sur disque
+
+
+def dossier_a_ignorer(nom_dossier):
+    """Dossiers cachés et spécifiques à MacOSX, exclus comme dans le parcours os.walk."""
+    return nom_dossier.startswith('.') or nom_dossier == '__MACOSX'
+
+
+def fichier_pdf_a_traiter(nom_fichier):
+    """PDF à traiter, hors fichiers macOS temporaires ('._xxx.pdf')."""
+    return nom_fichier.lower().endswith(".pdf") and not nom_fichier.startswith('._')
+
+
+def lister_pdf_dossier(dossier):
+    """Liste les PDF d'un dossier (récursivement), hors dossiers cachés et fichiers macOS."""
+    chemins_pdf = []
+    for root, dirs, files in os.walk(dossier):
+         # Exclure les dossiers cachés et spécifiques à MacOSX
+         dirs[:] = [d for d in dirs if not dossier_a_ignorer(d)]
+         for file in files:
+            if fichier_pdf_a_traiter(file): # Exclure les fichiers macOS temporaires
+                chemins_pdf.append(os.path.join(root, file))
+    return chemins_pdf
+
+
+def _membres_pdf_zip(archive):
+    """Membres PDF d'un zipfile.ZipFile ouvert, avec les mêmes filtres que le parcours du dossier d'extraction."""
+    membres = []
+    for info in archive.infolist():
+        if info.is_dir():
+            continue
+        *dossiers, nom_fichier = posixpath.normpath(info.filename).split('/')
+        if any(dossier_a_ignorer(d) for d in dossiers) or not fichier_pdf_a_traiter(nom_fichier):
+            continue
+        membres.append(info)
+    return membres
+
+
+def lister_pdf_zip(archive):
+    """
+    Liste les PDF d'un zipfile.ZipFile ouvert, sans rien extraire sur disque.
+    Applique les mêmes filtres que le parcours du dossier d'extraction.
+    """
+    return [SourcePDF(info.filename, functools.partial(archive.read, info), functools.partial(archive.open, info),
+                      info.file_size)
+            for info in _membres_pdf_zip(archive)]
+
+
+def chemin_source(source):
+    """Chemin d'une source : le chemin du fichier, ou le nom du membre pour une SourcePDF."""
+    if isinstance(source, SourcePDF):
+        return source.nom
+    return source
+
+
+def ouvrir_source(source):
+    """
+    Retourne (pdf_path, contenu) pour une source : un chemin de fichier ou une SourcePDF.
+    contenu vaut None pour un chemin (le PDF est alors ouvert directement depuis le disque).
+    """
+    if isinstance(source, SourcePDF):
+        return source.nom, source.lire()
+    return source, None
+
+
+def nom_source(source):
+    """Nom de fichier (sans dossier) d'une source, tel qu'affiché dans les résumés."""
+    if isinstance(source, SourcePDF):
+        return posixpath.basename(source.nom)
+    return os.path.basename(source)
+
+
+def est_zip_depose(fichier):
+    """Vrai si un fichier déposé (objet avec .name et .type, ex. UploadedFile de Streamlit) est une archive ZIP."""
+    return getattr(fichier, "type", None) == "application/zip" or fichier.name.lower().endswith(".zip")
+
+
+def copier_par_blocs(fichier, chemin, taille_bloc=TAILLE_BLOC_COPIE):
+    """
+    Copie un fichier ouvert (upload, flux...) vers chemin par blocs de taille_bloc octets :
+    aucune copie complète du contenu en mémoire, quelle que soit sa taille.
+    """
+    if hasattr(fichier, "seek"):
+        fichier.seek(0)
+    with open(chemin, "wb") as f:
+        shutil.copyfileobj(fichier, f, taille_bloc)
+
+
+def _chemin_extraction(dossier, info):
+    """Chemin où zipfile extrait un membre dans dossier (composants vides, '.' et '..' retirés)."""
+    composants = [c for c in info.filename.replace('/', os.sep).split(os.sep) if c not in ('', os.curdir, os.pardir)]
+    return os.path.join(dossier, *composants)
+
+
+def _ecrire_sur_disque(ecrire, chemin, nom, signaler):
+    """Écrit un PDF à préparer ; en cas d'erreur, le fichier partiel est supprimé (l'analyse signalera l'absence)."""
+    try:
+        os.makedirs(os.path.dirname(chemin), exist_ok=True)
+        ecrire(chemin)
+    except Exception as e:
+        signaler("error", f"❌ Erreur sauvegarde '{nom}': {e}")
+        try: os.remove(chemin)
+        except OSError: pass
+
+
+def _extraire_membre(archive, info, chemin):
+    with archive.open(info) as membre, open(chemin, "wb") as f:
+        shutil.copyfileobj(membre, f, TAILLE_BLOC_COPIE)
+
+
+def _lire_upload(fichier):
+    """Contenu d'un fichier déposé, relu depuis le début par seek/read : tout objet fichier, pas seulement un BytesIO."""
+    fichier.seek(0)
+    return fichier.read()
+
+
+def _fermer_archives(archives):
+    for archive in archives:
+        try: archive.close()
+        except Exception: pass
+
+
+def preparer_uploads_sur_disque(uploaded_files, temp_input_dir, signaler=signaler_log):
+    """
+    Enregistre les uploads dans temp_input_dir (copie par blocs) et extrait les PDF des ZIP membre par membre.
+    Le nombre de PDF est connu d'avance (répertoire des ZIP) ; l'écriture sur disque se fait ensuite au fil
+    du traitement, dans un étage dédié (SourcesEnFlux) : l'analyse des premiers PDF commence pendant que les
+    suivants sont encore extraits. Les PDF sont rendus dans l'ordre des uploads puis des membres de chaque ZIP ;
+    un même chemin déposé plusieurs fois n'est préparé qu'une fois, avec le dernier contenu (comme un
+    écrasement sur disque). Un PDF dont l'écriture échoue est signalé et rendu quand même : son analyse
+    échouera et il comptera parmi les échecs.
+    Retourne: sources (SourcesEnFlux de chemins), nb_pdf_directs, nb_zip
+    """
+    zip_extracted_count = 0
+    pdf_saved_count = 0
+    a_preparer = {} # chemin -> (nom affiché, fonction d'écriture, ZIP lu ou None) ; le dernier dépôt d'un chemin l'emporte
+    archives = []
+    for uploaded_file in uploaded_files:
+        if est_zip_depose(uploaded_file):
+            archive = None
+            try:
+                archive = zipfile.ZipFile(uploaded_file, 'r')
+                membres = _membres_pdf_zip(archive)
+            except Exception as e:
+                _fermer_archives([archive] if archive is not None else [])
+                signaler("error", f"❌ Erreur extraction '{uploaded_file.name}' : {e}")
+                continue
+            archives.append(archive)
+            zip_extracted_count += 1
+            for info in membres:
+                chemin = _chemin_extraction(temp_input_dir, info)
+                a_preparer.pop(chemin, None)
+                a_preparer[chemin] = (f"{uploaded_file.name}/{info.filename}",
+                                      functools.partial(_extraire_membre, archive, info), archive)
+        else:
+            pdf_saved_count += 1
+            if fichier_pdf_a_traiter(uploaded_file.name):
+                chemin = os.path.join(temp_input_dir, uploaded_file.name)
+                a_preparer.pop(chemin, None)
+                a_preparer[chemin] = (uploaded_file.name, functools.partial(copier_par_blocs, uploaded_file), None)
+
+    # Membres restant à écrire par ZIP : chaque archive est fermée (et son upload n'est plus référencé ici)
+    # dès son dernier membre écrit ; un ZIP dont tous les membres ont été remplacés est fermé tout de suite
+    restants = {}
+    for _, _, archive in a_preparer.values():
+        if archive is not None:
+            restants[archive] = restants.get(archive, 0) + 1
+    _fermer_archives([archive for archive in archives if archive not in restants])
+
+    def preparer():
+        try:
+            while a_preparer:
+                # Retiré avant l'écriture : ni l'upload ni sa fonction d'écriture ne restent référencés après
+                chemin = next(iter(a_preparer))
+                nom, ecrire, archive = a_preparer.pop(chemin)
+                _ecrire_sur_disque(ecrire, chemin, nom, signaler)
+                del ecrire
+                if archive is not None:
+                    restants[archive] -= 1
+                    if not restants[archive]:
+                        del restants[archive]
+                        _fermer_archives([archive])
+                yield chemin
+        finally:
+            _fermer_archives(list(restants))
+
+    return SourcesEnFlux(len(a_preparer), preparer()), pdf_saved_count, zip_extracted_count
+
+
+def preparer_uploads_en_direct(uploaded_files, signaler=signaler_log):
+    """
+    Liste les PDF uploadés et ceux des ZIP, lus en place (aucune écriture sur disque).
+    Retourne: sources, archives_ouvertes (à fermer après traitement), nb_pdf_directs, nb_zip
+    """
+    sources = []
+    archives = []
+    zip_count = 0
+    pdf_count = 0
+    for uploaded_file in uploaded_files:
+        if est_zip_depose(uploaded_file):
+            archive = None
+            try:
+                # Archive gardée ouverte (sources lues pendant le traitement), sauf si sa lecture échoue
+                archive = zipfile.ZipFile(uploaded_file, 'r')
+                sources_zip = lister_pdf_zip(archive)
+            except Exception as e:
+                _fermer_archives([archive] if archive is not None else [])
+                signaler("error", f"❌ Erreur lecture '{uploaded_file.name}' : {e}")
+                continue
+            archives.append(archive)
+            sources.extend(sources_zip)
+            zip_count += 1
+        else:
+            pdf_count += 1
+            if fichier_pdf_a_traiter(uploaded_file.name):
+                sources.append(SourcePDF(uploaded_file.name, functools.partial(_lire_upload, uploaded_file),
+                                         taille=getattr(uploaded_file, "size", None)))
+    return sources, archives, pdf_count, zip_count
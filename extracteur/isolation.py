@@ -0,0 +1,213 @@
+import multiprocessing
+import multiprocessing.connection
+import os
+import threading
+import time
+from collections import deque, namedtuple
+from concurrent.futures import Future
+
+# Limites appliquées à l'analyse de chaque PDF en mode isolé (None : pas de limite).
+# delai : secondes (horloge murale) ; memoire : octets de mémoire supplémentaire pour l'analyse d'un document.
+LimitesDocument = namedtuple("LimitesDocument", ["delai", "memoire"], defaults=[None, None])
+
+
+class DelaiDepasse(Exception):
+    """L'analyse d'un document a dépassé LimitesDocument.delai : son processus a été tué."""
+
+
+class ProcessusInterrompu(Exception):
+    """Le processus d'analyse s'est arrêté pendant un document (plantage, tué par le système...)."""
+
+
+def _taille_memoire():
+    """Mémoire virtuelle du processus en octets (Linux), ou None."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[0]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return None
+
+
+def _limiter_memoire(octets):
+    """Plafonne la mémoire virtuelle du processus à sa taille actuelle + octets (Linux ; ignoré ailleurs)."""
+    taille_actuelle = _taille_memoire()
+    if taille_actuelle is None:
+        return
+    try:
+        import resource
+        _, max_systeme = resource.getrlimit(resource.RLIMIT_AS)
+        limite = taille_actuelle + octets
+        if max_systeme != resource.RLIM_INFINITY:
+            limite = min(limite, max_systeme)
+        resource.setrlimit(resource.RLIMIT_AS, (limite, max_systeme))
+    except (ImportError, OSError, ValueError):
+        pass
+
+
+def _boucle_worker(conn, memoire, initializer=None, initargs=()):
+    """
+    Analyse les documents reçus un par un. Avec memoire, le plafond est recalculé avant chaque document
+    (taille actuelle + memoire) : ce qu'un document précédent a laissé ne réduit pas la marge du suivant.
+    Un processus resté plus gros que sa taille de départ + memoire après un document demande à être
+    remplacé (troisième élément de la réponse), pour que la mémoire retenue ne s'accumule pas.
+    initializer(*initargs) est appelé une fois au démarrage, comme pour ProcessPoolExecutor.
+    """
+    if initializer is not None:
+        initializer(*initargs)
+    taille_depart = _taille_memoire() if memoire else None
+    while True:
+        try:
+            tache = conn.recv()
+        except (EOFError, OSError):
+            return
+        if tache is None:
+            return
+        fonction, args = tache
+        if memoire:
+            _limiter_memoire(memoire)
+        try:
+            reussi, valeur = True, fonction(*args)
+        except BaseException as e:
+            reussi, valeur = False, e
+        a_remplacer = False
+        if taille_depart is not None:
+            taille = _taille_memoire()
+            a_remplacer = taille is not None and taille > taille_depart + memoire
+        try:
+            conn.send((reussi, valeur, a_remplacer))
+        except Exception as e: # Exception ou résultat non sérialisable
+            conn.send((False, RuntimeError(f"{type(e).__name__} - {e}"), a_remplacer))
+
+
+class _Worker:
+    def __init__(self, contexte, memoire, initializer=None, initargs=()):
+        self.conn, conn_enfant = contexte.Pipe()
+        self.processus = contexte.Process(target=_boucle_worker, args=(conn_enfant, memoire, initializer, initargs),
+                                          daemon=True)
+        self.processus.start()
+        conn_enfant.close()
+        self.tache = None # (future, échéance) du document en cours
+
+    def arreter(self, tuer=False):
+        if tuer:
+            self.processus.kill()
+        else:
+            try: self.conn.send(None)
+            except OSError: pass
+        self.processus.join()
+        self.conn.close()
+
+
+class PoolIsole:
+    """
+    Pool de processus d'analyse aux documents isolés, utilisable à la place de ProcessPoolExecutor (submit / with).
+    Un document qui dépasse limites.delai est abandonné : son processus est tué et remplacé, le futur lève
+    DelaiDepasse, et les autres documents continuent sans attendre. limites.memoire plafonne la mémoire
+    supplémentaire de chaque document (une allocation au-delà échoue : erreur d'extraction au lieu d'un serveur
+    saturé) ; un processus qui garde plus que ce supplément après un document est remplacé.
+    Un processus qui meurt pendant un document (ProcessusInterrompu) est lui aussi remplacé.
+    """
+
+    def __init__(self, nb_workers, limites, mp_context=None, initializer=None, initargs=()):
+        self.limites = limites
+        self._contexte = mp_context or multiprocessing.get_context()
+        self._initialisation = (initializer, initargs)
+        self._workers = [self._nouveau_worker() for _ in range(max(1, nb_workers))]
+        self._en_attente = deque() # (future, fonction, args)
+        self._verrou = threading.Lock()
+        self._reveil_lecture, self._reveil_ecriture = self._contexte.Pipe(duplex=False)
+        self._arret = False
+        self._superviseur = threading.Thread(target=self._superviser, name="pool-isole", daemon=True)
+        self._superviseur.start()
+
+    def submit(self, fonction, *args):
+        future = Future()
+        with self._verrou:
+            if self._arret:
+                raise RuntimeError("PoolIsole arrêté")
+            self._en_attente.append((future, fonction, args))
+        self._reveil_ecriture.send(None)
+        return future
+
+    def shutdown(self, wait=True):
+        with self._verrou:
+            self._arret = True
+        self._reveil_ecriture.send(None)
+        if wait:
+            self._superviseur.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.shutdown()
+
+    def _nouveau_worker(self):
+        return _Worker(self._contexte, self.limites.memoire, *self._initialisation)
+
+    def _remplacer(self, worker, exception=None):
+        """Remplace un processus : tué pendant son document (exception transmise au futur), ou arrêté au repos."""
+        if exception is not None:
+            future, _ = worker.tache
+            worker.tache = None
+        worker.arreter(tuer=exception is not None)
+        self._workers[self._workers.index(worker)] = self._nouveau_worker()
+        if exception is not None:
+            future.set_exception(exception)
+
+    def _distribuer(self):
+        with self._verrou:
+            for worker in self._workers:
+                if worker.tache is not None or not self._en_attente:
+                    continue
+                future, fonction, args = self._en_attente.popleft()
+                if not future.set_running_or_notify_cancel():
+                    continue
+                echeance = time.monotonic() + self.limites.delai if self.limites.delai else None
+                worker.tache = (future, echeance)
+                try:
+                    worker.conn.send((fonction, args))
+                except OSError as e:
+                    worker.tache = None
+                    future.set_exception(ProcessusInterrompu(str(e)))
+
+    def _superviser(self):
+        while True:
+            self._distribuer()
+            occupes = [worker for worker in self._workers if worker.tache is not None]
+            with self._verrou:
+                if self._arret and not occupes and not self._en_attente:
+                    break
+            echeances = [worker.tache[1] for worker in occupes if worker.tache[1] is not None]
+            attente = max(0.0, min(echeances) - time.monotonic()) if echeances else None
+            prets = multiprocessing.connection.wait(
+                [self._reveil_lecture] + [worker.conn for worker in occupes], timeout=attente
+            )
+            for conn in prets:
+                if conn is self._reveil_lecture:
+                    conn.recv()
+                    continue
+                worker = next(w for w in occupes if w.conn is conn)
+                try:
+                    reussi, valeur, a_remplacer = conn.recv()
+                except (EOFError, OSError):
+                    worker.processus.join(1) # Pour connaître son code de sortie
+                    self._remplacer(worker, ProcessusInterrompu(
+                        f"processus d'analyse arrêté (code {worker.processus.exitcode})"))
+                    continue
+                future, _ = worker.tache
+                worker.tache = None
+                if a_remplacer:
+                    self._remplacer(worker) # Mémoire retenue par les documents précédents
+                if reussi:
+                    future.set_result(valeur)
+                else:
+                    future.set_exception(valeur)
+            maintenant = time.monotonic()
+            for worker in occupes:
+                if worker.tache is not None and worker.tache[1] is not None and worker.tache[1] <= maintenant:
+                    self._remplacer(worker, DelaiDepasse(f"délai de {self.limites.delai:g} s dépassé"))
+        for worker in self._workers:
+            worker.arreter()
+        self._reveil_lecture.close()
+        self._reveil_ecriture.close()
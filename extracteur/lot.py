@@ -0,0 +1,107 @@
+from extracteur.archive import ArchiveSortie
+from extracteur.doublons import DetecteurDoublons, lignes_doublons
+from extracteur.export import NOM_RECAPITULATIF, RecapitulatifMultiple, ouvrir_recapitulatif
+from extracteur.extraction import signaler_log
+from extracteur.maitre import ouvrir_maitre
+from extracteur.performance import etape_mesuree
+from extracteur.reprise import reprendre_traitements
+from extracteur.traitement import BilanTraitement, iterer_traitements
+
+
+def traiter_lot(sources, chemin_zip, recapitulatifs, nb_workers=1, on_fichier_termine=None, cache=None,
+                signaler=signaler_log, mesures=None, manifeste=None, feuille_performance=False, memoire_max=None,
+                dedoublonner=False, limites=None, maitre=None, textes=None, en_processus=False):
+    """
+    Traite un lot complet, sans interface (ligne de commande, travaux en arrière-plan) :
+    PDF renommés écrits dans l'archive chemin_zip, récapitulatifs écrits en flux puis ajoutés à l'archive.
+    recapitulatifs : {format: chemin}, ex. {"xlsx": "/tmp/recap.xlsx"} ; chacun est nommé
+    NOM_RECAPITULATIF.format dans l'archive. Un format indisponible (pyarrow absent...) est signalé et ignoré.
+    memoire_max (octets) : budget des contenus de PDF gardés en mémoire par le pipeline (None : sans limite).
+    Avec dedoublonner, les PDF au contenu identique à un PDF déjà présent dans le lot ne sont traités
+    qu'une fois ; les doublons ignorés sont listés dans bilan.doublons et la feuille "Doublons" (xlsx).
+    limites (LimitesDocument) : délai et mémoire max par PDF, analysé dans un processus isolé.
+    maitre : chemin d'un récapitulatif maître (.xlsx, ou dossier Parquet) mis à jour avec les lignes du lot,
+    par "Reference Rapport" (voir extracteur/maitre.py) ; résultat dans bilan.maitre, avec les lignes du lot
+    écartées au profit d'une ligne suivante de même référence ("ecartees").
+    textes (MagasinTextes) : magasin où enregistrer le texte des PDF extraits (voir extracteur/textes.py).
+    en_processus : analyse toujours dans un pool de processus, jamais dans un thread de ce processus (voir
+    iterer_traitements) ; obligatoire pour un lot lancé depuis un thread à côté d'autres lots.
+    Les sources (ZIP ouverts), le cache, le magasin de textes et le manifeste restent à fermer par l'appelant.
+    Retourne: bilan, chemin_zip (None si archive vide ou en erreur), {format: chemin} des récapitulatifs écrits
+    """
+    ouverts = {}
+    for format_sortie, chemin in recapitulatifs.items():
+        try:
+            ouverts[format_sortie] = ouvrir_recapitulatif(chemin, format_sortie)
+        except Exception as e:
+            signaler("warning", f"⚠️ Récapitulatif {format_sortie} indisponible : {e}")
+    maitre_ouvert = None
+    if maitre is not None:
+        try:
+            maitre_ouvert = ouvrir_maitre(maitre, signaler)
+        except Exception as e:
+            signaler("error", f"❌ Récapitulatif maître '{maitre}' indisponible : {e}")
+    recapitulatif = RecapitulatifMultiple(list(ouverts.values()) + ([maitre_ouvert] if maitre_ouvert else []))
+    archive_sortie = ArchiveSortie(chemin_zip)
+    bilan = BilanTraitement(len(sources), recapitulatif)
+
+    # Doublons repérés au fil de l'extraction (les sources ne sont parcourues qu'une fois)
+    doublons = DetecteurDoublons() if dedoublonner else None
+
+    try:
+        if manifeste is not None:
+            resultats = reprendre_traitements(sources, archive_sortie, manifeste, nb_workers, on_fichier_termine,
+                                              cache, signaler, mesures, memoire_max, limites, textes, doublons,
+                                              en_processus)
+        else:
+            resultats = iterer_traitements(sources, archive_sortie, nb_workers, on_fichier_termine, cache, signaler,
+                                           mesures, None, memoire_max, limites, textes, doublons, en_processus)
+        for resultat in resultats:
+            # Mise à jour compteurs et détails d'échec (la ligne part aussitôt dans les récapitulatifs)
+            bilan.enregistrer(*resultat)
+        if doublons is not None:
+            bilan.doublons = lignes_doublons(doublons.doublons)
+    except BaseException:
+        recapitulatif.abandonner()
+        archive_sortie.abandonner()
+        raise
+
+    # --- Finalisation des récapitulatifs (lignes déjà écrites) ---
+    ecrits = {}
+    if bilan.nb_lignes:
+        if bilan.doublons:
+            recapitulatif.ajouter_feuille("Doublons", bilan.doublons)
+        if mesures is not None and feuille_performance:
+            recapitulatif.ajouter_feuille("Performance", mesures.lignes_fichiers())
+        for format_sortie, ouvert in ouverts.items():
+            try:
+                with etape_mesuree(mesures, "excel"):
+                    ecrits[format_sortie] = ouvert.fermer()
+            except Exception as e:
+                signaler("error", f"❌ Erreur lors de la génération du récapitulatif {format_sortie} : {e}")
+                ouvert.abandonner()
+        if maitre_ouvert is not None:
+            try:
+                with etape_mesuree(mesures, "maitre"):
+                    maitre_ouvert.fermer()
+                bilan.maitre = {"chemin": maitre, "ajoutees": maitre_ouvert.nb_ajoutees,
+                                "mises_a_jour": maitre_ouvert.nb_mises_a_jour,
+                                "ecartees": maitre_ouvert.lignes_ecartees}
+            except Exception as e:
+                signaler("error", f"❌ Erreur lors de la mise à jour du récapitulatif maître : {e}")
+                maitre_ouvert.abandonner()
+    else:
+        recapitulatif.abandonner()
+        signaler("warning", "⚠️ Aucune donnée extraite avec succès pour générer le récapitulatif.")
+
+    # --- Finalisation ZIP (PDF déjà ajoutés, récapitulatifs en dernier) ---
+    try:
+        with etape_mesuree(mesures, "finalisation"):
+            for format_sortie, chemin in ecrits.items():
+                archive_sortie.ajouter_fichier(chemin, f"{NOM_RECAPITULATIF}.{format_sortie}")
+            chemin_zip = archive_sortie.fermer()
+    except Exception as e:
+        signaler("error", f"❌ Erreur critique lors de la création de l'archive ZIP : {e}")
+        archive_sortie.abandonner()
+        chemin_zip = None
+    return bilan, chemin_zip, ecrits
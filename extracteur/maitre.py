@@ -0,0 +1,371 @@
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from extracteur.export import COLONNES_ORDRE, RecapitulatifEnFlux, RecapitulatifExcel, RecapitulatifParquet
+
+try:
+    import fcntl
+except ImportError: # Windows : seul le verrou entre threads du même processus s'applique
+    fcntl = None
+
+NOM_INDEX_MAITRE = "index.sqlite"
+NOM_VERROU_MAITRE = "maitre.verrou"
+DOSSIER_PARTIES = "parties"
+
+_verrous_locaux = {} # chemin du verrou -> threading.Lock (traitements simultanés de l'interface)
+_verrou_registre = threading.Lock()
+
+
+@contextmanager
+def _verrou_fichier(chemin):
+    """
+    Verrou exclusif sur le fichier chemin (créé au besoin), entre threads et entre processus : deux traitements
+    qui mettent à jour le même maître le font l'un après l'autre au lieu de perdre les lignes de l'autre.
+    """
+    with _verrou_registre:
+        verrou_local = _verrous_locaux.setdefault(os.path.abspath(chemin), threading.Lock())
+    with verrou_local, open(chemin, "a") as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def cle_ligne(ligne):
+    """
+    Clé d'upsert d'une ligne du récapitulatif maître : la "Reference Rapport".
+    Sans référence, le nom du fichier d'origine (préfixé) évite de fusionner des rapports différents.
+    Les valeurs non textuelles (cellule numérique saisie à la main dans le classeur) sont converties en texte.
+    """
+    reference = str(ligne.get("Reference Rapport") or "").strip()
+    if reference:
+        return reference
+    return "fichier:" + str(ligne.get("Nom Fichier Original") or "")
+
+
+class _RecapitulatifMaitre(RecapitulatifEnFlux):
+    """
+    Base des récapitulatifs maîtres : une ligne par clé (cle_ligne). Deux lignes du même lot à la même clé
+    (PDF différents, même référence) : la dernière est gardée, l'autre notée dans lignes_ecartees.
+    """
+
+    def __init__(self, chemin):
+        super().__init__(chemin)
+        self.nb_ajoutees = 0
+        self.nb_mises_a_jour = 0
+        self.lignes_ecartees = [] # {"Clé", "Fichier écarté", "Fichier gardé"} : lignes du lot remplacées dans le lot
+        self._fichiers = {} # clé -> fichier d'origine de sa dernière ligne dans le lot
+
+    def _cle(self, ligne):
+        """Clé de la ligne ; note la ligne du lot qu'elle remplace s'il y en a une."""
+        cle = cle_ligne(ligne)
+        fichier = str(ligne.get("Nom Fichier Original") or "")
+        if cle in self._fichiers:
+            self.lignes_ecartees.append({"Clé": cle, "Fichier écarté": self._fichiers[cle], "Fichier gardé": fichier})
+        self._fichiers[cle] = fichier
+        return cle
+
+
+class MaitreParquet(_RecapitulatifMaitre):
+    """
+    Récapitulatif maître en Parquet, mis à jour lot après lot sans relire l'historique.
+    Le dossier contient des parties (un fichier Parquet écrit par lot, en flux) et un index SQLite
+    clé -> (partie, rang) de la version courante de chaque ligne. Une mise à jour écrit la partie du lot
+    et ne touche l'index que pour ses clés : son coût dépend de la taille du lot, pas de l'historique.
+    Les lignes remplacées restent dans les anciennes parties jusqu'au compactage, fait quand elles deviennent
+    plus nombreuses que les lignes courantes (coût amorti). Lecture : lire_maitre_parquet(dossier).
+    """
+    extension = "parquet"
+
+    def __init__(self, dossier):
+        os.makedirs(os.path.join(dossier, DOSSIER_PARTIES), exist_ok=True)
+        self.dossier = dossier
+        self.nom_partie = f"lot_{time.strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:12]}.parquet"
+        super().__init__(os.path.join(dossier, DOSSIER_PARTIES, self.nom_partie))
+        self._partie = RecapitulatifParquet(self.chemin)
+        self._rangs = {} # clé -> rang de sa dernière ligne dans la partie du lot
+
+    def ajouter(self, ligne):
+        self._rangs[self._cle(ligne)] = self.nb_lignes
+        self._partie.ajouter(ligne)
+        self.nb_lignes += 1
+
+    def fermer(self):
+        if self._partie is None:
+            return self.dossier
+        self._partie.fermer()
+        self._partie = None
+        with _verrou_fichier(os.path.join(self.dossier, NOM_VERROU_MAITRE)):
+            with _connexion_index(self.dossier) as conn:
+                for cle, rang in self._rangs.items():
+                    if conn.execute("SELECT 1 FROM lignes WHERE cle = ?", (cle,)).fetchone():
+                        self.nb_mises_a_jour += 1
+                    else:
+                        self.nb_ajoutees += 1
+                    conn.execute("INSERT OR REPLACE INTO lignes (cle, partie, rang) VALUES (?, ?, ?)",
+                                 (cle, self.nom_partie, rang))
+                conn.execute("INSERT INTO parties (partie, nb_lignes) VALUES (?, ?)", (self.nom_partie, self.nb_lignes))
+            _compacter_si_necessaire(self.dossier)
+        return self.dossier
+
+    def abandonner(self):
+        if self._partie is not None:
+            self._partie.abandonner()
+            self._partie = None
+
+
+class MaitreExcel(_RecapitulatifMaitre):
+    """
+    Récapitulatif maître XLSX. Seules les lignes du lot sont gardées en mémoire (par clé) ; à la fermeture,
+    le classeur existant est relu en flux (openpyxl read_only) et réécrit en flux : les lignes dont la clé est
+    dans le lot sont remplacées sur place, les nouvelles ajoutées à la fin. Le format XLSX (XML compressé)
+    impose de réécrire le fichier, mais sans le charger entièrement ni passer par pandas.
+    Les colonnes ajoutées par l'utilisateur (ex. "Notes internes") et le nom de la feuille sont conservés ;
+    une ligne mise à jour garde ses valeurs dans ces colonnes. Un classeur à plusieurs feuilles, ou dont
+    l'en-tête a des cellules vides ou en double, n'est jamais réécrit (ValueError, dès l'ouverture).
+    La relecture et le remplacement se font sous verrou (fichier .nom.xlsx.verrou à côté du classeur).
+    Seules les valeurs sont réécrites : la mise en forme du classeur (largeurs, filtres, couleurs...) est perdue ;
+    signaler (facultatif) en reçoit l'avertissement dès l'ouverture, avant le traitement du lot.
+    """
+    extension = "xlsx"
+
+    def __init__(self, chemin, signaler=None):
+        super().__init__(chemin)
+        _structure_excel(chemin) # Classeur impossible à réécrire sans perte : refusé avant le traitement du lot
+        perdues = _mises_en_forme(chemin)
+        if perdues and signaler is not None:
+            signaler("warning", f"⚠️ Le classeur maître '{chemin}' sera réécrit sans sa mise en forme "
+                                f"({', '.join(perdues)}) : seules les valeurs sont conservées.")
+        self._lot = {} # clé -> ligne, ordre d'arrivée
+        self._ferme = False
+
+    def ajouter(self, ligne):
+        self._lot[self._cle(ligne)] = {colonne: ligne.get(colonne, "") for colonne in COLONNES_ORDRE}
+        self.nb_lignes += 1
+
+    def fermer(self):
+        if self._ferme:
+            return self.chemin
+        self._ferme = True
+        dossier, nom = os.path.split(os.path.abspath(self.chemin))
+        with _verrou_fichier(os.path.join(dossier, f".{nom}.verrou")):
+            titre_feuille, entete = _structure_excel(self.chemin) or ("Sheet1", [])
+            colonnes = entete + [colonne for colonne in COLONNES_ORDRE if colonne not in entete]
+            fd, chemin_temp = tempfile.mkstemp(suffix=".xlsx", dir=dossier) # Même disque : remplacement atomique
+            os.close(fd)
+            nouveau = RecapitulatifExcel(chemin_temp, colonnes, titre_feuille)
+            lignes = _lignes_excel(self.chemin)
+            try:
+                for ligne in lignes:
+                    remplacante = self._lot.pop(cle_ligne(ligne), None)
+                    if remplacante is not None:
+                        self.nb_mises_a_jour += 1
+                        ligne.update(remplacante) # Les colonnes de l'utilisateur gardent leur valeur
+                    nouveau.ajouter(ligne)
+                for ligne in self._lot.values():
+                    self.nb_ajoutees += 1
+                    nouveau.ajouter(ligne)
+                nouveau.fermer()
+            except BaseException:
+                nouveau.abandonner()
+                raise
+            finally:
+                lignes.close()
+            os.replace(chemin_temp, self.chemin)
+        return self.chemin
+
+    def abandonner(self):
+        self._ferme = True # Le maître existant reste intact
+
+
+def _structure_excel(chemin):
+    """
+    (nom de la feuille, en-tête) d'un classeur maître existant, ou None s'il n'existe pas.
+    Lève ValueError si le classeur ne peut pas être réécrit sans perte (plusieurs feuilles, en-tête incomplet).
+    """
+    if not os.path.exists(chemin):
+        return None
+    from openpyxl import load_workbook
+
+    classeur = load_workbook(chemin, read_only=True)
+    try:
+        if len(classeur.worksheets) != 1:
+            raise ValueError(f"le classeur maître '{chemin}' a {len(classeur.worksheets)} feuilles "
+                             f"({', '.join(classeur.sheetnames)}) ; il ne serait pas réécrit sans perte")
+        feuille = classeur.worksheets[0]
+        entete = list(next(feuille.iter_rows(max_row=1, values_only=True), ()))
+    finally:
+        classeur.close()
+    while entete and entete[-1] is None:
+        entete.pop()
+    if any(colonne is None for colonne in entete) or len(set(entete)) != len(entete):
+        raise ValueError(f"l'en-tête du classeur maître '{chemin}' a des colonnes vides ou en double ; "
+                         "il ne serait pas réécrit sans perte")
+    return feuille.title, [str(colonne) for colonne in entete]
+
+
+# Éléments de la feuille (XML) qu'une réécriture en flux ne reproduit pas, et membres de l'archive xlsx
+_MISES_EN_FORME_FEUILLE = {"cols": "largeurs de colonnes", "pane": "volets figés", "autoFilter": "filtre",
+                           "conditionalFormatting": "mise en forme conditionnelle", "mergeCell": "cellules fusionnées",
+                           "dataValidation": "listes de validation", "hyperlink": "liens"}
+_MISES_EN_FORME_ARCHIVE = {"xl/tables/": "tableaux", "xl/drawings/": "images ou graphiques", "xl/comments": "commentaires"}
+
+
+def _mises_en_forme(chemin):
+    """
+    Mises en forme d'un classeur maître existant que sa réécriture perdrait (libellés), [] s'il n'en a pas ou
+    n'existe pas. La feuille est parcourue en flux ; le style de l'en-tête (écrit en gras par l'export) est ignoré.
+    """
+    if not os.path.exists(chemin):
+        return []
+    import zipfile
+    from xml.etree.ElementTree import iterparse
+
+    trouvees = []
+    with zipfile.ZipFile(chemin) as archive:
+        noms = archive.namelist()
+        for prefixe, libelle in _MISES_EN_FORME_ARCHIVE.items():
+            if any(nom.startswith(prefixe) for nom in noms):
+                trouvees.append(libelle)
+        feuilles = sorted(nom for nom in noms if nom.startswith("xl/worksheets/sheet"))
+        if not feuilles:
+            return trouvees
+        with archive.open(feuilles[0]) as feuille:
+            premiere_ligne = True
+            for _, element in iterparse(feuille):
+                balise = element.tag.rsplit("}", 1)[-1]
+                libelle = _MISES_EN_FORME_FEUILLE.get(balise)
+                if balise == "row":
+                    if not premiere_ligne and element.get("s") is not None and "couleurs et formats" not in trouvees:
+                        trouvees.append("couleurs et formats")
+                    premiere_ligne = False
+                    element.clear()
+                elif balise == "c":
+                    if not premiere_ligne and element.get("s") not in (None, "0") and "couleurs et formats" not in trouvees:
+                        trouvees.append("couleurs et formats")
+                elif libelle is not None and libelle not in trouvees:
+                    trouvees.append(libelle)
+    return trouvees
+
+
+def _lignes_excel(chemin):
+    """Lignes (dicts par en-tête) de la première feuille d'un classeur, lues en flux ; rien s'il n'existe pas."""
+    if not os.path.exists(chemin):
+        return
+    from openpyxl import load_workbook
+
+    classeur = load_workbook(chemin, read_only=True)
+    try:
+        lignes = classeur.worksheets[0].iter_rows(values_only=True)
+        entete = next(lignes, None)
+        if entete is None:
+            return
+        for valeurs in lignes:
+            if any(valeur is not None for valeur in valeurs):
+                yield {str(colonne): ("" if valeur is None else valeur) for colonne, valeur in zip(entete, valeurs)
+                       if colonne is not None}
+    finally:
+        classeur.close()
+
+
+def ouvrir_maitre(chemin, signaler=None):
+    """
+    Récapitulatif maître : MaitreExcel pour un chemin .xlsx, MaitreParquet (dossier, créé au besoin) sinon.
+    Lève ValueError pour un fichier existant autre qu'un .xlsx (ex. un fichier .parquet) : le maître Parquet
+    est un dossier. signaler : voir MaitreExcel.
+    """
+    if chemin.lower().endswith(".xlsx"):
+        return MaitreExcel(chemin, signaler)
+    if os.path.exists(chemin) and not os.path.isdir(chemin):
+        raise ValueError(f"'{chemin}' est un fichier : le récapitulatif maître est un classeur .xlsx "
+                         "ou un dossier Parquet (créé au besoin)")
+    return MaitreParquet(chemin)
+
+
+@contextmanager
+def _connexion_index(dossier):
+    """Connexion à l'index du maître Parquet : une transaction, validée si le bloc se termine sans erreur."""
+    conn = sqlite3.connect(os.path.join(dossier, NOM_INDEX_MAITRE), timeout=30)
+    try:
+        conn.execute("CREATE TABLE IF NOT EXISTS lignes (cle TEXT PRIMARY KEY, partie TEXT NOT NULL, rang INTEGER NOT NULL)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_lignes_partie ON lignes (partie)")
+        conn.execute("CREATE TABLE IF NOT EXISTS parties (partie TEXT PRIMARY KEY, nb_lignes INTEGER NOT NULL)")
+        yield conn
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _tables_courantes(dossier, conn):
+    """Lignes courantes, partie par partie (pyarrow.Table), dans l'ordre d'écriture des parties."""
+    import pyarrow.parquet as pq
+
+    for (partie,) in conn.execute("SELECT partie FROM parties ORDER BY rowid").fetchall():
+        rangs = [rang for (rang,) in conn.execute(
+            "SELECT rang FROM lignes WHERE partie = ? ORDER BY rang", (partie,))]
+        if rangs:
+            yield partie, pq.read_table(os.path.join(dossier, DOSSIER_PARTIES, partie)).take(rangs)
+
+
+def lire_maitre_parquet(dossier):
+    """Version courante du récapitulatif maître Parquet (une ligne par clé), en pyarrow.Table."""
+    import pyarrow as pa
+
+    with _connexion_index(dossier) as conn:
+        tables = [table for _, table in _tables_courantes(dossier, conn)]
+    if not tables:
+        return pa.table({colonne: pa.array([], pa.string()) for colonne in COLONNES_ORDRE})
+    return pa.concat_tables(tables)
+
+
+def _compacter_si_necessaire(dossier):
+    """Réécrit le maître en une seule partie quand les lignes remplacées dépassent les lignes courantes."""
+    with _connexion_index(dossier) as conn:
+        total = conn.execute("SELECT COALESCE(SUM(nb_lignes), 0), COUNT(*) FROM parties").fetchone()
+        courantes = conn.execute("SELECT COUNT(*) FROM lignes").fetchone()[0]
+    if total[1] <= 1 or total[0] - courantes <= courantes:
+        return
+    _compacter(dossier) # Appelé sous le verrou du maître
+
+
+def compacter_maitre_parquet(dossier):
+    """Regroupe les lignes courantes du maître Parquet dans une seule partie et supprime les anciennes."""
+    with _verrou_fichier(os.path.join(dossier, NOM_VERROU_MAITRE)):
+        _compacter(dossier)
+
+
+def _compacter(dossier):
+    import pyarrow.parquet as pq
+
+    nom_partie = f"compacte_{time.strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:12]}.parquet"
+    chemin_partie = os.path.join(dossier, DOSSIER_PARTIES, nom_partie)
+    with _connexion_index(dossier) as conn:
+        anciennes = [partie for (partie,) in conn.execute("SELECT partie FROM parties")]
+        writer = None
+        rang = 0
+        try:
+            for partie, table in _tables_courantes(dossier, conn):
+                if writer is None:
+                    writer = pq.ParquetWriter(chemin_partie, table.schema)
+                writer.write_table(table)
+                cles = [cle_ligne(ligne) for ligne in table.select(["Reference Rapport", "Nom Fichier Original"]).to_pylist()]
+                conn.executemany("UPDATE lignes SET partie = ?, rang = ? WHERE cle = ?",
+                                 [(nom_partie, rang + i, cle) for i, cle in enumerate(cles)])
+                rang += len(cles)
+        finally:
+            if writer is not None:
+                writer.close()
+        conn.execute("DELETE FROM parties")
+        if rang:
+            conn.execute("INSERT INTO parties (partie, nb_lignes) VALUES (?, ?)", (nom_partie, rang))
+    for partie in anciennes:
+        try: os.remove(os.path.join(dossier, DOSSIER_PARTIES, partie))
+        except OSError: pass
@@ -0,0 +1,106 @@
+import hashlib
+import json
+import re
+from collections import namedtuple
+
+from extracteur.champs import CHAMPS, compiler_table
+
+# --- Registre des modèles de rapport ---
+# Chaque organisme d'inspection a sa mise en page : un modèle déclare ses mots d'empreinte (cherchés en page 1)
+# et sa table de champs (même format que CHAMPS, colonnes de COLONNES_ORDRE).
+# Le premier modèle enregistré sert aussi aux documents qu'aucune empreinte ne reconnaît.
+Modele = namedtuple("Modele", ["nom", "empreintes", "table"])
+
+MODELE_PAR_DEFAUT = "greenprime"
+
+# Clés ajoutées aux données extraites (hors COLONNES_ORDRE : absentes des récapitulatifs)
+CLE_MODELE = "Modele Rapport"
+CLE_DUREE_ANALYSE = "Duree Analyse (ms)"
+
+_MODELES = {} # nom -> Modele, dans l'ordre d'enregistrement
+_DEFINITIONS = {} # nom -> (empreintes, champs), pour la signature du registre
+_aiguillage = None # (motif compilé, [(mot, noms des modèles)]), reconstruit après chaque enregistrement
+_signature = None
+
+
+def enregistrer_modele(nom, empreintes, champs):
+    """
+    Ajoute (ou remplace) un modèle de rapport. empreintes : mots (insensibles à la casse) propres à ce modèle
+    en page 1 ; champs : table au format de CHAMPS.
+    Les processus d'un pool démarré ensuite reçoivent le registre à leur démarrage (voir definitions_modeles).
+    """
+    global _aiguillage, _signature
+    _MODELES[nom] = Modele(nom, tuple(empreintes), compiler_table(champs))
+    _DEFINITIONS[nom] = (list(empreintes), champs)
+    _aiguillage = None
+    _signature = None
+
+
+def definitions_modeles():
+    """Définitions du registre (nom -> (empreintes, champs)), dans l'ordre : à transmettre aux processus d'un pool."""
+    return dict(_DEFINITIONS)
+
+
+def installer_modeles(definitions):
+    """
+    Remplace le registre par definitions (voir definitions_modeles) : initialisation des processus d'un pool, qui
+    ne partagent pas la mémoire du processus qui les lance ('forkserver', 'spawn').
+    """
+    _MODELES.clear()
+    _DEFINITIONS.clear()
+    for nom, (empreintes, champs) in definitions.items():
+        enregistrer_modele(nom, empreintes, champs)
+
+
+def noms_modeles():
+    """Noms des modèles enregistrés, dans l'ordre d'enregistrement."""
+    return list(_MODELES)
+
+
+def _construire_aiguillage():
+    modeles_par_mot = {}
+    for modele in _MODELES.values():
+        for mot in modele.empreintes:
+            modeles_par_mot.setdefault(mot.casefold(), (mot, []))[1].append(modele.nom)
+    # Mots les plus longs d'abord : à une même position, "BAR-TH-1" l'emporte sur "BAR-TH-"
+    mots = sorted(modeles_par_mot.values(), key=lambda entree: -len(entree[0]))
+    motif = re.compile("|".join(f"({re.escape(mot)})" for mot, _ in mots), re.IGNORECASE) if mots else None
+    return motif, mots
+
+
+def choisir_modele(text_page1):
+    """
+    Modèle d'un document d'après sa page 1, en un seul parcours du texte : une alternative compilée de tous
+    les mots d'empreinte remplace l'essai des motifs de chaque modèle.
+    Le modèle qui reconnaît le plus de mots distincts l'emporte (à égalité : la plus grande part de ses mots,
+    puis l'ordre d'enregistrement) ; aucun mot reconnu : le premier modèle enregistré.
+    """
+    global _aiguillage
+    if _aiguillage is None:
+        _aiguillage = _construire_aiguillage()
+    motif, mots = _aiguillage
+    trouves = set()
+    if motif is not None:
+        for m in motif.finditer(text_page1):
+            trouves.add(m.lastindex - 1)
+    if not trouves:
+        return next(iter(_MODELES.values()))
+    scores = {}
+    for i in trouves:
+        for nom in mots[i][1]:
+            scores[nom] = scores.get(nom, 0) + 1
+    meilleur = max(_MODELES.values(), key=lambda modele: (
+        scores.get(modele.nom, 0), scores.get(modele.nom, 0) / max(1, len(modele.empreintes))))
+    return meilleur
+
+
+def signature_modeles():
+    """Empreinte courte du registre (modèles et tables) : le cache et la reprise ignorent les résultats d'un autre registre."""
+    global _signature
+    if _signature is None:
+        texte = json.dumps(list(_DEFINITIONS.items()), ensure_ascii=False, sort_keys=True)
+        _signature = hashlib.sha256(texte.encode("utf-8")).hexdigest()[:12]
+    return _signature
+
+
+enregistrer_modele(MODELE_PAR_DEFAUT, ["Référence du rapport", "BAR-TH-"], CHAMPS)
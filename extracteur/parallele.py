@@ -0,0 +1,168 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from extracteur.cache import decider_analyse
+from extracteur.extraction import extraire_donnees_pdf
+from extracteur.ingestion import nom_source, ouvrir_source
+from extracteur.isolation import DelaiDepasse, PoolIsole
+from extracteur.modeles import definitions_modeles, installer_modeles
+from extracteur.performance import noter
+
+FENETRE_PAR_WORKER = 4 # Fichiers lus d'avance par processus (borne la mémoire des contenus de ZIP)
+
+
+def nombre_workers_par_defaut():
+    """Nombre de processus proposé par défaut : un par cœur disponible."""
+    return os.cpu_count() or 1
+
+
+def _contexte_multiprocessing():
+    # Pas de 'fork' : ce processus a des threads (étages du pipeline, travaux et serveur Streamlit), un fils
+    # copié pendant qu'un autre thread tient un verrou (logging, allocateur...) peut s'y bloquer.
+    # Les fils de 'forkserver' et 'spawn' ré-importent le module principal sous "__mp_main__" (Streamlit installe
+    # main.py comme __main__ : son interface ne s'exécute que si __name__ == "__main__"), puis ce module pour
+    # _extraire_dans_worker ; le registre des modèles leur est transmis au démarrage (installer_modeles).
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        contexte = multiprocessing.get_context("forkserver")
+        # Importés une fois dans le serveur, hérités par chaque processus qu'il démarre
+        contexte.set_forkserver_preload(["__main__", __name__])
+        return contexte
+    return multiprocessing.get_context("spawn")
+
+
+def _extraire_dans_worker(pdf_path, contenu, mesurer=False, lire_textes=False):
+    """
+    Exécuté dans un processus du pool : retourne les données, les messages collectés, les temps (ou None)
+    et, avec lire_textes, le texte des pages lues (pour le magasin de textes ; None sinon).
+    """
+    messages = []
+    temps = {} if mesurer else None
+    pages = [] if lire_textes else None
+    donnees = extraire_donnees_pdf(pdf_path, lambda niveau, message: messages.append((niveau, message)), contenu, temps,
+                                   pages)
+    return donnees, messages, temps, pages or None
+
+
+def _message_erreur(pdf_path, e):
+    nom_fichier = os.path.basename(pdf_path)
+    return ("error", f"❌ Erreur extraction données PDF '{nom_fichier}' : {type(e).__name__} - {e}")
+
+
+def extraire_en_parallele(sources, nb_workers, on_fichier_termine=None, cache=None, mesurer=False, budget=None,
+                          limites=None, textes=None, manifeste=None, doublons=None):
+    """
+    Extrait les données de plusieurs PDF (chemins ou SourcePDF) dans un pool de processus.
+    Produit (source, contenu, empreinte, donnees, messages, temps, echec, pages) dans l'ordre des sources, quel que
+    soit l'ordre de fin, pour que le renommage reste identique à un traitement séquentiel. contenu (octets lus
+    pour une SourcePDF, None pour un chemin) est rendu pour écrire le PDF renommé sans le relire.
+    on_fichier_termine(nb_termines) est appelé dès qu'un fichier est terminé (barre de progression).
+    Chaque PDF lu passe d'abord par decider_analyse (empreinte calculée une fois, rendue avec le résultat) :
+    doublon d'un PDF déjà vu (doublons : DetecteurDoublons, echec = "doublon", contenu None), source rejouable
+    depuis le manifeste (echec = "repris", à rejouer par l'appelant), résultat en cache ; ceux-là ne passent
+    pas par le pool. Seul ce processus lit et écrit le cache.
+    Au plus FENETRE_PAR_WORKER * nb_workers fichiers sont lus et pas encore rendus, pour borner la mémoire.
+    Avec budget (BudgetOctets), chaque contenu lu y est pris (et rendu par l'étage qui consomme les résultats,
+    voir en_etage) ; la lecture d'avance s'arrête dès que le budget est plein (un fichier est toujours lu quand
+    aucun n'attend le pool, même plus gros que le budget).
+    Avec mesurer=True, temps contient la durée des étapes (lecture, cache, extraction) ; sinon None.
+    Avec limites (LimitesDocument), chaque PDF est analysé dans un PoolIsole : un PDF trop long est abandonné
+    avec echec = "timeout" sans bloquer les autres.
+    Avec textes (MagasinTextes), pages est le texte des pages lues par l'analyse (None si le PDF n'est pas passé
+    par le pool).
+    """
+    fenetre = FENETRE_PAR_WORKER * nb_workers
+    # Le registre des modèles (enregistrer_modele) est transmis explicitement : les processus ne le partagent pas
+    initialisation = {"initializer": installer_modeles, "initargs": (definitions_modeles(),)}
+    if limites is not None:
+        pool = PoolIsole(nb_workers, limites, _contexte_multiprocessing(), **initialisation)
+    else:
+        pool = ProcessPoolExecutor(max_workers=nb_workers, mp_context=_contexte_multiprocessing(), **initialisation)
+    with pool as executor:
+        en_cours = {} # future -> index
+        empreintes = {} # index -> hash du PDF (cache, magasin de textes, manifeste)
+        infos = {} # index -> (source, pdf_path, contenu, temps) pour les fichiers lus et pas encore rendus
+        resultats_prets = {} # index -> (donnees, messages, temps du worker, pages), en attente des fichiers précédents
+        echecs = {} # index -> "timeout", "doublon" ou "repris" pour les PDF que le pool n'a pas analysés jusqu'au bout
+        sources_restantes = enumerate(sources)
+        nb_lues = 0
+        prochain_index = 0
+        nb_termines = 0
+
+        def fichier_termine(index, resultat):
+            nonlocal nb_termines
+            resultats_prets[index] = resultat
+            nb_termines += 1
+            if on_fichier_termine:
+                on_fichier_termine(nb_termines)
+
+        while True:
+            # Alimenter le pool tant que la fenêtre le permet
+            while nb_lues - prochain_index < fenetre:
+                if budget is not None and budget.plein and nb_lues > prochain_index:
+                    break
+                suivante = next(sources_restantes, None)
+                if suivante is None:
+                    break
+                index, source = suivante
+                nb_lues += 1
+                temps = {} if mesurer else None
+                if mesurer: debut = time.perf_counter()
+                try:
+                    pdf_path, contenu = ouvrir_source(source)
+                except Exception as e:
+                    # Membre de ZIP illisible (CRC, archive corrompue...)
+                    infos[index] = (source, nom_source(source), None, temps)
+                    fichier_termine(index, (None, [_message_erreur(nom_source(source), e)], None, None))
+                    continue
+                if mesurer: noter(temps, "lecture", debut)
+                empreinte, echec, donnees = decider_analyse(source, pdf_path, contenu, cache, textes, manifeste, doublons,
+                                                            temps)
+                empreintes[index] = empreinte
+                if echec == "doublon":
+                    contenu = None # Rien à écrire : pas gardé en mémoire
+                if contenu is not None and budget is not None:
+                    budget.prendre(len(contenu))
+                infos[index] = (source, pdf_path, contenu, temps)
+                if echec is not None or donnees is not None:
+                    if echec is not None:
+                        echecs[index] = echec
+                    fichier_termine(index, (donnees, [], None, None))
+                    continue
+                lire_textes = textes is not None and empreinte is not None
+                en_cours[executor.submit(_extraire_dans_worker, pdf_path, contenu, mesurer, lire_textes)] = index
+
+            # Rendre les résultats dans l'ordre d'entrée dès qu'ils sont contigus
+            rendu = False
+            while prochain_index in resultats_prets:
+                donnees, messages, temps_worker, pages = resultats_prets.pop(prochain_index)
+                source, _, contenu, temps = infos.pop(prochain_index)
+                if temps is not None and temps_worker:
+                    temps.update(temps_worker)
+                yield (source, contenu, empreintes.pop(prochain_index, None), donnees, messages, temps,
+                       echecs.pop(prochain_index, None), pages)
+                prochain_index += 1
+                rendu = True
+            if rendu:
+                continue # De la place s'est libérée dans la fenêtre
+            if not en_cours:
+                break
+
+            termines, _ = wait(en_cours, return_when=FIRST_COMPLETED)
+            for future in termines:
+                index = en_cours.pop(future)
+                try:
+                    resultat = future.result()
+                except DelaiDepasse as e:
+                    echecs[index] = "timeout"
+                    resultat = (None, [("error", f"⏱️ Analyse abandonnée pour '{os.path.basename(infos[index][1])}' : {e}.")],
+                                None, None)
+                except Exception as e:
+                    # Processus fils mort (BrokenProcessPool...) : on traite comme une erreur d'extraction
+                    resultat = (None, [_message_erreur(infos[index][1], e)], None, None)
+                if cache is not None and resultat[0] is not None and empreintes.get(index) is not None:
+                    if mesurer: debut = time.perf_counter()
+                    cache.ecrire(empreintes[index], resultat[0])
+                    if mesurer: noter(infos[index][3], "cache", debut)
+                fichier_termine(index, resultat)
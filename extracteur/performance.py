@@ -0,0 +1,175 @@
+import heapq
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+# Étapes mesurées, dans l'ordre d'affichage. Les étapes "par fichier" sont aussi détaillées fichier par fichier.
+LIBELLES_ETAPES = {
+    "preparation": "Préparation des uploads (liste des PDF ; écriture sur disque au fil du traitement)",
+    "lecture": "Lecture du PDF (disque ou membre de ZIP)",
+    "dedoublonnage": "Recherche des doublons (hash des PDF de même taille, au fil de la lecture)",
+    "cache": "Cache (hash + recherche)",
+    "ouverture": "Ouverture PDF (fitz.open)",
+    "texte": "Texte des pages (get_text)",
+    "champs": "Champs (table de motifs)",
+    "archivage": "Écriture du PDF renommé dans le ZIP",
+    "excel": "Enregistrement du récapitulatif",
+    "maitre": "Mise à jour du récapitulatif maître",
+    "finalisation": "Finalisation du ZIP",
+}
+ETAPES_FICHIER = ("lecture", "dedoublonnage", "cache", "ouverture", "texte", "champs", "archivage")
+
+
+def noter(temps, etape, debut):
+    """Ajoute à temps[etape] le temps écoulé depuis debut et retourne l'instant présent (début de l'étape suivante)."""
+    maintenant = time.perf_counter()
+    temps[etape] = temps.get(etape, 0.0) + maintenant - debut
+    return maintenant
+
+
+def etape_mesuree(mesures, nom):
+    """mesures.etape(nom), ou un contexte vide si l'instrumentation est désactivée (mesures=None)."""
+    return mesures.etape(nom) if mesures is not None else nullcontext()
+
+
+class MesuresPerformance:
+    """
+    Temps passés par étape (totaux du lot) et par fichier.
+    Les fonctions instrumentées reçoivent mesures=None (ou temps=None) par défaut et ne mesurent alors rien :
+    le coût d'une instrumentation désactivée se limite à un test par étape.
+    """
+
+    def __init__(self):
+        self.totaux = {} # étape -> secondes cumulées
+        self.par_fichier = [] # (nom du fichier, {étape: secondes})
+
+    @contextmanager
+    def etape(self, nom):
+        """Mesure une étape globale du lot (préparation, Excel, finalisation...)."""
+        debut = time.perf_counter()
+        try:
+            yield
+        finally:
+            noter(self.totaux, nom, debut)
+
+    def enregistrer_fichier(self, nom_fichier, temps):
+        """Ajoute les temps d'un fichier (dict étape -> secondes) au détail et aux totaux."""
+        self.par_fichier.append((nom_fichier, temps))
+        for etape, duree in temps.items():
+            self.totaux[etape] = self.totaux.get(etape, 0.0) + duree
+
+    @staticmethod
+    def _ligne_fichier(nom_fichier, temps):
+        ligne = {"Fichier": nom_fichier}
+        for etape in ETAPES_FICHIER:
+            ligne[f"{etape} (ms)"] = round(temps.get(etape, 0.0) * 1000, 2)
+        ligne["Total (ms)"] = round(sum(temps.values()) * 1000, 2)
+        return ligne
+
+    def lignes_fichiers(self):
+        """Une ligne par fichier, temps en millisecondes (feuille "Performance" du récapitulatif)."""
+        return [self._ligne_fichier(nom, temps) for nom, temps in self.par_fichier]
+
+    def plus_lents(self, n=20):
+        """Les n fichiers au temps total le plus long, du plus lent au plus rapide."""
+        lents = heapq.nlargest(n, self.par_fichier, key=lambda fichier: sum(fichier[1].values()))
+        return [self._ligne_fichier(nom, temps) for nom, temps in lents]
+
+    def lignes_totaux(self):
+        """Totaux par étape (secondes et part du total), dans l'ordre de LIBELLES_ETAPES."""
+        total = sum(self.totaux.values()) or 1.0
+        etapes = [e for e in LIBELLES_ETAPES if e in self.totaux] + [e for e in self.totaux if e not in LIBELLES_ETAPES]
+        return [
+            {"Étape": LIBELLES_ETAPES.get(etape, etape), "Temps (s)": round(self.totaux[etape], 3),
+             "Part (%)": round(100 * self.totaux[etape] / total, 1)}
+            for etape in etapes
+        ]
+
+
+def _rss_octets(pid):
+    """Mémoire résidente d'un processus (Linux, /proc), ou None."""
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _pids_fils(pid):
+    pids = []
+    try:
+        for tache in os.listdir(f"/proc/{pid}/task"):
+            with open(f"/proc/{pid}/task/{tache}/children") as f:
+                pids.extend(int(fils) for fils in f.read().split())
+    except (OSError, ValueError):
+        pass
+    return pids
+
+
+def rss_actuel_mo():
+    """
+    Mémoire résidente actuelle de ce processus et de ses fils (workers d'extraction), en Mo ; None hors Linux.
+    Somme des RSS : les pages partagées entre processus (modules chargés par le serveur 'forkserver') sont comptées
+    pour chaque processus (majorant).
+    """
+    soi = _rss_octets(os.getpid())
+    if soi is None:
+        return None
+    return round((soi + sum(_rss_octets(pid) or 0 for pid in _pids_fils(os.getpid()))) / (1024 * 1024), 1)
+
+
+def pic_rss_mo():
+    """Pic de mémoire résidente de ce processus et de ses fils depuis leur démarrage (Mo), ou None (Windows)."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    diviseur = 1024 * 1024 if sys.platform == "darwin" else 1024 # ru_maxrss : octets sur macOS, Ko ailleurs
+    soi = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    fils = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return round(max(soi, fils) / diviseur, 1)
+
+
+class SuiviMemoire:
+    """
+    Pic de mémoire résidente pendant un lot : processus courant + workers, relevée toutes les intervalle
+    secondes dans un thread. Contrairement à pic_rss_mo(), le pic est propre au lot même dans un serveur
+    Streamlit qui tourne depuis longtemps (il inclut toutefois les autres lots traités en même temps).
+    Hors Linux, pic_mo retombe sur pic_rss_mo() (pic depuis le démarrage du processus).
+
+        with SuiviMemoire() as suivi:
+            ...
+        suivi.pic_mo
+    """
+
+    def __init__(self, intervalle=0.2):
+        self.intervalle = intervalle
+        self.pic_mo = None
+        self._arret = threading.Event()
+        self._thread = None
+
+    def _relever(self):
+        rss = rss_actuel_mo()
+        if rss is not None and (self.pic_mo is None or rss > self.pic_mo):
+            self.pic_mo = rss
+
+    def _boucle(self):
+        while not self._arret.wait(self.intervalle):
+            self._relever()
+
+    def __enter__(self):
+        self._relever()
+        if self.pic_mo is not None:
+            self._thread = threading.Thread(target=self._boucle, name="suivi-memoire", daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._arret.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._relever()
+        else:
+            self.pic_mo = pic_rss_mo()
@@ -0,0 +1,120 @@
+import queue
+import threading
+
+TAILLE_FILE_ETAGE = 8 # Éléments produits d'avance par un étage (PDF extraits en attente d'archivage...)
+
+_FIN = object()
+
+
+class BudgetOctets:
+    """
+    Octets de contenus de PDF gardés en mémoire par un traitement, partagés entre ses étages : pris par l'étage
+    qui lit un contenu, rendus par celui qui en a fini (voir en_etage). octets_max None : sans limite.
+    """
+
+    def __init__(self, octets_max=None):
+        self.octets_max = octets_max
+        self.octets = 0
+        self._verrou = threading.Lock()
+
+    def prendre(self, nb_octets):
+        with self._verrou:
+            self.octets += nb_octets
+
+    def rendre(self, nb_octets):
+        with self._verrou:
+            self.octets -= nb_octets
+
+    @property
+    def plein(self):
+        return self.octets_max is not None and self.octets >= self.octets_max
+
+
+class _Erreur:
+    def __init__(self, exception):
+        self.exception = exception
+
+
+def en_etage(iterable, taille_file=TAILLE_FILE_ETAGE, nom="etage", budget=None, taille=None):
+    """
+    Parcourt iterable dans un thread dédié et rend ses éléments ici, dans le même ordre, à travers une file
+    bornée : l'étage producteur (lecture, extraction...) avance pendant que l'appelant traite les éléments
+    précédents (archivage, récapitulatif...). Quand la file est pleine, le producteur attend : au plus
+    taille_file éléments sont en mémoire entre les deux étages.
+    Avec budget (BudgetOctets) et taille(element) (octets pris par le producteur pour cet élément), la file est
+    aussi bornée en octets : après chaque dépôt, le producteur attend que le budget ne soit plus plein ou que
+    la file soit vide, et les octets d'un élément sont rendus quand l'appelant demande l'élément suivant.
+    Une exception du producteur est relevée ici. Si l'appelant s'arrête avant la fin (exception, break),
+    le producteur est arrêté (son générateur fermé dans son thread) avant de rendre la main.
+    """
+    file = queue.Queue(maxsize=taille_file)
+    arret = threading.Event()
+
+    def deposer(element):
+        while not arret.is_set():
+            try:
+                file.put(element, timeout=0.1)
+                break
+            except queue.Full:
+                pass
+        else:
+            return False
+        if budget is not None:
+            # Un élément est toujours accepté quand la file est vide (même plus gros que le budget)
+            while budget.plein and not file.empty():
+                if arret.wait(0.01):
+                    return False
+        return True
+
+    def produire():
+        iterateur = iter(iterable)
+        try:
+            for element in iterateur:
+                if not deposer(element):
+                    break
+        except BaseException as e:
+            deposer(_Erreur(e))
+            return
+        finally:
+            fermer = getattr(iterateur, "close", None)
+            if fermer is not None:
+                fermer()
+        deposer(_FIN)
+
+    thread = threading.Thread(target=produire, name=nom, daemon=True)
+    thread.start()
+    try:
+        while True:
+            element = file.get()
+            if element is _FIN:
+                break
+            if isinstance(element, _Erreur):
+                raise element.exception
+            yield element
+            if budget is not None:
+                budget.rendre(taille(element))
+    finally:
+        arret.set()
+        thread.join()
+
+
+class SourcesEnFlux:
+    """
+    Sources d'un lot produites au fil de l'eau par un étage de préparation (en_etage), dont le nombre est
+    connu d'avance : len() sert aux compteurs et à la progression, l'itération (une seule fois) rend les
+    sources dès qu'elles sont prêtes, pendant que les suivantes sont encore préparées.
+    """
+
+    def __init__(self, nb_sources, iterable, taille_file=TAILLE_FILE_ETAGE):
+        self.nb_sources = nb_sources
+        self._iterable = iterable
+        self._taille_file = taille_file
+
+    def __len__(self):
+        return self.nb_sources
+
+    def __iter__(self):
+        iterable, self._iterable = self._iterable, None
+        if iterable is None:
+            raise RuntimeError("SourcesEnFlux ne se parcourt qu'une fois")
+        return en_etage(iterable, self._taille_file, "preparation")
@@ -0,0 +1,183 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+
+from extracteur.cache import chemin_cache_par_defaut, empreinte_ou_none
+from extracteur.extraction import signaler_log, version_extraction
+from extracteur.ingestion import chemin_source
+from extracteur.modeles import CLE_DUREE_ANALYSE
+from extracteur.traitement import iterer_traitements
+
+NOM_MANIFESTE = "manifeste.jsonl"
+# Statuts considérés comme définitifs à la reprise. Les autres (extraction_error, copy_error, timeout...)
+# peuvent venir d'un incident passager (serveur chargé...) et sont retentés.
+STATUTS_TERMINES = ("success", "no_ref_found", "invalid_ref", "conflict_max")
+DUREE_CONSERVATION_TRAVAUX = 7 * 24 * 3600 # Secondes avant suppression d'un dossier de travail inutilisé
+
+
+def dossier_travaux_par_defaut():
+    """Dossiers de travail de l'interface : à côté du cache d'extraction ($EXTRACTEUR_CACHE_DIR ou ~/.cache/extracteur_pdf)."""
+    return os.path.join(os.path.dirname(chemin_cache_par_defaut()), "travaux")
+
+
+def identifiant_travail(fichiers, taille_bloc=1024 * 1024):
+    """
+    Identifiant stable d'un lot à partir de ses fichiers déposés (objets fichier avec name et size) : nom,
+    taille et SHA-256 du contenu de chacun, relu par seek/read. Redéposer les mêmes fichiers après un
+    rechargement de page retrouve le même dossier de travail ; un fichier modifié sous le même nom et la
+    même taille donne un autre travail (ses PDF ne sont pas rejoués depuis le manifeste d'un autre contenu).
+    """
+    empreintes = []
+    for fichier in fichiers:
+        contenu = hashlib.sha256()
+        fichier.seek(0)
+        for bloc in iter(lambda: fichier.read(taille_bloc), b""):
+            contenu.update(bloc)
+        fichier.seek(0)
+        empreintes.append((fichier.name, fichier.size, contenu.hexdigest()))
+    sha = hashlib.sha256()
+    for nom, taille, empreinte in sorted(empreintes):
+        sha.update(f"{nom}\0{taille}\0{empreinte}\n".encode("utf-8"))
+    return sha.hexdigest()[:16]
+
+
+def nettoyer_travaux(racine, duree_conservation=DUREE_CONSERVATION_TRAVAUX):
+    """Supprime les dossiers de travail dont le manifeste n'a pas été modifié depuis duree_conservation secondes."""
+    if not os.path.isdir(racine):
+        return
+    limite = time.time() - duree_conservation
+    for nom in os.listdir(racine):
+        dossier = os.path.join(racine, nom)
+        manifeste = os.path.join(dossier, NOM_MANIFESTE)
+        try:
+            derniere_modification = os.path.getmtime(manifeste if os.path.exists(manifeste) else dossier)
+        except OSError:
+            continue
+        if derniere_modification < limite:
+            shutil.rmtree(dossier, ignore_errors=True)
+
+
+class ManifesteTravail:
+    """
+    Manifeste d'un travail : fichier JSON Lines en ajout seul dans dossier_travail, une ligne par PDF traité
+    (source, hash, statut, nouveau nom, données extraites, sans la durée d'analyse, propre à ce traitement).
+    Chaque ligne est écrite dès que le PDF est traité :
+    après un arrêt (rechargement de page, processus tué...), les PDF déjà traités ne sont pas ré-analysés.
+    """
+
+    def __init__(self, dossier_travail):
+        os.makedirs(dossier_travail, exist_ok=True)
+        self.dossier_travail = dossier_travail
+        self.chemin = os.path.join(dossier_travail, NOM_MANIFESTE)
+        self.nb_repris = 0 # PDF rejoués depuis le manifeste lors de ce traitement
+        self._entrees = self._charger()
+        self._fichier = open(self.chemin, "a", encoding="utf-8")
+        os.utime(self.chemin) # Travail utilisé : repousse son nettoyage (nettoyer_travaux)
+
+    def _charger(self):
+        """Lit le manifeste existant ; une dernière ligne tronquée (arrêt pendant l'écriture) est retirée."""
+        entrees = {}
+        if not os.path.exists(self.chemin):
+            return entrees
+        with open(self.chemin, "rb+") as f:
+            position = 0
+            for ligne in f:
+                try:
+                    if not ligne.endswith(b"\n"):
+                        raise ValueError("ligne incomplète")
+                    entree = json.loads(ligne)
+                except ValueError:
+                    f.truncate(position)
+                    break
+                position += len(ligne)
+                # La dernière ligne d'une source l'emporte (source modifiée puis retraitée)
+                if entree.get("version") == version_extraction():
+                    entrees[entree["source"]] = entree
+        return entrees
+
+    def __len__(self):
+        return len(self._entrees)
+
+    def entree(self, source):
+        """Dernière entrée enregistrée pour cette source, ou None."""
+        return self._entrees.get(chemin_source(source))
+
+    def enregistrer(self, source, resultat, pdf_path=None, contenu=None, empreinte=None):
+        """
+        Ajoute le résultat (status, nom_original, nouveau_nom, donnees) d'une source au manifeste.
+        empreinte : SHA-256 déjà calculé pendant le traitement ; sinon le PDF est haché ici.
+        """
+        status, nom_original, nouveau_nom, donnees = resultat
+        if status not in STATUTS_TERMINES:
+            empreinte = None # Inutile pour les statuts retentés à la reprise (et la source peut être illisible)
+        elif empreinte is None:
+            empreinte = empreinte_ou_none(pdf_path or chemin_source(source), contenu)
+        entree = {
+            "source": chemin_source(source),
+            "empreinte": empreinte,
+            "version": version_extraction(),
+            "status": status,
+            "nom_original": nom_original,
+            "nouveau_nom": nouveau_nom,
+            "donnees": {k: v for k, v in donnees.items() if k != CLE_DUREE_ANALYSE} if donnees is not None else None,
+        }
+        self._fichier.write(json.dumps(entree, ensure_ascii=False) + "\n")
+        self._fichier.flush() # Visible sur disque même si le processus est tué juste après
+        self._entrees[entree["source"]] = entree
+
+    def rejouable(self, source, empreinte):
+        """
+        Vrai si la source a un résultat définitif au manifeste, enregistré pour ce même contenu (empreinte) :
+        elle peut être rejouée (voir rejouer) au lieu d'être ré-analysée.
+        """
+        entree = self.entree(source)
+        return (entree is not None and entree["status"] in STATUTS_TERMINES and entree["empreinte"] is not None
+                and entree["empreinte"] == empreinte)
+
+    def donnees(self, source):
+        """Copie des données enregistrées pour une source (None si aucune), sans la durée d'analyse."""
+        entree = self.entree(source)
+        if entree is None or entree["donnees"] is None:
+            return None
+        donnees = dict(entree["donnees"])
+        donnees.pop(CLE_DUREE_ANALYSE, None) # Manifeste écrit par une version qui la gardait
+        return donnees
+
+    def rejouer(self, source, pdf_path, contenu, archive_sortie):
+        """
+        Résultat enregistré d'une source rejouable, après avoir remis le PDF renommé dans l'archive sous son nom
+        enregistré. Retourne None si ce nom est déjà pris dans l'archive ou si l'écriture échoue : la source est
+        alors à renommer comme un PDF nouveau, avec ses données enregistrées (voir donnees).
+        """
+        entree = self.entree(source)
+        if entree["status"] == "success":
+            if archive_sortie.contient(entree["nouveau_nom"]):
+                return None
+            try:
+                archive_sortie.ajouter_pdf(entree["nouveau_nom"], pdf_path, contenu)
+            except Exception:
+                return None
+        self.nb_repris += 1
+        return entree["status"], entree["nom_original"], entree["nouveau_nom"], self.donnees(source)
+
+    def fermer(self):
+        self._fichier.close()
+
+
+def reprendre_traitements(sources, archive_sortie, manifeste, nb_workers=1, on_fichier_termine=None, cache=None,
+                          signaler=signaler_log, mesures=None, memoire_max=None, limites=None, textes=None,
+                          doublons=None, en_processus=False):
+    """
+    iterer_traitements avec un manifeste : les sources déjà traitées d'après le manifeste sont rejouées
+    (PDF remis dans l'archive sous le nom enregistré, données reprises telles quelles) au lieu d'être
+    ré-analysées ; les autres sont traitées puis ajoutées au manifeste. Le récapitulatif et l'archive
+    sont ainsi reconstruits entièrement à chaque reprise.
+    Les sources sont examinées au fil du flux, dans leur ordre : rejouées dans l'ordre du premier passage,
+    elles gardent les mêmes noms '_N' qu'un traitement sans interruption.
+    Avec textes (MagasinTextes), seules les sources ré-analysées y sont enregistrées (les autres l'ont été
+    lors du premier passage).
+    """
+    return iterer_traitements(sources, archive_sortie, nb_workers, on_fichier_termine, cache, signaler, mesures,
+                              manifeste, memoire_max, limites, textes, doublons, en_processus)
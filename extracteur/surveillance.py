@@ -0,0 +1,475 @@
+import json
+import os
+import threading
+import time
+import zipfile
+from collections import deque
+
+from extracteur.archive import DossierSortie
+from extracteur.export import NOM_RECAPITULATIF, RecapitulatifJsonlEnAjout
+from extracteur.extraction import signaler_log
+from extracteur.ingestion import dossier_a_ignorer, fichier_pdf_a_traiter, lister_pdf_zip
+from extracteur.maitre import ouvrir_maitre
+from extracteur.traitement import BilanTraitement, iterer_traitements
+
+NOM_DOSSIER_RENOMMES = "rapports_renommes"
+NOM_JOURNAL_SURVEILLANCE = "surveillance_traites.jsonl"
+NOM_LOT_EN_COURS = "surveillance_lot_en_cours.jsonl"
+NOM_ETAT_SURVEILLANCE = "etat_surveillance.json"
+STABILITE_PAR_DEFAUT = 5.0 # Secondes sans changement de taille ni de date avant de traiter un fichier déposé
+FACTEUR_SANS_FIN_PDF = 6 # Un PDF sans marqueur %%EOF est traité après FACTEUR_SANS_FIN_PDF * stabilite
+FENETRE_DEBIT = 300 # Secondes prises en compte pour le débit récent
+PDF_PAR_LOT_MAX = 500 # PDF traités au plus par lot (les ZIP ne sont pas découpés)
+
+
+def _est_a_surveiller(nom_fichier):
+    return fichier_pdf_a_traiter(nom_fichier) or nom_fichier.lower().endswith(".zip")
+
+
+def _signature(chemin):
+    """(taille, date de modification en ns) d'un fichier, ou None s'il a disparu."""
+    try:
+        stat = os.stat(chemin)
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+
+def _depot_complet(chemin):
+    """Vrai si le fichier semble entièrement écrit : ZIP au répertoire central lisible, PDF terminé par %%EOF."""
+    if chemin.lower().endswith(".zip"):
+        return zipfile.is_zipfile(chemin)
+    try:
+        with open(chemin, "rb") as f:
+            f.seek(max(0, os.path.getsize(chemin) - 1024))
+            return b"%%EOF" in f.read()
+    except OSError:
+        return False
+
+
+def _horodatage(instant=None):
+    return time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(instant))
+
+
+class Surveillance:
+    """
+    Traitement en continu des PDF et ZIP déposés dans des dossiers (scanners, partage réseau).
+    Un fichier n'est traité qu'une fois stable (taille et date inchangées pendant stabilite secondes, ZIP lisible,
+    PDF terminé par %%EOF) : les fichiers en cours de copie sont ignorés jusque-là. Les fichiers prêts sont
+    traités par lots avec iterer_traitements ; les PDF renommés sont écrits dans le dossier sortie/rapports_renommes
+    et les lignes ajoutées à la fin du récapitulatif tournant sortie/recapitulatif_controles_greenprime.jsonl
+    (une ligne par PDF traité, sans relire l'historique : le coût d'un lot ne dépend que de sa taille).
+    Avec maitre (chemin .xlsx ou dossier Parquet, voir extracteur/maitre.py), les lignes y sont plutôt mises à
+    jour par "Reference Rapport" : une seule ligne par référence, remplacée si un rapport est redéposé.
+    Les fichiers traités sont notés dans un journal (sortie/surveillance_traites.jsonl) : après un redémarrage,
+    seuls les fichiers nouveaux ou modifiés sont traités. Le lot en cours est noté à part (sortie/
+    surveillance_lot_en_cours.jsonl : ses fichiers, la taille du récapitulatif au départ, chaque PDF renommé
+    écrit) : un lot interrompu (arrêt brutal, erreur) est annulé, au démarrage suivant ou aussitôt, avant d'être
+    retraité en entier, sans PDF en double ('_1') ni lignes en double. L'état (files d'attente, débit, dernier lot) est écrit
+    dans chemin_etat (JSON, remplacé atomiquement). Avec textes (MagasinTextes), le texte des PDF y est enregistré.
+
+        surveillance = Surveillance(["depot/"], "resultats/")
+        surveillance.executer(arret) # Jusqu'à arret.set() (threading.Event)
+    """
+
+    def __init__(self, dossiers, sortie, nb_workers=1, cache=None, maitre=None, limites=None,
+                 stabilite=STABILITE_PAR_DEFAUT, intervalle=1.0, chemin_etat=None, signaler=signaler_log, textes=None):
+        os.makedirs(sortie, exist_ok=True)
+        self.dossiers = [os.path.abspath(dossier) for dossier in dossiers]
+        self.sortie = os.path.abspath(sortie)
+        self.nb_workers = nb_workers
+        self.cache = cache
+        self.maitre = os.path.abspath(maitre) if maitre else None
+        self.chemin_recap = self.maitre or os.path.join(self.sortie, f"{NOM_RECAPITULATIF}.jsonl")
+        self.limites = limites
+        self.stabilite = stabilite
+        self.intervalle = intervalle
+        self.chemin_etat = os.path.abspath(chemin_etat or os.path.join(self.sortie, NOM_ETAT_SURVEILLANCE))
+        self.signaler = signaler
+        self.textes = textes
+        self.sortie_pdf = DossierSortie(os.path.join(self.sortie, NOM_DOSSIER_RENOMMES))
+        self.chemin_journal = os.path.join(self.sortie, NOM_JOURNAL_SURVEILLANCE)
+        self.chemin_lot_en_cours = os.path.join(self.sortie, NOM_LOT_EN_COURS)
+        self._traites = self._lire_journal() # chemin -> signature au moment du traitement
+        self._lot_journal = None # Fichier NOM_LOT_EN_COURS ouvert pendant un lot
+        self._annuler_lot_interrompu()
+        self._verrou = threading.Lock()
+        self._signales = set() # Chemins signalés par watchdog depuis le dernier examen
+        self._en_depot = {} # chemin -> (signature, instant du dernier changement)
+        self._prets = deque() # Chemins prêts, dans l'ordre où ils le sont devenus
+        self._debits = deque() # (instant, nb PDF) des lots récents
+        self.demarre_le = time.time()
+        self.nb_lots = 0
+        self.nb_fichiers = 0
+        self.nb_pdf = 0
+        self.nb_reussis = 0
+        self.nb_echecs = 0
+        self.dernier_lot = None
+        self.derniere_erreur = None
+        self._lot_en_cours = None # {"pdf": total, "termines": n} pendant un lot
+        self._etat_ecrit_a = 0.0
+
+    # --- Journal des fichiers traités ---
+
+    def _lire_journal(self):
+        traites = {}
+        if os.path.exists(self.chemin_journal):
+            with open(self.chemin_journal, encoding="utf-8") as f:
+                for ligne in f:
+                    try:
+                        entree = json.loads(ligne)
+                    except ValueError:
+                        continue # Ligne incomplète (arrêt pendant l'écriture) : le fichier sera retraité
+                    traites[entree["chemin"]] = (entree["taille"], entree["mtime_ns"])
+        return traites
+
+    def _noter_traite(self, chemin, signature):
+        self._noter_traites([(chemin, signature)])
+
+    def _noter_traites(self, fichiers):
+        """Ajoute des fichiers (chemin, signature) au journal en une seule écriture, synchronisée sur disque."""
+        with open(self.chemin_journal, "a", encoding="utf-8") as f:
+            f.write("".join(json.dumps({"chemin": chemin, "taille": signature[0], "mtime_ns": signature[1],
+                                        "traite_le": _horodatage()}, ensure_ascii=False) + "\n"
+                            for chemin, signature in fichiers))
+            f.flush()
+            os.fsync(f.fileno())
+        for chemin, signature in fichiers:
+            self._traites[chemin] = signature
+
+    # --- Lot en cours (annulé s'il est interrompu) ---
+
+    def _debuter_lot(self, fichiers):
+        """Note le lot avant d'écrire quoi que ce soit : ses fichiers et la taille du récapitulatif JSONL."""
+        taille_recap = None
+        if self.maitre is None: # Le maître n'est modifié qu'à la fermeture, en une fois
+            taille_recap = os.path.getsize(self.chemin_recap) if os.path.exists(self.chemin_recap) else 0
+        self._lot_journal = open(self.chemin_lot_en_cours, "w", encoding="utf-8")
+        self._lot_journal.write(json.dumps({"fichiers": [[chemin, *signature] for chemin, signature in fichiers],
+                                            "taille_recapitulatif": taille_recap}, ensure_ascii=False) + "\n")
+        self._lot_journal.flush()
+        os.fsync(self._lot_journal.fileno())
+
+    def _noter_pdf_ecrit(self, nom):
+        self._lot_journal.write(json.dumps({"pdf": nom}, ensure_ascii=False) + "\n")
+        self._lot_journal.flush()
+
+    def _valider_lot(self, fichiers):
+        """Lot terminé, récapitulatif fermé : ses fichiers passent au journal, puis le lot en cours est effacé."""
+        self._noter_traites(fichiers)
+        self._lot_journal.close()
+        self._lot_journal = None
+        os.remove(self.chemin_lot_en_cours)
+
+    def _annuler_lot_interrompu(self):
+        """
+        Annule le lot noté en cours s'il n'a pas été validé : PDF renommés qu'il a écrits supprimés, lignes
+        ajoutées au récapitulatif JSONL retirées, ses fichiers retirés du journal (retraités en entier).
+        Un lot dont tous les fichiers sont au journal (arrêt juste après sa validation) est laissé tel quel.
+        """
+        if self._lot_journal is not None:
+            self._lot_journal.close()
+            self._lot_journal = None
+        if not os.path.exists(self.chemin_lot_en_cours):
+            return
+        entete, noms_pdf = None, []
+        with open(self.chemin_lot_en_cours, encoding="utf-8") as f:
+            for ligne in f:
+                try:
+                    entree = json.loads(ligne)
+                except ValueError:
+                    break # Ligne incomplète : arrêt pendant son écriture
+                if entete is None:
+                    entete = entree
+                else:
+                    noms_pdf.append(entree["pdf"])
+        if entete is not None:
+            fichiers = {chemin: (taille, mtime_ns) for chemin, taille, mtime_ns in entete["fichiers"]}
+            if any(self._traites.get(chemin) != signature for chemin, signature in fichiers.items()):
+                for nom in noms_pdf:
+                    self.sortie_pdf.retirer_pdf(nom)
+                taille_recap = entete["taille_recapitulatif"]
+                if taille_recap is not None and os.path.exists(self.chemin_recap):
+                    with open(self.chemin_recap, "r+b") as f:
+                        f.truncate(min(taille_recap, os.path.getsize(self.chemin_recap)))
+                self._retirer_du_journal(fichiers)
+                self.signaler("warning", f"⚠️ Lot interrompu annulé : {len(noms_pdf)} PDF renommé(s) retiré(s), "
+                                         f"{len(fichiers)} fichier(s) à retraiter.")
+        os.remove(self.chemin_lot_en_cours)
+
+    def _retirer_du_journal(self, chemins):
+        """Réécrit le journal (remplacé atomiquement) sans les entrées de ces chemins, s'il en a."""
+        if not any(chemin in self._traites for chemin in chemins):
+            return
+        chemin_temp = self.chemin_journal + ".tmp"
+        with open(self.chemin_journal, encoding="utf-8") as source, open(chemin_temp, "w", encoding="utf-8") as f:
+            for ligne in source:
+                try:
+                    if json.loads(ligne)["chemin"] in chemins:
+                        continue
+                except ValueError:
+                    continue
+                f.write(ligne)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(chemin_temp, self.chemin_journal)
+        for chemin in chemins:
+            self._traites.pop(chemin, None)
+
+    # --- Détection des dépôts ---
+
+    def signaler_fichier(self, chemin):
+        """Signale un fichier créé, modifié ou déplacé (appelé par watchdog, depuis son thread)."""
+        with self._verrou:
+            self._signales.add(os.path.abspath(chemin))
+
+    def _a_ignorer(self, chemin):
+        if chemin.startswith(self.sortie + os.sep):
+            return True # Sortie placée dans le dossier surveillé
+        dossier, nom_fichier = os.path.split(chemin)
+        if not _est_a_surveiller(nom_fichier):
+            return True
+        for racine in self.dossiers:
+            if chemin.startswith(racine + os.sep):
+                relatif = os.path.relpath(dossier, racine)
+                return any(dossier_a_ignorer(d) for d in relatif.split(os.sep) if d != os.curdir)
+        return True
+
+    def scanner(self, racines=None):
+        """Parcourt les dossiers surveillés (démarrage, ou à chaque examen sans watchdog), ou seulement racines."""
+        for racine in racines or self.dossiers:
+            for root, dirs, files in os.walk(racine):
+                dirs[:] = [d for d in dirs if not dossier_a_ignorer(d)]
+                for nom_fichier in files:
+                    self.signaler_fichier(os.path.join(root, nom_fichier))
+
+    def _examiner(self):
+        """Fait passer dans la file des prêts les fichiers signalés devenus stables."""
+        with self._verrou:
+            signales, self._signales = self._signales, set()
+        maintenant = time.monotonic()
+        for chemin in signales:
+            if chemin not in self._en_depot and chemin not in self._prets and not self._a_ignorer(chemin):
+                self._en_depot[chemin] = (None, maintenant)
+        for chemin, (ancienne, depuis) in list(self._en_depot.items()):
+            signature = _signature(chemin)
+            if signature is None:
+                del self._en_depot[chemin] # Supprimé ou déplacé avant d'être traité
+                continue
+            if self._traites.get(chemin) == signature:
+                del self._en_depot[chemin] # Déjà traité tel quel
+                continue
+            if signature != ancienne:
+                self._en_depot[chemin] = (signature, maintenant)
+                continue
+            stable_depuis = maintenant - depuis
+            if stable_depuis < self.stabilite:
+                continue
+            if not _depot_complet(chemin):
+                if chemin.lower().endswith(".zip") or stable_depuis < FACTEUR_SANS_FIN_PDF * self.stabilite:
+                    continue # ZIP illisible ou PDF sans fin : copie interrompue ou encore en cours
+            del self._en_depot[chemin]
+            self._prets.append(chemin)
+
+    # --- Traitement ---
+
+    def _prochain_lot(self):
+        """Fichiers prêts à traiter ensemble : jusqu'à PDF_PAR_LOT_MAX PDF (un ZIP compte pour ses PDF)."""
+        fichiers, sources, archives = [], [], []
+        while self._prets and len(sources) < PDF_PAR_LOT_MAX:
+            chemin = self._prets.popleft()
+            signature = _signature(chemin)
+            if signature is None:
+                continue
+            if chemin.lower().endswith(".zip"):
+                try:
+                    archive = zipfile.ZipFile(chemin, 'r')
+                except (OSError, zipfile.BadZipFile) as e:
+                    self.signaler("error", f"❌ Erreur lecture '{chemin}' : {e}")
+                    self._noter_traite(chemin, signature) # Retenté seulement s'il est redéposé
+                    continue
+                archives.append(archive)
+                sources.extend(lister_pdf_zip(archive))
+            else:
+                sources.append(chemin)
+            fichiers.append((chemin, signature))
+        return fichiers, sources, archives
+
+    def traiter_prets(self):
+        """Traite les fichiers prêts, lot par lot. Retourne le nombre de PDF traités."""
+        total = 0
+        while self._prets:
+            fichiers, sources, archives = self._prochain_lot()
+            try:
+                if sources:
+                    total += self._traiter_lot(fichiers, sources)
+                elif fichiers:
+                    self._noter_traites(fichiers) # ZIP sans PDF
+            except Exception as e:
+                # Le service continue ; le lot est annulé (_traiter_lot), ses fichiers ne sont pas notés au
+                # journal et seront retraités au prochain démarrage (ou s'ils sont redéposés)
+                self.derniere_erreur = f"{_horodatage()} : {type(e).__name__} - {e}"
+                self.signaler("error", f"❌ Lot abandonné ({len(fichiers)} fichier(s)) : {type(e).__name__} - {e}")
+            finally:
+                for archive in archives:
+                    archive.close()
+        return total
+
+    def _traiter_lot(self, fichiers, sources):
+        debut = time.time()
+        self._lot_en_cours = {"pdf": len(sources), "termines": 0}
+        self.ecrire_etat(forcer=True)
+
+        def progression(nb_termines):
+            self._lot_en_cours["termines"] = nb_termines
+            self.ecrire_etat()
+
+        if self.maitre is not None:
+            recapitulatif = ouvrir_maitre(self.maitre, self.signaler)
+        else:
+            recapitulatif = RecapitulatifJsonlEnAjout(self.chemin_recap)
+        bilan = BilanTraitement(len(sources), recapitulatif)
+        try:
+            self._debuter_lot(fichiers)
+            for resultat in iterer_traitements(sources, self.sortie_pdf, self.nb_workers, progression, self.cache,
+                                               self.signaler, limites=self.limites, textes=self.textes):
+                if resultat[0] == "success":
+                    self._noter_pdf_ecrit(resultat[2])
+                bilan.enregistrer(*resultat)
+            if bilan.nb_lignes:
+                recapitulatif.fermer()
+            else:
+                recapitulatif.abandonner()
+            self._valider_lot(fichiers)
+        except BaseException:
+            recapitulatif.abandonner()
+            self._annuler_lot_interrompu() # PDF déjà écrits retirés : le lot sera retraité sans '_1'
+            raise
+        finally:
+            self._lot_en_cours = None
+
+        self.nb_lots += 1
+        self.nb_fichiers += len(fichiers)
+        self.nb_pdf += bilan.files_processed_count
+        self.nb_reussis += bilan.files_succeeded_rename_count
+        self.nb_echecs += bilan.files_failed_count
+        self._debits.append((time.monotonic(), bilan.files_processed_count))
+        self.dernier_lot = {
+            "debut": _horodatage(debut), "duree_s": round(time.time() - debut, 2), "fichiers": len(fichiers),
+            "pdf": bilan.files_processed_count, "reussis": bilan.files_succeeded_rename_count,
+            "echecs": bilan.files_failed_count,
+            "lignes_ajoutees": getattr(recapitulatif, "nb_ajoutees", bilan.nb_lignes),
+            "lignes_mises_a_jour": getattr(recapitulatif, "nb_mises_a_jour", 0),
+            "lignes_ecartees": len(getattr(recapitulatif, "lignes_ecartees", ())),
+        }
+        self.signaler("info", f"✅ Lot {self.nb_lots} : {bilan.files_succeeded_rename_count} renommé(s), "
+                              f"{bilan.files_failed_count} échec(s) sur {len(sources)} PDF "
+                              f"({len(fichiers)} fichier(s) déposé(s)).")
+        for echec in bilan.failed_files_details:
+            self.signaler("warning", f"   ❌ {echec['file']} : {echec['reason']}")
+        for ligne in getattr(recapitulatif, "lignes_ecartees", ()):
+            self.signaler("warning", f"   📚 Même référence '{ligne['Clé']}' : ligne de {ligne['Fichier écarté']} "
+                                     f"remplacée par celle de {ligne['Fichier gardé']}")
+        self.ecrire_etat(forcer=True)
+        return bilan.files_processed_count
+
+    # --- État ---
+
+    def etat(self):
+        """Métriques courantes (contenu du fichier d'état)."""
+        maintenant = time.monotonic()
+        while self._debits and maintenant - self._debits[0][0] > FENETRE_DEBIT:
+            self._debits.popleft()
+        duree = max(time.time() - self.demarre_le, 1e-9)
+        fenetre = min(FENETRE_DEBIT, duree)
+        return {
+            "dossiers": self.dossiers,
+            "demarre_le": _horodatage(self.demarre_le),
+            "mis_a_jour_le": _horodatage(),
+            "etat": "traitement" if self._lot_en_cours is not None else "attente",
+            "fichiers_en_cours_de_depot": len(self._en_depot),
+            "fichiers_en_file": len(self._prets),
+            "lot_en_cours": dict(self._lot_en_cours) if self._lot_en_cours is not None else None,
+            "lots_traites": self.nb_lots,
+            "fichiers_traites": self.nb_fichiers,
+            "pdf_traites": self.nb_pdf,
+            "pdf_renommes": self.nb_reussis,
+            "pdf_en_echec": self.nb_echecs,
+            "debit_pdf_par_minute": round(60 * sum(nb for _, nb in self._debits) / fenetre, 1),
+            "debit_moyen_pdf_par_minute": round(60 * self.nb_pdf / duree, 1),
+            "dernier_lot": self.dernier_lot,
+            "derniere_erreur": self.derniere_erreur,
+            "recapitulatif": self.chemin_recap,
+            "dossier_renommes": self.sortie_pdf.dossier,
+        }
+
+    def ecrire_etat(self, forcer=False):
+        """Écrit le fichier d'état (au plus une fois par seconde, sauf forcer) via un fichier temporaire."""
+        if not forcer and time.monotonic() - self._etat_ecrit_a < 1.0:
+            return
+        self._etat_ecrit_a = time.monotonic()
+        chemin_temp = self.chemin_etat + ".tmp"
+        try:
+            with open(chemin_temp, "w", encoding="utf-8") as f:
+                json.dump(self.etat(), f, ensure_ascii=False, indent=2)
+            os.replace(chemin_temp, self.chemin_etat)
+        except OSError as e:
+            self.signaler("warning", f"⚠️ Fichier d'état '{self.chemin_etat}' non écrit : {e}")
+
+    # --- Boucle ---
+
+    def executer(self, arret=None):
+        """
+        Surveille les dossiers jusqu'à arret.set() (threading.Event ; sans arret : jusqu'à KeyboardInterrupt).
+        Les fichiers déjà présents au démarrage et pas encore traités le sont d'abord.
+        Sans watchdog, les dossiers sont reparcourus à chaque examen.
+        """
+        arret = arret or threading.Event()
+        observateur = self._demarrer_watchdog()
+        self.scanner()
+        try:
+            while not arret.is_set():
+                if observateur is None:
+                    self.scanner()
+                self._examiner()
+                self.traiter_prets()
+                self.ecrire_etat()
+                arret.wait(self.intervalle)
+        finally:
+            if observateur is not None:
+                observateur.stop()
+                observateur.join()
+            self.ecrire_etat(forcer=True)
+
+    def _demarrer_watchdog(self):
+        try:
+            from watchdog.events import FileSystemEventHandler
+            from watchdog.observers import Observer
+        except ImportError:
+            self.signaler("warning", "⚠️ watchdog indisponible : les dossiers sont reparcourus à chaque examen.")
+            return None
+
+        surveillance = self
+
+        class Evenements(FileSystemEventHandler):
+            def on_created(self, event):
+                if event.is_directory:
+                    surveillance.scanner([event.src_path]) # Dossier copié ou déplacé d'un bloc
+                else:
+                    surveillance.signaler_fichier(event.src_path)
+
+            def on_modified(self, event):
+                if not event.is_directory:
+                    surveillance.signaler_fichier(event.src_path)
+
+            def on_moved(self, event):
+                if event.is_directory:
+                    surveillance.scanner([event.dest_path])
+                else:
+                    surveillance.signaler_fichier(event.dest_path)
+
+        observateur = Observer()
+        for dossier in self.dossiers:
+            observateur.schedule(Evenements(), dossier, recursive=True)
+        observateur.start()
+        return observateur
@@ -0,0 +1,151 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+from extracteur.export import RecapitulatifMultiple, ouvrir_recapitulatif
+from extracteur.extraction import extraire_donnees_textes, signaler_log
+from extracteur.maitre import ouvrir_maitre
+
+NIVEAU_COMPRESSION = 6
+
+
+def chemin_textes_par_defaut():
+    """Emplacement du magasin de textes : à côté du cache ($EXTRACTEUR_CACHE_DIR ou ~/.cache/extracteur_pdf)."""
+    dossier = os.environ.get("EXTRACTEUR_CACHE_DIR") or os.path.join(os.path.expanduser("~"), ".cache", "extracteur_pdf")
+    return os.path.join(dossier, "textes.sqlite")
+
+
+def _compresser(pages):
+    return zlib.compress(json.dumps(pages, ensure_ascii=False).encode("utf-8"), NIVEAU_COMPRESSION)
+
+
+def _decompresser(blob):
+    return json.loads(zlib.decompress(blob).decode("utf-8"))
+
+
+class MagasinTextes:
+    """
+    Texte des pages lues par l'extraction (pages 1 et 2), compressé (zlib), par SHA-256 du PDF, avec le nom
+    d'origine et le nom renommé du dernier traitement. Alimenté pendant les traitements normaux ; permet de
+    relancer la table des champs (après correction d'un motif) sans rouvrir les PDF : voir reextraire_depuis_textes.
+    Contrairement au cache, rien n'est évincé : c'est l'archive des textes de tous les rapports traités.
+    Utilisable depuis plusieurs threads (étage d'extraction et archivage) : accès protégés par verrou.
+    """
+
+    def __init__(self, chemin):
+        os.makedirs(os.path.dirname(chemin) or ".", exist_ok=True)
+        self.chemin = chemin
+        self._verrou = threading.Lock()
+        self._conn = sqlite3.connect(chemin, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS textes ("
+            " empreinte TEXT PRIMARY KEY, pages BLOB NOT NULL, nom_original TEXT, nouveau_nom TEXT,"
+            " enregistre_le REAL NOT NULL)"
+        )
+        self._conn.commit()
+        self.nb_enregistres = 0
+
+    def __len__(self):
+        with self._verrou:
+            return self._conn.execute("SELECT COUNT(*) FROM textes").fetchone()[0]
+
+    def contient(self, empreinte):
+        with self._verrou:
+            return self._conn.execute("SELECT 1 FROM textes WHERE empreinte = ?", (empreinte,)).fetchone() is not None
+
+    def enregistrer(self, empreinte, pages, nom_original=None, nouveau_nom=None):
+        """
+        Enregistre le texte des pages d'un PDF (liste de str) et ses noms ; pages None : met seulement à jour
+        les noms d'un texte déjà enregistré (PDF relu du cache).
+        """
+        with self._verrou:
+            if pages is None:
+                self._conn.execute("UPDATE textes SET nom_original = ?, nouveau_nom = ? WHERE empreinte = ?",
+                                   (nom_original, nouveau_nom, empreinte))
+            else:
+                self._conn.execute(
+                    "INSERT INTO textes (empreinte, pages, nom_original, nouveau_nom, enregistre_le)"
+                    " VALUES (?, ?, ?, ?, ?) ON CONFLICT (empreinte) DO UPDATE SET pages = excluded.pages,"
+                    " nom_original = excluded.nom_original, nouveau_nom = excluded.nouveau_nom,"
+                    " enregistre_le = excluded.enregistre_le",
+                    (empreinte, _compresser(pages), nom_original, nouveau_nom, time.time())
+                )
+                self.nb_enregistres += 1
+            self._conn.commit()
+
+    def lire(self, empreinte):
+        """Texte des pages enregistré pour ce PDF (liste de str), ou None."""
+        with self._verrou:
+            ligne = self._conn.execute("SELECT pages FROM textes WHERE empreinte = ?", (empreinte,)).fetchone()
+        return _decompresser(ligne[0]) if ligne is not None else None
+
+    def iterer(self):
+        """(empreinte, pages, nom_original, nouveau_nom) de chaque PDF, dans l'ordre du premier enregistrement."""
+        with self._verrou:
+            curseur = self._conn.execute("SELECT rowid FROM textes ORDER BY rowid")
+            rowids = [rowid for (rowid,) in curseur]
+        for debut in range(0, len(rowids), 1000):
+            bloc = rowids[debut:debut + 1000]
+            with self._verrou:
+                lignes = self._conn.execute(
+                    f"SELECT empreinte, pages, nom_original, nouveau_nom FROM textes WHERE rowid IN "
+                    f"({','.join('?' * len(bloc))}) ORDER BY rowid", bloc
+                ).fetchall()
+            for empreinte, blob, nom_original, nouveau_nom in lignes:
+                yield empreinte, _decompresser(blob), nom_original, nouveau_nom
+
+    def fermer(self):
+        with self._verrou:
+            try: self._conn.close()
+            except sqlite3.Error: pass
+
+
+def reextraire_depuis_textes(magasin, recapitulatifs, maitre=None, signaler=signaler_log):
+    """
+    Regénère les récapitulatifs à partir du magasin de textes, sans rouvrir aucun PDF : seule la table des
+    champs (modèle, motifs, nettoyage) est rejouée sur le texte enregistré. Une ligne par PDF distinct du magasin,
+    avec les noms (origine, renommé) de son dernier traitement.
+    recapitulatifs : {format: chemin} ; maitre : récapitulatif maître à mettre à jour (voir traiter_lot).
+    Retourne: nb_lignes, {format: chemin} des récapitulatifs écrits
+    """
+    ouverts = {}
+    for format_sortie, chemin in recapitulatifs.items():
+        try:
+            ouverts[format_sortie] = ouvrir_recapitulatif(chemin, format_sortie)
+        except Exception as e:
+            signaler("warning", f"⚠️ Récapitulatif {format_sortie} indisponible : {e}")
+    maitre_ouvert = ouvrir_maitre(maitre, signaler) if maitre is not None else None
+    recapitulatif = RecapitulatifMultiple(list(ouverts.values()) + ([maitre_ouvert] if maitre_ouvert else []))
+    nb_lignes = 0
+    try:
+        for empreinte, pages, nom_original, nouveau_nom in magasin.iterer():
+            if not pages:
+                continue
+            try:
+                # Document d'une seule page : le même texte sert de page 2, comme à l'extraction
+                donnees = extraire_donnees_textes(pages[0], pages[1] if len(pages) > 1 else pages[0])
+            except Exception as e:
+                signaler("error", f"❌ Erreur ré-extraction '{nom_original or empreinte}' : {type(e).__name__} - {e}")
+                continue
+            donnees["Nom Fichier Original"] = nom_original or ""
+            donnees["Nouveau Nom Fichier"] = nouveau_nom or "ERREUR_RENOMMAGE"
+            recapitulatif.ajouter(donnees)
+            nb_lignes += 1
+    except BaseException:
+        recapitulatif.abandonner()
+        raise
+    if not nb_lignes:
+        recapitulatif.abandonner()
+        return 0, {}
+    ecrits = {format_sortie: ouvert.fermer() for format_sortie, ouvert in ouverts.items()}
+    if maitre_ouvert is not None:
+        maitre_ouvert.fermer()
+        for ligne in maitre_ouvert.lignes_ecartees:
+            signaler("warning", f"⚠️ Maître : même référence '{ligne['Clé']}' pour {ligne['Fichier écarté']} et "
+                                f"{ligne['Fichier gardé']}, seule la ligne de {ligne['Fichier gardé']} est gardée.")
+    return nb_lignes, ecrits
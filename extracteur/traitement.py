@@ -0,0 +1,308 @@
+import os
+import time
+
+from extracteur.cache import analyser_et_mettre_en_cache, decider_analyse, extraire_donnees_pdf_cache
+from extracteur.extraction import signaler_log
+from extracteur.ingestion import chemin_source, nom_source, ouvrir_source
+from extracteur.modeles import CLE_DUREE_ANALYSE, CLE_MODELE, MODELE_PAR_DEFAUT
+from extracteur.parallele import extraire_en_parallele
+from extracteur.performance import noter
+from extracteur.pipeline import BudgetOctets, en_etage
+
+
+def traiter_pdf_et_extraire(source, archive_sortie, cache=None, signaler=signaler_log, temps=None):
+    """
+    Traite un PDF (chemin ou SourcePDF): extrait les données ET l'ajoute renommé à l'archive de sortie.
+    Si temps (dict) est fourni, la durée de chaque étape y est ajoutée (voir extracteur/performance.py).
+    Retourne: status, nom_original, nouveau_nom, donnees_extraites
+    Status: success, no_ref_found, invalid_ref, copy_error, extraction_error.
+    iterer_traitements produit en plus timeout (mode isolé, délai dépassé) ; un doublon (DetecteurDoublons) ne
+    produit aucun résultat ; une source reprise du manifeste rend le résultat enregistré, avec son statut.
+    (conflict_max n'est plus produit : plus de limite au nombre de doublons d'une référence ; il peut
+    seulement revenir d'un ancien manifeste de reprise)
+    """
+    return _lire_et_traiter(source, archive_sortie, cache, signaler, temps)[2]
+
+
+def _lire_et_traiter(source, archive_sortie, cache, signaler, temps):
+    """traiter_pdf_et_extraire, en rendant aussi (pdf_path, contenu) lus pour le manifeste de reprise."""
+    nom_fichier_original = nom_source(source)
+    donnees_extraites = None
+
+    # 1. Vérifier si le fichier doit être traité (basé sur le nom)
+    # Adaptez cette condition si nécessaire (ex: ou si un flag force le traitement)
+    # if "REFERENCE" not in nom_fichier_original.upper():
+    #     return "skipped_name", nom_fichier_original, None, None
+    # Simplification : on essaie de traiter tous les PDF trouvés, le filtrage se fera sur l'extraction
+
+    # 2. Extraire les données d'abord (la référence est dedans)
+    try:
+        if temps is not None: debut = time.perf_counter()
+        pdf_path, contenu = ouvrir_source(source)
+        if temps is not None: noter(temps, "lecture", debut)
+    except Exception as e:
+        signaler("error", f"❌ Erreur lecture '{nom_fichier_original}' : {e}")
+        return chemin_source(source), None, ("extraction_error", nom_fichier_original, None, None)
+    donnees_extraites = extraire_donnees_pdf_cache(pdf_path, cache, signaler, contenu, temps)
+
+    return pdf_path, contenu, renommer_et_copier(pdf_path, archive_sortie, donnees_extraites, contenu, signaler, temps)
+
+
+def renommer_et_copier(pdf_path, archive_sortie, donnees_extraites, contenu=None, signaler=signaler_log, temps=None):
+    """
+    Ajoute sous son nouveau nom à l'archive de sortie un PDF dont les données ont déjà été extraites
+    (séquentiellement ou par le pool). Si contenu (octets du PDF lu dans un ZIP) est fourni, il est écrit
+    tel quel ; sinon le fichier pdf_path est lu.
+    Retourne: status, nom_original, nouveau_nom, donnees_extraites
+    """
+    nom_fichier_original = os.path.basename(pdf_path)
+    nouveau_nom = None
+
+    if donnees_extraites is None:
+        # Erreur critique pendant l'extraction (déjà logguée dans la fonction)
+        return "extraction_error", nom_fichier_original, None, None
+
+    ref = donnees_extraites.get("Reference Rapport", "")
+
+    # 3. Vérifier si la référence est valide pour le renommage
+    if not ref:
+        # Pas de référence trouvée OU vide, on ne peut pas renommer correctement
+        # On garde les données extraites si elles existent, mais on signale l'échec du renommage
+        signaler("warning", f"⚠️ Référence vide ou non trouvée pour '{nom_fichier_original}', renommage impossible.")
+        return "no_ref_found", nom_fichier_original, None, donnees_extraites # Nouveau status
+
+    ref_clean = "".join(c for c in ref if c.isalnum() or c in ('-', '_', '.')).strip()
+    if not ref_clean:
+         # La référence extraite ne contient aucun caractère valide après nettoyage
+         signaler("warning", f"⚠️ Référence '{ref}' invalide après nettoyage pour '{nom_fichier_original}', renommage impossible.")
+         return "invalid_ref", nom_fichier_original, None, donnees_extraites # Statut existant
+
+    # 4. Générer le nouveau nom (premier libre parmi 'RAPPORT - ref.pdf', 'RAPPORT - ref_1.pdf'...) et
+    # 5. ajouter le fichier à l'archive (pas de copie intermédiaire sur disque), sans qu'un autre thread
+    # ne prenne le même nom entre les deux
+    with archive_sortie.verrou:
+        nouveau_nom = archive_sortie.nom_libre(f"RAPPORT - {ref_clean}")
+        try:
+            if temps is not None: debut = time.perf_counter()
+            archive_sortie.ajouter_pdf(nouveau_nom, pdf_path, contenu)
+            if temps is not None: noter(temps, "archivage", debut)
+        except Exception as e:
+            signaler("error", f"❌ Erreur copie '{nom_fichier_original}' → '{nouveau_nom}': {e}")
+             # On a les données, mais la copie a échoué
+            return "copy_error", nom_fichier_original, nouveau_nom, donnees_extraites # Statut existant
+
+    # Ajouter les noms de fichier aux données pour l'Excel
+    donnees_extraites["Nom Fichier Original"] = nom_fichier_original
+    donnees_extraites["Nouveau Nom Fichier"] = nouveau_nom
+    return "success", nom_fichier_original, nouveau_nom, donnees_extraites # Succès complet
+
+
+def _extraire_en_sequence(sources, on_fichier_termine=None, cache=None, mesurer=False, budget=None, textes=None,
+                          manifeste=None, doublons=None):
+    """
+    Équivalent séquentiel (sans pool) d'extraire_en_parallele : lecture et extraction de chaque PDF ici,
+    produit (source, contenu, empreinte, donnees, messages, temps, echec, pages) dans l'ordre des sources.
+    """
+    for i, source in enumerate(sources):
+        messages = []
+        signaler = lambda niveau, message: messages.append((niveau, message))
+        temps = {} if mesurer else None
+        donnees = contenu = empreinte = echec = pages = None
+        try:
+            if temps is not None: debut = time.perf_counter()
+            pdf_path, contenu = ouvrir_source(source)
+            if temps is not None: noter(temps, "lecture", debut)
+        except Exception as e:
+            signaler("error", f"❌ Erreur lecture '{nom_source(source)}' : {e}")
+        else:
+            empreinte, echec, donnees = decider_analyse(source, pdf_path, contenu, cache, textes, manifeste, doublons,
+                                                        temps)
+            if echec == "doublon":
+                contenu = None
+            elif echec is None and donnees is None:
+                pages = [] if textes is not None and empreinte is not None else None
+                donnees = analyser_et_mettre_en_cache(pdf_path, cache, empreinte, signaler, contenu, temps, pages)
+            if contenu is not None and budget is not None:
+                budget.prendre(len(contenu))
+        yield source, contenu, empreinte, donnees, messages, temps, echec, pages or None
+        if on_fichier_termine:
+            on_fichier_termine(i + 1)
+
+
+def _taille_extraction(extraction):
+    """Octets pris au budget pour un résultat d'extraction (son contenu lu en mémoire)."""
+    contenu = extraction[1]
+    return len(contenu) if contenu is not None else 0
+
+
+def iterer_traitements(sources, archive_sortie, nb_workers=1, on_fichier_termine=None, cache=None, signaler=signaler_log,
+                       mesures=None, manifeste=None, memoire_max=None, limites=None, textes=None, doublons=None,
+                       en_processus=False):
+    """
+    Produit le résultat de traiter_pdf_et_extraire pour chaque PDF, dans l'ordre des sources.
+    Deux étages tournent en même temps, reliés par une file bornée (voir extracteur/pipeline.py) : la lecture
+    et l'extraction dans un thread, le renommage (écriture dans l'archive) et la suite (récapitulatifs, via
+    l'appelant) ici, dans l'ordre, pour garder les mêmes noms '_N' qu'en séquentiel.
+    sources peut être un flux (SourcesEnFlux) : chaque PDF est traité dès qu'il est prêt, rien n'attend la fin
+    du flux.
+    Avec nb_workers > 1, l'extraction tourne en plus dans un pool de processus.
+    Avec en_processus, elle passe par un pool (d'au moins un processus) même pour un seul PDF : jamais d'appel
+    à PyMuPDF dans les threads de ce processus, qui n'est pas sûr quand d'autres traitements y tournent en même
+    temps (travaux en arrière-plan de l'interface).
+    Avec mesures (MesuresPerformance), les temps de chaque fichier y sont enregistrés.
+    Avec manifeste (ManifesteTravail), chaque résultat y est ajouté dès qu'il est connu (reprise après arrêt), et
+    les sources qui y ont déjà un résultat définitif pour le même contenu sont rejouées sans être ré-analysées.
+    L'empreinte de chaque PDF, calculée une fois à la lecture (voir decider_analyse), sert au dédoublonnage,
+    au cache, au magasin de textes et au manifeste.
+    memoire_max (octets) borne les contenus de PDF gardés en mémoire entre la lecture et l'archivage : lus
+    d'avance pour le pool (voir extraire_en_parallele) et en attente dans la file entre les deux étages.
+    Avec limites (LimitesDocument : délai et mémoire max par PDF), chaque PDF est analysé dans un processus
+    isolé, même avec nb_workers = 1 ; un PDF abandonné après le délai a le statut "timeout".
+    Avec textes (MagasinTextes), le texte des pages lues de chaque PDF extrait y est enregistré avec ses noms
+    (voir extracteur/textes.py).
+    Avec doublons (DetecteurDoublons), les PDF identiques à un PDF déjà vu ne sont pas traités (aucun résultat
+    produit) : ils sont listés dans doublons.doublons et comptent comme terminés pour on_fichier_termine.
+    """
+    budget = BudgetOctets(memoire_max)
+    if (nb_workers <= 1 or len(sources) <= 1) and limites is None and not en_processus:
+        extractions = _extraire_en_sequence(sources, on_fichier_termine, cache, mesures is not None, budget, textes,
+                                            manifeste, doublons)
+    else:
+        extractions = extraire_en_parallele(sources, max(1, nb_workers), on_fichier_termine, cache, mesures is not None,
+                                            budget, limites, textes, manifeste, doublons)
+
+    for source, contenu, empreinte, donnees_extraites, messages, temps, echec, pages in en_etage(
+            extractions, nom="extraction", budget=budget, taille=_taille_extraction):
+        for niveau, message in messages:
+            signaler(niveau, message)
+        pdf_path = chemin_source(source)
+        if echec == "doublon":
+            if mesures is not None:
+                mesures.enregistrer_fichier(os.path.basename(pdf_path), temps)
+            continue
+        if echec == "repris":
+            resultat = manifeste.rejouer(source, pdf_path, contenu, archive_sortie)
+            if resultat is not None:
+                yield resultat
+                continue
+            # Nom enregistré déjà pris ou écriture impossible : renommé comme un PDF nouveau, avec les données
+            # enregistrées (aucune analyse dans cet étage)
+            donnees_extraites = manifeste.donnees(source)
+        if echec == "timeout":
+            resultat = "timeout", os.path.basename(pdf_path), None, None
+        else:
+            resultat = renommer_et_copier(pdf_path, archive_sortie, donnees_extraites, contenu, signaler, temps)
+        if textes is not None and empreinte is not None and echec != "repris" and resultat[3] is not None:
+            _enregistrer_texte(textes, empreinte, pages, resultat, signaler)
+        if mesures is not None:
+            mesures.enregistrer_fichier(resultat[1], temps)
+        if manifeste is not None:
+            manifeste.enregistrer(source, resultat, pdf_path, contenu, empreinte)
+        yield resultat
+
+
+def _enregistrer_texte(textes, empreinte, pages, resultat, signaler):
+    """
+    Enregistre dans le magasin le texte d'un PDF extrait et ses noms (nouveau nom seulement si renommé) ;
+    pages None (résultat du cache) : seulement les noms.
+    """
+    status, nom_original, nouveau_nom, _ = resultat
+    try:
+        textes.enregistrer(empreinte, pages, nom_original,
+                           nouveau_nom if status == "success" else None)
+    except Exception as e:
+        # Le magasin de textes ne doit pas faire échouer le traitement
+        signaler("warning", f"⚠️ Texte de '{nom_original}' non enregistré dans le magasin : {e}")
+
+
+class BilanTraitement:
+    """
+    Compteurs et lignes de données d'un lot, alimentés avec les résultats de traiter_pdf_et_extraire.
+    Avec un recapitulatif (RecapitulatifEnFlux), chaque ligne y est écrite aussitôt au lieu d'être
+    gardée dans extracted_data_list : la mémoire ne grossit plus avec la taille du lot.
+    """
+
+    def __init__(self, files_found_count=0, recapitulatif=None):
+        self.files_found_count = files_found_count
+        self.recapitulatif = recapitulatif
+        self.files_processed_count = 0 # Compte les fichiers où le traitement a été tenté
+        self.files_succeeded_rename_count = 0 # Compte les renommages/copies réussis
+        self.files_succeeded_extraction_count = 0 # Compte les extractions réussies (même si renommage échoue)
+        self.files_failed_count = 0 # Compte les échecs globaux (extraction ou copie)
+        self.failed_files_details = []
+        self.extracted_data_list = [] # Liste pour stocker les dictionnaires de données (sans recapitulatif)
+        self.nb_lignes = 0 # Lignes du récapitulatif, en mémoire ou écrites en flux
+        self.doublons = [] # PDF ignorés car identiques à un autre PDF du lot (voir extracteur/doublons.py)
+        self.maitre = None # Mise à jour du récapitulatif maître : chemin, lignes ajoutées / mises à jour / écartées
+        self.modeles = {} # modèle de rapport -> [documents extraits, documents analysés par ce traitement, durée cumulée en ms]
+
+    def enregistrer(self, status, original_name, new_name, extracted_data):
+        """Met à jour les compteurs et détails d'échec pour un fichier traité."""
+        self.files_processed_count += 1 # Compte chaque tentative
+
+        if status == "success":
+            self.files_succeeded_rename_count += 1
+            self.files_succeeded_extraction_count += 1 # Succès implique extraction réussie
+            if extracted_data: # S'assurer que les données existent
+                 self._ajouter_ligne(extracted_data)
+        elif status in ["no_ref_found", "invalid_ref", "conflict_max", "copy_error"]:
+            # Renommage/Copie a échoué, mais l'extraction a pu réussir
+            self.files_failed_count += 1
+            reason = status.replace("_", " ").capitalize()
+            self.failed_files_details.append({"file": original_name, "reason": f"Échec renommage/copie ({reason})"})
+            if extracted_data:
+                # On a quand même les données, on les ajoute pour l'Excel
+                self.files_succeeded_extraction_count += 1
+                extracted_data["Nom Fichier Original"] = original_name
+                extracted_data["Nouveau Nom Fichier"] = "ERREUR_RENOMMAGE" # Marqueur dans l'excel
+                self._ajouter_ligne(extracted_data)
+        elif status == "extraction_error":
+            self.files_failed_count += 1
+            self.failed_files_details.append({"file": original_name, "reason": "Erreur extraction données"})
+        elif status == "timeout":
+            self.files_failed_count += 1
+            self.failed_files_details.append({"file": original_name, "reason": "Délai d'analyse dépassé (timeout)"})
+        elif status == "skipped_name":
+             self.files_processed_count -= 1 # Ne pas compter comme traité si skippé par nom
+             pass # Ignoré, pas un échec direct
+        else: # unknown_error ou autre
+            self.files_failed_count += 1
+            self.failed_files_details.append({"file": original_name, "reason": "Erreur inconnue"})
+
+    def _ajouter_ligne(self, extracted_data):
+        self.nb_lignes += 1
+        compteur = self.modeles.setdefault(extracted_data.get(CLE_MODELE) or MODELE_PAR_DEFAUT, [0, 0, 0.0])
+        compteur[0] += 1
+        # Durée présente seulement pour les PDF analysés par ce traitement (absente du cache et du manifeste)
+        if extracted_data.get(CLE_DUREE_ANALYSE) is not None:
+            compteur[1] += 1
+            compteur[2] += extracted_data[CLE_DUREE_ANALYSE]
+        if self.recapitulatif is not None:
+            self.recapitulatif.ajouter(extracted_data)
+        else:
+            self.extracted_data_list.append(extracted_data)
+
+    def lignes_modeles(self):
+        """
+        Documents extraits et durée moyenne d'analyse par modèle de rapport, du plus fréquent au plus rare.
+        La moyenne porte sur les documents analysés par ce traitement (None si tous viennent du cache ou de la reprise).
+        """
+        return [
+            {"Modèle": nom, "Documents": nb, "Analysés": nb_analyses,
+             "Analyse moyenne (ms)": round(duree / nb_analyses, 1) if nb_analyses else None}
+            for nom, (nb, nb_analyses, duree) in sorted(self.modeles.items(), key=lambda modele: -modele[1][0])
+        ]
+
+    def stats(self):
+        """Statistiques au format de summary_stats (affichage du résumé)."""
+        return {
+            "found": self.files_found_count,
+            "processed": self.files_processed_count,
+            "succeeded_rename": self.files_succeeded_rename_count,
+            "succeeded_extraction": self.files_succeeded_extraction_count,
+            "failed": self.files_failed_count,
+            "failures": self.failed_files_details,
+            "doublons": self.doublons,
+            "maitre": self.maitre,
+            "modeles": self.lignes_modeles()
+        }
@@ -0,0 +1,157 @@
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+
+from extracteur.parallele import nombre_workers_par_defaut
+
+logger = logging.getLogger(__name__)
+
+MESSAGES_MAX = 1000 # Messages gardés par travail (au-delà, seul le nombre est compté)
+DUREE_CONSERVATION_RESULTATS = 3600 # Secondes pendant lesquelles un travail terminé reste consultable
+
+
+class FileTravauxPleine(Exception):
+    """La file d'attente des travaux est pleine : le travail n'a pas été accepté."""
+
+
+class Travail:
+    """
+    Un lot soumis au gestionnaire. Ses attributs sont lus par l'interface pendant l'exécution :
+    etat ("en_attente", "en_cours", "termine", "echec"), nb_termines / total, messages, resultat, erreur.
+    fichiers : fichiers produits par le travail (résultats à télécharger), supprimés quand il expire.
+    """
+
+    def __init__(self, identifiant, fonction, args, cle=None):
+        self.identifiant = identifiant
+        self.cle = cle
+        self.etat = "en_attente"
+        self.nb_termines = 0
+        self.total = 0
+        self.messages = [] # (niveau, message), comme le signaleur de l'extraction
+        self.nb_messages = 0
+        self.resultat = None # Valeur retournée par la fonction du travail
+        self.erreur = None
+        self.fichiers = []
+        self.soumis_le = time.time()
+        self.termine_le = None
+        self._fonction = fonction
+        self._args = args
+
+    @property
+    def termine(self):
+        return self.etat in ("termine", "echec")
+
+    def progression(self, nb_termines):
+        """Callback on_fichier_termine du traitement."""
+        self.nb_termines = nb_termines
+
+    def signaler(self, niveau, message):
+        """Signaleur du traitement : les messages sont gardés pour l'affichage."""
+        self.nb_messages += 1
+        if len(self.messages) < MESSAGES_MAX:
+            self.messages.append((niveau, message))
+
+    def executer(self):
+        self.etat = "en_cours"
+        # La fonction garde seule ses arguments (fichiers déposés) : elle peut les libérer dès qu'elle n'en a plus besoin
+        args, self._args = self._args, None
+        try:
+            self.resultat = self._fonction(self, *args)
+            self.etat = "termine"
+        except Exception as e:
+            logger.exception("Échec du travail %s", self.identifiant)
+            self.erreur = f"{type(e).__name__} - {e}"
+            self.etat = "echec"
+        finally:
+            self.termine_le = time.time()
+
+
+class GestionnaireTravaux:
+    """
+    Exécute les lots en arrière-plan : une file d'attente bornée et travaux_simultanes threads.
+    Chaque travail utilise au plus processus_par_travail processus d'extraction, pour que plusieurs
+    gros lots (plusieurs utilisateurs) se partagent le serveur au lieu de s'y bloquer l'un l'autre.
+    Les travaux tournent dans des threads de ce processus : ils ne doivent pas appeler PyMuPDF eux-mêmes
+    (voir traiter_lot, en_processus).
+    """
+
+    def __init__(self, travaux_simultanes=2, taille_file=20, processus_par_travail=None):
+        self.travaux_simultanes = max(1, travaux_simultanes)
+        self.processus_par_travail = max(1, processus_par_travail or nombre_workers_par_defaut() // self.travaux_simultanes)
+        self._file = queue.Queue(maxsize=max(1, taille_file))
+        self._travaux = {} # identifiant -> Travail
+        self._verrou = threading.Lock()
+        for i in range(self.travaux_simultanes):
+            threading.Thread(target=self._boucle, name=f"travaux-{i}", daemon=True).start()
+
+    @classmethod
+    def depuis_environnement(cls):
+        """
+        Limites lues dans l'environnement du serveur :
+        EXTRACTEUR_TRAVAUX_SIMULTANES (défaut 2), EXTRACTEUR_FILE_TRAVAUX (défaut 20),
+        EXTRACTEUR_PROCESSUS_PAR_TRAVAIL (défaut : cœurs / travaux simultanés).
+        """
+        def entier(nom, defaut):
+            try:
+                return int(os.environ.get(nom, defaut))
+            except ValueError:
+                return defaut
+        return cls(entier("EXTRACTEUR_TRAVAUX_SIMULTANES", 2), entier("EXTRACTEUR_FILE_TRAVAUX", 20),
+                   entier("EXTRACTEUR_PROCESSUS_PAR_TRAVAIL", 0) or None)
+
+    def soumettre(self, fonction, *args, cle=None):
+        """
+        Ajoute un travail à la file et retourne aussitôt son identifiant.
+        fonction(travail, *args) est exécutée dans un thread du gestionnaire ; sa valeur de retour
+        devient travail.resultat. Lève FileTravauxPleine si la file est pleine.
+        cle : travaux qui ne doivent pas s'exécuter en même temps (ex. même dossier de travail) ; si un travail
+        de même clé est en attente ou en cours, rien n'est ajouté et son identifiant est retourné.
+        """
+        travail = Travail(uuid.uuid4().hex[:12], fonction, args, cle)
+        with self._verrou:
+            self._purger()
+            if cle is not None:
+                for existant in self._travaux.values():
+                    if existant.cle == cle and not existant.termine:
+                        return existant.identifiant
+            try:
+                self._file.put_nowait(travail)
+            except queue.Full:
+                raise FileTravauxPleine(
+                    f"Serveur occupé : {self._file.maxsize} traitement(s) déjà en attente, réessayez plus tard."
+                ) from None
+            self._travaux[travail.identifiant] = travail
+        return travail.identifiant
+
+    def travail(self, identifiant):
+        """Le Travail de cet identifiant, ou None (inconnu ou résultat expiré)."""
+        with self._verrou:
+            self._purger() # Fichiers des travaux expirés supprimés même sans nouvelle soumission
+        return self._travaux.get(identifiant)
+
+    def position(self, identifiant):
+        """Nombre de travaux en attente soumis avant celui-ci (0 : prochain à démarrer)."""
+        travail = self._travaux.get(identifiant)
+        if travail is None or travail.etat != "en_attente":
+            return 0
+        return sum(1 for t in list(self._travaux.values()) if t.etat == "en_attente" and t.soumis_le < travail.soumis_le)
+
+    def _purger(self):
+        limite = time.time() - DUREE_CONSERVATION_RESULTATS
+        for identifiant, travail in list(self._travaux.items()):
+            if travail.termine and travail.termine_le < limite:
+                del self._travaux[identifiant]
+                for chemin in travail.fichiers:
+                    try: os.remove(chemin)
+                    except OSError: pass
+
+    def _boucle(self):
+        while True:
+            travail = self._file.get()
+            try:
+                travail.executer()
+            finally:
+                self._file.task_done()
@@ -1,41 +1,284 @@
 import streamlit as st
 import os
-import zipfile
-import tempfile
+import functools
 import shutil
-import re
-import fitz  # PyMuPDF
-import time
+import tempfile
 import pandas as pd # Ajout pour Excel
-import io # Ajout pour gérer le fichier Excel en mémoire
-
-# --- Configuration Streamlit ---
-st.set_page_config(
-    page_title="Extracteur PDF", # Titre mis à jour
-    page_icon="📄",
-    layout="wide"
-)
-
-# --- Sidebar ---
-logo_url = "https://img.freepik.com/photos-premium/arbre-champ-contre-ciel_1048944-22099641.jpg?semt=ais_hybrid&w=740" # Changement d'image
-st.sidebar.image(logo_url, width=750)
-st.sidebar.title("Options & Infos")
-st.sidebar.info("""
+
+from extracteur.cache import CacheExtraction, chemin_cache_par_defaut
+from extracteur.export import NOM_RECAPITULATIF
+from extracteur.ingestion import preparer_uploads_en_direct, preparer_uploads_sur_disque
+from extracteur.isolation import LimitesDocument
+from extracteur.lot import traiter_lot
+from extracteur.performance import MesuresPerformance, SuiviMemoire, etape_mesuree
+from extracteur.reprise import ManifesteTravail, dossier_travaux_par_defaut, identifiant_travail, nettoyer_travaux
+from extracteur.textes import MagasinTextes, chemin_textes_par_defaut
+from extracteur.traitement import BilanTraitement
+from extracteur.travaux import FileTravauxPleine, GestionnaireTravaux
+
+
+# Traitements en arrière-plan : la session reste réactive, l'avancement est relu chaque seconde
+@st.cache_resource
+def gestionnaire_travaux():
+    """Gestionnaire commun à toutes les sessions du serveur (limites : voir GestionnaireTravaux.depuis_environnement)."""
+    return GestionnaireTravaux.depuis_environnement()
+
+
+def executer_traitement(travail, uploaded_files, options):
+    """
+    Traitement complet d'un dépôt, exécuté en arrière-plan par le gestionnaire de travaux.
+    Aucun appel à Streamlit ici : les messages passent par travail.signaler, la progression par travail.progression.
+    Retourne ce qu'affiche la section résumé : summary_stats, zip_path, excel_path, nb_lignes_extraites.
+    """
+    bilan = BilanTraitement()
+    cache_hits = cache_misses = None # Restent None si le cache n'est pas utilisé
+    mesures = MesuresPerformance() if options["mesurer_performance"] else None
+    limites = None # Analyse isolée seulement si un délai ou une mémoire max par PDF est demandé
+    if options["delai_max_document"] or options["memoire_max_document_mo"]:
+        limites = LimitesDocument(options["delai_max_document"] or None,
+                                  options["memoire_max_document_mo"] * 1024 * 1024 or None)
+    manifeste = None
+    zip_path = None
+    recapitulatifs_ecrits = {}
+    archives_ouvertes = []
+
+    # Utilisé seulement si les ZIP sont extraits sur disque
+    with SuiviMemoire() as suivi_memoire, tempfile.TemporaryDirectory() as temp_input_dir:
+
+        # Dossier de travail du lot (manifeste de reprise), retrouvé si les mêmes fichiers sont redéposés
+        dossier_entrees = temp_input_dir
+        if options["reprise_travaux"]:
+            try:
+                nettoyer_travaux(dossier_travaux_par_defaut())
+                dossier_travail = os.path.join(dossier_travaux_par_defaut(), options["identifiant_travail"])
+                manifeste = ManifesteTravail(dossier_travail)
+                # Chemins stables d'un lancement à l'autre (clés du manifeste) si les ZIP sont extraits sur disque
+                dossier_entrees = os.path.join(dossier_travail, "entrees")
+                os.makedirs(dossier_entrees, exist_ok=True)
+            except Exception as e:
+                travail.signaler("warning", f"⚠️ Reprise indisponible, traitement complet : {e}")
+                manifeste = None
+                dossier_entrees = temp_input_dir
+
+        try:
+            with etape_mesuree(mesures, "preparation"):
+                if options["lecture_directe_zip"]:
+                    all_pdf_paths_to_process, archives_ouvertes, pdf_saved_count, zip_extracted_count = \
+                        preparer_uploads_en_direct(uploaded_files, travail.signaler)
+                else:
+                    all_pdf_paths_to_process, pdf_saved_count, zip_extracted_count = \
+                        preparer_uploads_sur_disque(uploaded_files, dossier_entrees, travail.signaler)
+            # Chaque upload reste référencé par sa préparation seulement : libéré dès qu'il est copié sur disque
+            # (en lecture directe : quand le lot est fini). Streamlit garde de son côté les fichiers déposés en
+            # mémoire tant qu'ils sont affichés dans la zone de dépôt.
+            uploaded_files.clear()
+
+            travail.total = len(all_pdf_paths_to_process)
+            bilan.files_found_count = travail.total
+
+            if travail.total == 0:
+                travail.signaler("warning", "⚠️ Aucun fichier PDF trouvé à traiter.")
+            else:
+                cache = None
+                if options["utiliser_cache"]:
+                    try:
+                        cache = CacheExtraction(chemin_cache_par_defaut(), options["taille_cache_mo"] * 1024 * 1024)
+                    except Exception as e:
+                        travail.signaler("warning", f"⚠️ Cache d'extraction indisponible, traitement sans cache : {e}")
+                textes = None
+                if options["enregistrer_textes"]:
+                    try:
+                        textes = MagasinTextes(chemin_textes_par_defaut())
+                    except Exception as e:
+                        travail.signaler("warning", f"⚠️ Magasin de textes indisponible, texte des PDF non enregistré : {e}")
+
+                # Archive et Excel hors dossier temporaire : ils restent disponibles pour le téléchargement
+                # (supprimés par le gestionnaire quand le travail expire)
+                fd, final_zip_path_temp = tempfile.mkstemp(suffix=".zip", prefix="resultats_greenprime_")
+                os.close(fd)
+                travail.fichiers.append(final_zip_path_temp)
+                fd, final_excel_path = tempfile.mkstemp(suffix=".xlsx", prefix="recapitulatif_greenprime_")
+                os.close(fd)
+                travail.fichiers.append(final_excel_path)
+                recapitulatifs = {"xlsx": final_excel_path}
+                for format_sortie in options["formats_supplementaires"]:
+                    recapitulatifs[format_sortie] = os.path.join(temp_input_dir, f"{NOM_RECAPITULATIF}.{format_sortie}")
+
+                try:
+                    bilan, zip_path, recapitulatifs_ecrits = traiter_lot(
+                        all_pdf_paths_to_process, final_zip_path_temp, recapitulatifs, options["nb_workers"],
+                        travail.progression, cache, travail.signaler, mesures, manifeste, options["feuille_performance"],
+                        options["memoire_max_mo"] * 1024 * 1024, options["ignorer_doublons"], limites,
+                        options["chemin_maitre"] or None, textes,
+                        # Plusieurs travaux tournent dans des threads de ce processus : PyMuPDF seulement dans
+                        # les processus du pool
+                        en_processus=True
+                    )
+                finally:
+                    if cache is not None:
+                        cache_hits, cache_misses = cache.hits, cache.misses
+                        cache.fermer()
+                    if textes is not None:
+                        textes.fermer()
+        finally:
+            for archive in archives_ouvertes:
+                archive.close()
+            if manifeste is not None:
+                manifeste.fermer()
+                # Les uploads sont ré-extraits à chaque lancement : seul le manifeste est conservé
+                shutil.rmtree(dossier_entrees, ignore_errors=True)
+
+    return {
+        "summary_stats": {
+            **bilan.stats(),
+            "pdf_directs": pdf_saved_count,
+            "zips": zip_extracted_count,
+            "repris": manifeste.nb_repris if manifeste is not None else None,
+            "cache_hits": cache_hits,
+            "cache_misses": cache_misses,
+            "pic_memoire_mo": suivi_memoire.pic_mo,
+            # Restent None si les temps ne sont pas mesurés
+            "performance_etapes": mesures.lignes_totaux() if mesures is not None else None,
+            "performance_plus_lents": mesures.plus_lents(20) if mesures is not None else None
+        },
+        "zip_path": zip_path,
+        "excel_path": recapitulatifs_ecrits.get("xlsx"),
+        "nb_lignes_extraites": bilan.nb_lignes,
+    }
+
+
+def lire_fichier(chemin):
+    with open(chemin, "rb") as f:
+        return f.read()
+
+
+def bouton_telechargement(chemin, **options_bouton):
+    """
+    Bouton de téléchargement d'un fichier résultat : le fichier n'est lu sur disque qu'au clic (et sans relancer
+    le script), pas à chaque affichage de la page.
+    Streamlit envoie des octets : au clic, le fichier est lu en entier en mémoire, le temps du téléchargement.
+    """
+    st.download_button(data=functools.partial(lire_fichier, chemin), on_click="ignore", **options_bouton)
+
+
+def afficher_page():
+    """
+    Page de l'application. Appelée seulement quand Streamlit exécute ce script (__name__ == "__main__") :
+    les processus d'extraction démarrés par 'forkserver' ou 'spawn' ré-importent le module principal (sous
+    "__mp_main__") et ne doivent pas ré-exécuter l'interface.
+    """
+    # --- Configuration Streamlit ---
+    st.set_page_config(
+        page_title="Extracteur PDF", # Titre mis à jour
+        page_icon="📄",
+        layout="wide"
+    )
+
+    # --- Sidebar ---
+    logo_url = "https://img.freepik.com/photos-premium/arbre-champ-contre-ciel_1048944-22099641.jpg?semt=ais_hybrid&w=740" # Changement d'image
+    st.sidebar.image(logo_url, width=750)
+    st.sidebar.title("Options & Infos")
+    st.sidebar.info("""
     ℹ️ **Mode d'Extraction:**
     Extraction locale des données des PDF via Regex.
     Recherche les champs spécifiques des rapports Hej-ABd.
     Génère un fichier Excel récapitulatif.
     """)
+    nb_workers = st.sidebar.number_input(
+        "Processus d'extraction en parallèle",
+        min_value=1,
+        max_value=gestionnaire_travaux().processus_par_travail,
+        value=gestionnaire_travaux().processus_par_travail,
+        help="Nombre de cœurs utilisés pour analyser les PDF. 1 = traitement séquentiel. "
+             "Limité pour que plusieurs traitements puissent tourner en même temps sur le serveur."
+    )
+    utiliser_cache = st.sidebar.checkbox(
+        "Cache d'extraction",
+        value=True,
+        help="Réutilise les données des PDF déjà analysés (même contenu) sans les rouvrir."
+    )
+    taille_cache_mo = st.sidebar.number_input(
+        "Taille max du cache (Mo)",
+        min_value=1,
+        value=512,
+        disabled=not utiliser_cache,
+        help="Au-delà, les entrées les moins récemment utilisées sont supprimées."
+    )
+    enregistrer_textes = st.sidebar.checkbox(
+        "Enregistrer le texte des PDF",
+        value=True,
+        help="Garde le texte lu (compressé) de chaque PDF : après une correction de la table des champs, "
+             "le récapitulatif peut être refait sans rouvrir les PDF (python -m extracteur --reextraire)."
+    )
+    lecture_directe_zip = st.sidebar.checkbox(
+        "Lire les ZIP sans extraction sur disque",
+        value=True,
+        help="Les PDF sont lus directement dans l'archive uploadée, sans dossier temporaire."
+    )
+    ignorer_doublons = st.sidebar.checkbox(
+        "Ignorer les PDF en double",
+        value=True,
+        help="Un PDF au contenu identique à un autre du lot (autre nom, autre dossier ou autre ZIP) n'est traité "
+             "qu'une fois ; les doublons ignorés sont listés dans le résumé et la feuille 'Doublons' de l'Excel."
+    )
+    reprise_travaux = st.sidebar.checkbox(
+        "Reprendre les traitements interrompus",
+        value=True,
+        help="Chaque PDF traité est noté sur disque : si la page est rechargée ou le serveur redémarre, "
+             "redéposer les mêmes fichiers reprend le lot là où il s'était arrêté."
+    )
+    mesurer_performance = st.sidebar.checkbox(
+        "Mesurer les temps par étape",
+        value=False,
+        help="Affiche dans le résumé le temps passé par étape et les fichiers les plus lents."
+    )
+    memoire_max_mo = st.sidebar.number_input(
+        "Budget mémoire des PDF en cours (Mo)",
+        min_value=16,
+        value=256,
+        help="Taille max des PDF lus d'avance, en attente d'analyse ou d'archivage ; le pic de mémoire du lot est "
+             "affiché dans le résumé. Les fichiers déposés eux-mêmes restent en mémoire (Streamlit), hors budget."
+    )
+    delai_max_document = st.sidebar.number_input(
+        "Délai max par PDF (s, 0 = sans limite)",
+        min_value=0,
+        value=0,
+        help="Chaque PDF est analysé dans un processus isolé : au-delà de ce délai, il est abandonné "
+             "(échec 'timeout') sans ralentir le reste du lot."
+    )
+    memoire_max_document_mo = st.sidebar.number_input(
+        "Mémoire max par PDF (Mo, 0 = sans limite)",
+        min_value=0,
+        value=0,
+        help="Plafonne la mémoire du processus qui analyse chaque PDF (Linux) : un PDF trop gourmand échoue seul."
+    )
+    chemin_maitre = st.sidebar.text_input(
+        "Récapitulatif maître (chemin sur le serveur)",
+        help="Fichier .xlsx ou dossier Parquet mis à jour à chaque lot : les lignes sont ajoutées ou remplacées "
+             "par 'Reference Rapport'. Le .xlsx est réécrit sans sa mise en forme (valeurs seules). En Parquet, "
+             "la mise à jour ne relit pas l'historique."
+    ).strip()
+    formats_supplementaires = st.sidebar.multiselect(
+        "Formats supplémentaires du récapitulatif",
+        ["csv", "parquet"],
+        help="Écrits en plus de l'Excel et ajoutés à l'archive ZIP (Parquet : lecture rapide avec pandas, DuckDB...)."
+    )
+    feuille_performance = st.sidebar.checkbox(
+        "Feuille 'Performance' dans l'Excel",
+        value=False,
+        disabled=not mesurer_performance,
+        help="Ajoute au récapitulatif Excel le détail des temps fichier par fichier."
+    )
 
-# --- Titre Principal ---
-st.title("📄 Extracteur & Renommeur de Rapports PDF") # Titre mis à jour
-st.markdown("Optimisé par H-A :)")
+    # --- Titre Principal ---
+    st.title("📄 Extracteur & Renommeur de Rapports PDF") # Titre mis à jour
+    st.markdown("Optimisé par H-A :)")
 
-st.divider()
+    st.divider()
 
-# --- Instructions Utilisateur Clarifiées ---
-st.markdown("### Comment utiliser cet outil :")
-st.markdown("""
+    # --- Instructions Utilisateur Clarifiées ---
+    st.markdown("### Comment utiliser cet outil :")
+    st.markdown("""
 1.  **Déposez vos fichiers** dans la zone ci-dessous :
     *   Fichiers PDF individuels (nommés avec 'REFERENCE' ou similaire).
     *   **OU** une archive ZIP contenant vos PDF.
@@ -44,478 +287,251 @@ st.markdown("""
 4.  **Consultez le résumé** et **téléchargez** l'archive ZIP contenant les PDF renommés et le fichier Excel récapitulatif.
 """)
 
-st.divider()
-
-# --- Fonctions ---
-
-def safe_search(pattern, text, group_index=1, default_value=""):
-    """Effectue une recherche regex et retourne le groupe ou une valeur par défaut."""
-    match = re.search(pattern, text, re.IGNORECASE | re.DOTALL)
-    if match and len(match.groups()) >= group_index:
-        return match.group(group_index).strip().replace('\n', ' ') # Remplace les sauts de ligne par des espaces
-    return default_value
-
-def extraire_donnees_pdf(pdf_path):
-    """Extrait les données structurées d'un PDF Greenprime."""
-    data = {}
-    doc = None
-    nom_fichier = os.path.basename(pdf_path)
-
-    try:
-        doc = fitz.open(pdf_path)
-        text_page1 = ""
-        text_page2 = ""
-        if len(doc) > 0:
-            text_page1 = doc.load_page(0).get_text("text")
-        if len(doc) > 1:
-            text_page2 = doc.load_page(1).get_text("text")
-        else:
-             # Si pas de page 2, on essaie quand même de trouver les infos sur la page 1
-             text_page2 = text_page1
-
-        # Combiner texte peut aider si un champ est coupé entre pages (peu probable ici)
-        # full_text = text_page1 + "\n" + text_page2
-
-        # --- Extraction Page 1 ---
-        data["Reference Rapport"] = safe_search(r"Référence du rapport\s+(.*?)(?:\n|$)", text_page1)
-        data["FOS"] = safe_search(r"BAR-TH-\d+", text_page1 + text_page2) # Recherche FOS sur les deux pages
-
-        # --- Extraction Page 2 (ou Page 1 si unique) ---
-        # Utiliser text_page2 car c'est là que la plupart des infos sont attendues
-        data["Adresse Travaux"] = safe_search(r"Adresse des travaux\s+(.*?)\nNom du bénéficiaire", text_page2)
-        # Si le pattern ci-dessus échoue (car Nom du bénéficiaire n'est pas juste après), essayer une version plus simple
-        if not data["Adresse Travaux"]:
-             data["Adresse Travaux"] = safe_search(r"Adresse des travaux\s+(.*?)(?:\n\s*\n|\n[A-Z])", text_page2) # Essaye d'arrêter avant un double saut de ligne ou une nouvelle ligne commençant par une majuscule
-
-
-        data["Nom Beneficiaire"] = safe_search(r"Nom du bénéficiaire\s+(.*?)(?:\n|$)", text_page2)
-        data["Raison Sociale Professionnel"] = safe_search(r"Raison sociale du professionnel\s+(.*?)(?:\n|$)", text_page2)
-
-        data["Beneficiaire Joint"] = safe_search(r"Bénéficiaire joint\s+(OUI|NON)", text_page2)
-        data["Telephone Errone"] = safe_search(r"Numéro de téléphone erroné\s+(OUI|NON)", text_page2)
-        data["Controle Realise"] = safe_search(r"Contrôle réalisé\s+(OUI|NON)", text_page2)
-        data["Date Controle"] = safe_search(r"Date du contrôle\s+([\d/]+)", text_page2)
-
-        data["Systeme Regulation Installe"] = safe_search(r"pièce par pièce installé\s+(OUI|NON)", text_page2) # Simplifié
-        data["Reception Consignes Emetteurs"] = safe_search(r"température de consigne\s+(OUI|NON)", text_page2) # Simplifié
-        data["Commentaire Non Reception"] = safe_search(r"n'est pas assurée\s+([^\n]*)", text_page2) # Capture la ligne après "assurée"
-        data["Absence Non Qualite Manifeste"] = safe_search(r"détectée par le bénéficiaire\s+(OUI|NON)", text_page2) # Simplifié
-        data["Commentaire Non Qualite Relevee"] = safe_search(r"non-qualité relevée\s+([^\n]*)", text_page2) # Capture la ligne après "relevée"
-
-        # Conclusion - Recherche le mot clé spécifique
-        if "SATISFAISANT" in text_page2:
-            data["Conclusion Controle"] = "SATISFAISANT"
-        elif "NON SATISFAISANT" in text_page2:
-             data["Conclusion Controle"] = "NON SATISFAISANT"
-        else:
-             # Essayer de capturer après le label si les mots clés ne sont pas trouvés
-             data["Conclusion Controle"] = safe_search(r"Conclusion du contrôle\s+([^\n]*)", text_page2)
-
-
-        # Nettoyage final (enlever les espaces superflus)
-        for key, value in data.items():
-             if isinstance(value, str):
-                 data[key] = ' '.join(value.split())
-
-
-        # Vérifier si des données essentielles (comme la référence) ont été trouvées
-        if not data.get("Reference Rapport"):
-            st.warning(f"⚠️ Référence non trouvée dans {nom_fichier}. Extraction de données peut être incomplète.")
-            # On retourne quand même ce qu'on a trouvé, mais la référence est clé
-            # return None # Optionnel: considérer l'extraction comme échouée si la ref manque
-
-        return data
-
-    except Exception as e:
-        st.error(f"❌ Erreur extraction données PDF '{nom_fichier}' : {type(e).__name__} - {e}")
-        return None # Retourne None en cas d'erreur majeure
-    finally:
-        if doc:
-            try: doc.close()
-            except: pass
-
-
-def traiter_pdf_et_extraire(pdf_path, dossier_sortie):
-    """
-    Traite un PDF: renomme/copie ET extrait les données.
-    Retourne: status, nom_original, nouveau_nom, donnees_extraites
-    Status: success, skipped_name, no_ref_or_error, invalid_ref, conflict_max, copy_error, extraction_error
-    """
-    nom_fichier_original = os.path.basename(pdf_path)
-    nouveau_nom = None
-    donnees_extraites = None
-    status = "unknown_error" # Default status
-
-    # 1. Vérifier si le fichier doit être traité (basé sur le nom)
-    # Adaptez cette condition si nécessaire (ex: ou si un flag force le traitement)
-    # if "REFERENCE" not in nom_fichier_original.upper():
-    #     return "skipped_name", nom_fichier_original, None, None
-    # Simplification : on essaie de traiter tous les PDF trouvés, le filtrage se fera sur l'extraction
-
-    # 2. Extraire les données d'abord (la référence est dedans)
-    donnees_extraites = extraire_donnees_pdf(pdf_path)
-
-    if donnees_extraites is None:
-        # Erreur critique pendant l'extraction (déjà logguée dans la fonction)
-        return "extraction_error", nom_fichier_original, None, None
-
-    ref = donnees_extraites.get("Reference Rapport", "")
-
-    # 3. Vérifier si la référence est valide pour le renommage
-    if not ref:
-        # Pas de référence trouvée OU vide, on ne peut pas renommer correctement
-        # On garde les données extraites si elles existent, mais on signale l'échec du renommage
-        st.warning(f"⚠️ Référence vide ou non trouvée pour '{nom_fichier_original}', renommage impossible.")
-        return "no_ref_found", nom_fichier_original, None, donnees_extraites # Nouveau status
-
-    ref_clean = "".join(c for c in ref if c.isalnum() or c in ('-', '_', '.')).strip()
-    if not ref_clean:
-         # La référence extraite ne contient aucun caractère valide après nettoyage
-         st.warning(f"⚠️ Référence '{ref}' invalide après nettoyage pour '{nom_fichier_original}', renommage impossible.")
-         return "invalid_ref", nom_fichier_original, None, donnees_extraites # Statut existant
-
-    # 4. Générer le nouveau nom et gérer les conflits
-    nouveau_nom = f"RAPPORT - {ref_clean}.pdf"
-    nouveau_chemin = os.path.join(dossier_sortie, nouveau_nom)
-
-    count = 1
-    base_name = f"RAPPORT - {ref_clean}"
-    while os.path.exists(nouveau_chemin):
-        nouveau_nom = f"{base_name}_{count}.pdf"
-        nouveau_chemin = os.path.join(dossier_sortie, nouveau_nom)
-        count += 1
-        if count > 20:
-             st.error(f"❌ Trop de conflits de nom pour '{ref_clean}' ({nom_fichier_original}).")
-             # On a les données, mais le renommage/copie échoue ici
-             return "conflict_max", nom_fichier_original, None, donnees_extraites # Statut existant
-
-    # 5. Copier le fichier avec le nouveau nom
-    try:
-        shutil.copy2(pdf_path, nouveau_chemin)
-        # Ajouter les noms de fichier aux données pour l'Excel
-        donnees_extraites["Nom Fichier Original"] = nom_fichier_original
-        donnees_extraites["Nouveau Nom Fichier"] = nouveau_nom
-        return "success", nom_fichier_original, nouveau_nom, donnees_extraites # Succès complet
-    except Exception as e:
-        st.error(f"❌ Erreur copie '{nom_fichier_original}' → '{nouveau_nom}': {e}")
-         # On a les données, mais la copie a échoué
-        return "copy_error", nom_fichier_original, nouveau_nom, donnees_extraites # Statut existant
-
-
-def creer_zip_avec_resultats(dossier_source, nom_zip_final, chemin_excel=None):
-    """Crée une archive ZIP à partir du contenu (PDFs + Excel) du dossier source."""
-    fichiers_ajoutes = 0
-    try:
-        with zipfile.ZipFile(nom_zip_final, 'w', zipfile.ZIP_DEFLATED) as zipf:
-            # Ajouter les PDF renommés
-            for root, _, files in os.walk(dossier_source):
-                for file in files:
-                    # Inclure uniquement les PDF (renommés)
-                    if file.lower().endswith(".pdf"):
-                        chemin_complet = os.path.join(root, file)
-                        # Ajouter à la racine du ZIP
-                        zipf.write(chemin_complet, arcname=file)
-                        fichiers_ajoutes += 1
-
-            # Ajouter le fichier Excel s'il existe
-            if chemin_excel and os.path.exists(chemin_excel):
-                zipf.write(chemin_excel, arcname=os.path.basename(chemin_excel))
-                # On ne compte pas l'excel dans le compte principal pour l'instant
-                # fichiers_ajoutes += 1
-
-            if fichiers_ajoutes == 0 and (not chemin_excel or not os.path.exists(chemin_excel)):
-                if os.path.exists(nom_zip_final): os.remove(nom_zip_final)
-                return None, 0 # Aucun fichier à zipper
-
-        # Retourner le chemin du zip et le nombre de PDF ajoutés
-        return nom_zip_final, fichiers_ajoutes
-    except Exception as e:
-        st.error(f"❌ Erreur critique lors de la création de l'archive ZIP : {e}")
-        if os.path.exists(nom_zip_final):
-            try: os.remove(nom_zip_final)
-            except OSError: pass
-        return None, 0
-
-
-# --- Interface Principale Streamlit ---
-
-# Initialisation Session State
-if 'zip_path' not in st.session_state: st.session_state['zip_path'] = None
-if 'excel_path' not in st.session_state: st.session_state['excel_path'] = None # Ajout
-if 'processing_done' not in st.session_state: st.session_state['processing_done'] = False
-if 'summary_stats' not in st.session_state: st.session_state['summary_stats'] = {}
-if 'all_extracted_data' not in st.session_state: st.session_state['all_extracted_data'] = [] # Stocker les données extraites
-
-# --- Section 1: Dépôt des Fichiers ---
-st.subheader("1. Déposer les fichiers")
-uploaded_files = st.file_uploader(
-    "Sélectionnez des PDF ou une archive ZIP",
-    accept_multiple_files=True,
-    type=['zip', 'pdf'],
-    help="Déposez des PDF ou une archive ZIP contenant vos rapports.",
-    label_visibility="collapsed"
-)
-
-st.divider()
-
-# --- Section 2: Lancement du Traitement ---
-st.subheader("2. Lancer le traitement")
-col1, col2, col3 = st.columns([1, 2, 1])
-with col2:
-    lancer_traitement = st.button(
-        "🚀 Lancer le Traitement", # Nom bouton mis à jour
-        disabled=(not uploaded_files),
-        use_container_width=True,
-        type="primary"
+    st.divider()
+
+    # --- Interface Principale Streamlit ---
+
+    # Initialisation Session State
+    if 'zip_path' not in st.session_state: st.session_state['zip_path'] = None
+    if 'excel_path' not in st.session_state: st.session_state['excel_path'] = None # Ajout
+    if 'processing_done' not in st.session_state: st.session_state['processing_done'] = False
+    if 'summary_stats' not in st.session_state: st.session_state['summary_stats'] = {}
+    if 'nb_lignes_extraites' not in st.session_state: st.session_state['nb_lignes_extraites'] = 0 # Lignes écrites dans le récapitulatif
+    if 'messages_traitement' not in st.session_state: st.session_state['messages_traitement'] = []
+    # Traitement en arrière-plan suivi par cette session (retrouvé via l'URL après un rechargement de page)
+    if 'travail_id' not in st.session_state: st.session_state['travail_id'] = st.query_params.get("travail")
+
+    # --- Section 1: Dépôt des Fichiers ---
+    st.subheader("1. Déposer les fichiers")
+    uploaded_files = st.file_uploader(
+        "Sélectionnez des PDF ou une archive ZIP",
+        accept_multiple_files=True,
+        type=['zip', 'pdf'],
+        help="Déposez des PDF ou une archive ZIP contenant vos rapports.",
+        label_visibility="collapsed"
     )
-
-st.divider()
-
-# --- Section 3: Traitement (si bouton cliqué) ---
-if lancer_traitement:
-    # Réinitialisation
-    st.session_state['zip_path'] = None
-    st.session_state['excel_path'] = None
-    st.session_state['processing_done'] = False
-    st.session_state['summary_stats'] = {}
-    st.session_state['all_extracted_data'] = [] # Vider les données précédentes
-
-    files_found_count = 0
-    files_processed_count = 0 # Compte les fichiers où le traitement a été tenté
-    files_succeeded_rename_count = 0 # Compte les renommages/copies réussis
-    files_succeeded_extraction_count = 0 # Compte les extractions réussies (même si renommage échoue)
-    files_failed_count = 0 # Compte les échecs globaux (extraction ou copie)
-    failed_files_details = []
-    all_pdf_paths_to_process = []
-    extracted_data_list = [] # Liste pour stocker les dictionnaires de données
-
-    if uploaded_files:
-        with tempfile.TemporaryDirectory() as temp_input_dir, \
-             tempfile.TemporaryDirectory() as temp_output_dir: # Sortie pour PDFs renommés et Excel
-
-            prep_placeholder = st.info("📁 Préparation des fichiers...")
-            # ... (Code de préparation/extraction ZIP identique à avant) ...
-            with st.spinner("Analyse des fichiers uploadés..."):
-                zip_extracted_count = 0
-                pdf_saved_count = 0
-                for uploaded_file in uploaded_files:
-                    temp_file_path = os.path.join(temp_input_dir, uploaded_file.name)
-                    try:
-                        with open(temp_file_path, "wb") as f: f.write(uploaded_file.getbuffer())
-                    except Exception as e:
-                        st.error(f"❌ Erreur sauvegarde '{uploaded_file.name}': {e}")
-                        continue
-
-                    if uploaded_file.type == "application/zip" or temp_file_path.lower().endswith(".zip"):
-                        try:
-                            with zipfile.ZipFile(temp_file_path, 'r') as zip_ref:
-                                zip_ref.extractall(temp_input_dir)
-                            zip_extracted_count +=1
-                            # Ne pas supprimer le zip tout de suite si on veut le réutiliser
-                            # os.remove(temp_file_path)
-                        except Exception as e:
-                             st.error(f"❌ Erreur extraction '{uploaded_file.name}' : {e}")
-                             # try: os.remove(temp_file_path) except OSError: pass # Ne pas supprimer en cas d'erreur
-                    else:
-                        pdf_saved_count += 1
-
-            prep_placeholder.info(f"📁 Préparation terminée. {pdf_saved_count} PDF direct(s), {zip_extracted_count} ZIP(s) trouvé(s).")
-
-
-            for root, dirs, files in os.walk(temp_input_dir):
-                 # Exclure les dossiers cachés et spécifiques à MacOSX
-                 dirs[:] = [d for d in dirs if not d.startswith('.') and d != '__MACOSX']
-                 for file in files:
-                    if file.lower().endswith(".pdf") and not file.startswith('._'): # Exclure les fichiers macOS temporaires
-                        all_pdf_paths_to_process.append(os.path.join(root, file))
-            files_found_count = len(all_pdf_paths_to_process)
-
-            if files_found_count == 0:
-                 st.warning("⚠️ Aucun fichier PDF trouvé à traiter.")
+    st.caption("Les fichiers déposés sont gardés en mémoire par le serveur tant qu'ils sont dans cette zone : la taille "
+               "d'un dépôt est limitée par sa RAM. Pour de très gros lots, utiliser la ligne de commande "
+               "(python -m extracteur).")
+
+    st.divider()
+
+    # --- Section 2: Lancement du Traitement ---
+    st.subheader("2. Lancer le traitement")
+    col1, col2, col3 = st.columns([1, 2, 1])
+    with col2:
+        lancer_traitement = st.button(
+            "🚀 Lancer le Traitement", # Nom bouton mis à jour
+            disabled=(not uploaded_files),
+            use_container_width=True,
+            type="primary"
+        )
+
+    st.divider()
+
+    # --- Section 3: Traitement en arrière-plan (si bouton cliqué) ---
+    if lancer_traitement:
+        # Réinitialisation
+        st.session_state['zip_path'] = None
+        st.session_state['excel_path'] = None
+        st.session_state['processing_done'] = False
+        st.session_state['summary_stats'] = {}
+        st.session_state['nb_lignes_extraites'] = 0
+        st.session_state['messages_traitement'] = []
+
+        if uploaded_files:
+            options = {
+                "nb_workers": nb_workers,
+                "utiliser_cache": utiliser_cache,
+                "taille_cache_mo": taille_cache_mo,
+                "enregistrer_textes": enregistrer_textes,
+                "lecture_directe_zip": lecture_directe_zip,
+                "reprise_travaux": reprise_travaux,
+                "ignorer_doublons": ignorer_doublons,
+                "mesurer_performance": mesurer_performance,
+                "memoire_max_mo": memoire_max_mo,
+                "delai_max_document": delai_max_document,
+                "chemin_maitre": chemin_maitre,
+                "memoire_max_document_mo": memoire_max_document_mo,
+                "feuille_performance": feuille_performance,
+                "formats_supplementaires": list(formats_supplementaires),
+            }
+            # Avec la reprise, les mêmes fichiers partagent un dossier de travail : un dépôt identique déjà en
+            # attente ou en cours est suivi au lieu d'être relancé en parallèle dans le même dossier
+            cle = identifiant_travail(uploaded_files) if reprise_travaux else None
+            options["identifiant_travail"] = cle # Calculé une fois (contenu haché) pour la clé et le dossier de travail
+            try:
+                travail_id = gestionnaire_travaux().soumettre(executer_traitement, list(uploaded_files), options, cle=cle)
+                st.session_state['travail_id'] = travail_id
+                st.query_params["travail"] = travail_id # Permet de retrouver le traitement après un rechargement de page
+            except FileTravauxPleine as e:
+                st.error(f"⏳ {e}")
+
+        else: # Cas "not uploaded_files" déjà géré par disabled button
+            st.warning("Veuillez déposer au moins un fichier ZIP ou PDF.")
+
+
+    @st.fragment(run_every=1)
+    def suivre_travail():
+        """Affiche l'avancement du traitement en cours (rafraîchi chaque seconde, sans bloquer la session)."""
+        travail = gestionnaire_travaux().travail(st.session_state['travail_id'])
+        if travail is None:
+            st.warning("⚠️ Traitement introuvable (serveur redémarré ou résultat expiré). Relancez-le.")
+            st.session_state['travail_id'] = None
+            st.query_params.pop("travail", None)
+            return
+
+        st.caption(f"Traitement n° {travail.identifiant}")
+        if travail.etat == "en_attente":
+            position = gestionnaire_travaux().position(travail.identifiant)
+            st.info(f"⏳ En file d'attente ({position} traitement(s) avant celui-ci)...")
+        elif travail.etat == "en_cours":
+            if travail.total:
+                st.progress(travail.nb_termines / travail.total,
+                            text=f"Traitement PDF {travail.nb_termines}/{travail.total}")
             else:
-                st.info(f"⚙️ Traitement de {files_found_count} fichier(s) PDF...")
-                progress_placeholder = st.empty()
-                progress_bar = progress_placeholder.progress(0, text="Analyse en cours...")
-
-                for i, pdf_path in enumerate(all_pdf_paths_to_process):
-                    files_processed_count += 1 # Compte chaque tentative
-                    status, original_name, new_name, extracted_data = traiter_pdf_et_extraire(pdf_path, temp_output_dir)
-
-                    # Mise à jour compteurs et détails d'échec
-                    if status == "success":
-                        files_succeeded_rename_count += 1
-                        files_succeeded_extraction_count += 1 # Succès implique extraction réussie
-                        if extracted_data: # S'assurer que les données existent
-                             extracted_data_list.append(extracted_data)
-                    elif status in ["no_ref_found", "invalid_ref", "conflict_max", "copy_error"]:
-                        # Renommage/Copie a échoué, mais l'extraction a pu réussir
-                        files_failed_count += 1
-                        reason = status.replace("_", " ").capitalize()
-                        failed_files_details.append({"file": original_name, "reason": f"Échec renommage/copie ({reason})"})
-                        if extracted_data:
-                            # On a quand même les données, on les ajoute pour l'Excel
-                            files_succeeded_extraction_count += 1
-                            extracted_data["Nom Fichier Original"] = original_name
-                            extracted_data["Nouveau Nom Fichier"] = "ERREUR_RENOMMAGE" # Marqueur dans l'excel
-                            extracted_data_list.append(extracted_data)
-                    elif status == "extraction_error":
-                        files_failed_count += 1
-                        failed_files_details.append({"file": original_name, "reason": "Erreur extraction données"})
-                    elif status == "skipped_name":
-                         files_processed_count -= 1 # Ne pas compter comme traité si skippé par nom
-                         pass # Ignoré, pas un échec direct
-                    else: # unknown_error ou autre
-                        files_failed_count += 1
-                        failed_files_details.append({"file": original_name, "reason": "Erreur inconnue"})
-
-
-                    # Mise à jour de la barre de progression
-                    progress_text = f"Traitement PDF {i+1}/{files_found_count}"
-                    progress_bar.progress((i + 1) / files_found_count, text=progress_text)
-
-                progress_placeholder.empty() # Nettoyer la barre
-
-                st.session_state['all_extracted_data'] = extracted_data_list # Sauvegarder les données
-
-                # --- Génération Excel ---
-                final_excel_path = None
-                if extracted_data_list: # S'il y a des données à mettre dans l'Excel
-                    st.info("📊 Génération du fichier Excel récapitulatif...")
-                    try:
-                        # Définir l'ordre souhaité des colonnes
-                        colonnes_ordre = [
-                            "Nom Fichier Original", "Nouveau Nom Fichier", "Reference Rapport", "FOS",
-                            "Adresse Travaux", "Nom Beneficiaire", "Raison Sociale Professionnel",
-                            "Beneficiaire Joint", "Telephone Errone", "Controle Realise", "Date Controle",
-                            "Systeme Regulation Installe", "Reception Consignes Emetteurs",
-                            "Commentaire Non Reception", "Absence Non Qualite Manifeste",
-                            "Commentaire Non Qualite Relevee", "Conclusion Controle"
-                        ]
-                        df = pd.DataFrame(extracted_data_list)
-                        # Réorganiser les colonnes et ajouter celles manquantes si nécessaire
-                        df = df.reindex(columns=colonnes_ordre, fill_value="")
-
-                        excel_filename = "recapitulatif_controles_greenprime.xlsx"
-                        final_excel_path = os.path.join(temp_output_dir, excel_filename)
-
-                        # Utiliser openpyxl comme moteur pour une meilleure compatibilité
-                        df.to_excel(final_excel_path, index=False, engine='openpyxl')
-                        st.session_state['excel_path'] = final_excel_path
-                        st.success(f"✅ Fichier Excel '{excel_filename}' généré.")
-                    except Exception as e:
-                        st.error(f"❌ Erreur lors de la génération du fichier Excel : {e}")
-                        st.session_state['excel_path'] = None
-                else:
-                    st.warning("⚠️ Aucune donnée extraite avec succès pour générer le fichier Excel.")
-
-
-                # --- Création ZIP (Maintenant avec l'Excel) ---
-                if files_succeeded_rename_count > 0 or st.session_state['excel_path']:
-                    st.info("📦 Création de l'archive ZIP...")
-                    # Créer un chemin temporaire pour le zip final en dehors du dossier temp_output_dir
-                    fd, final_zip_path_temp = tempfile.mkstemp(suffix=".zip", prefix="resultats_greenprime_")
-                    os.close(fd)
-
-                    zip_path, zip_pdf_count = creer_zip_avec_resultats(temp_output_dir, final_zip_path_temp, st.session_state['excel_path'])
-                    st.session_state['zip_path'] = zip_path
-                    if zip_path:
-                        msg = f"✅ Archive ZIP créée avec {zip_pdf_count} PDF(s)"
-                        if st.session_state['excel_path']: msg += " et le fichier Excel."
-                        else: msg += "."
-                        st.success(msg)
-                    else:
-                         st.error("❌ Échec critique lors de la création de l'archive ZIP finale.")
-                else:
-                    st.warning("Aucun PDF renommé avec succès et pas de fichier Excel à inclure. Archive ZIP non créée.")
-
+                st.info("📁 Préparation des fichiers...")
+        for niveau, message in travail.messages[-5:]:
+            (st.error if niveau == "error" else st.warning)(message)
 
+        if travail.termine:
+            st.session_state['travail_id'] = None
+            st.session_state['messages_traitement'] = list(travail.messages)
             st.session_state['processing_done'] = True
-            # Stockage des stats pour affichage
-            st.session_state['summary_stats'] = {
-                "found": files_found_count,
-                "processed": files_processed_count,
-                "succeeded_rename": files_succeeded_rename_count,
-                "succeeded_extraction": files_succeeded_extraction_count,
-                "failed": files_failed_count,
-                "failures": failed_files_details
-            }
-
-    else: # Cas "not uploaded_files" déjà géré par disabled button
-        st.warning("Veuillez déposer au moins un fichier ZIP ou PDF.")
-
-
-# --- Section 4: Affichage du Résumé et Téléchargement ---
-if st.session_state['processing_done']:
-
-    stats = st.session_state.get('summary_stats', {})
-    if not stats and not uploaded_files:
-         pass # Ne rien afficher
-    elif not stats and uploaded_files:
-         st.warning("Aucune donnée à résumer (aucun PDF trouvé ou traité).")
-    elif stats:
-        st.subheader("📊 Résumé du Traitement")
-        col1, col2, col3 = st.columns(3) # Trois colonnes pour mieux répartir
-        with col1:
-            st.metric(label="PDF Trouvés", value=f"{stats.get('found', 0)}")
-            st.metric(label="PDF Traités", value=f"{stats.get('processed', 0)}")
-        with col2:
-            st.metric(label="✅ Renommages Réussis", value=f"{stats.get('succeeded_rename', 0)}")
-            st.metric(label="📊 Extractions Réussies", value=f"{stats.get('succeeded_extraction', 0)}")
-        with col3:
-             st.metric(label="❌ Échecs (Total)", value=f"{stats.get('failed', 0)}")
-             # Afficher les détails des échecs s'il y en a
-             failed_count = stats.get('failed', 0)
-             if failed_count > 0:
-                 with st.expander(f"🔍 Voir détails des {failed_count} échec(s)"):
-                     df_failures = pd.DataFrame(stats.get('failures', []))
-                     if not df_failures.empty:
-                         df_failures.columns = ["Fichier", "Raison de l'échec"]
-                         st.table(df_failures)
-                     else:
-                         st.write("Aucun détail d'échec spécifique enregistré.")
-
-
-    # --- Section Téléchargement ---
-    zip_path_final = st.session_state.get('zip_path')
-    excel_path_final = st.session_state.get('excel_path')
-
-    if zip_path_final and os.path.exists(zip_path_final):
-        st.divider()
-        st.subheader("3. Télécharger les résultats")
-        col_dl1, col_dl2 = st.columns(2) # Deux colonnes pour les boutons
-
-        with col_dl1:
-             with open(zip_path_final, "rb") as fp_zip:
-                st.download_button(
+            if travail.etat == "echec":
+                st.session_state['messages_traitement'].append(("error", f"❌ Erreur pendant le traitement : {travail.erreur}"))
+            else:
+                st.session_state['summary_stats'] = travail.resultat["summary_stats"]
+                st.session_state['zip_path'] = travail.resultat["zip_path"]
+                st.session_state['excel_path'] = travail.resultat["excel_path"]
+                st.session_state['nb_lignes_extraites'] = travail.resultat["nb_lignes_extraites"]
+            st.rerun() # Affichage du résumé
+
+
+    if st.session_state['travail_id']:
+        suivre_travail()
+
+
+    # --- Section 4: Affichage du Résumé et Téléchargement ---
+    if st.session_state['processing_done']:
+
+        messages = st.session_state.get('messages_traitement', [])
+        erreurs = [message for niveau, message in messages if niveau == "error"]
+        for message in erreurs[-5:]: # Erreur du traitement lui-même en dernier
+            st.error(message)
+        if messages:
+            with st.expander(f"📝 Messages du traitement ({len(messages)})"):
+                for niveau, message in messages:
+                    (st.error if niveau == "error" else st.warning)(message)
+
+        stats = st.session_state.get('summary_stats', {})
+        if stats.get('repris'):
+            st.success(f"⏯️ {stats['repris']} PDF repris du traitement précédent.")
+        if stats.get('maitre'):
+            st.success(f"📚 Récapitulatif maître '{stats['maitre']['chemin']}' : {stats['maitre']['ajoutees']} ligne(s) "
+                       f"ajoutée(s), {stats['maitre']['mises_a_jour']} mise(s) à jour.")
+            if stats['maitre']['ecartees']:
+                st.warning(f"📚 {len(stats['maitre']['ecartees'])} PDF du lot partagent leur référence avec un PDF traité "
+                           "après eux : seule la dernière ligne est gardée dans le maître.")
+                st.dataframe(pd.DataFrame(stats['maitre']['ecartees']), hide_index=True, use_container_width=True)
+        if not stats and not uploaded_files:
+             pass # Ne rien afficher
+        elif not stats and uploaded_files:
+             st.warning("Aucune donnée à résumer (aucun PDF trouvé ou traité).")
+        elif stats:
+            st.subheader("📊 Résumé du Traitement")
+            col1, col2, col3 = st.columns(3) # Trois colonnes pour mieux répartir
+            with col1:
+                st.metric(label="PDF Trouvés", value=f"{stats.get('found', 0)}")
+                st.metric(label="PDF Traités", value=f"{stats.get('processed', 0)}")
+            with col2:
+                st.metric(label="✅ Renommages Réussis", value=f"{stats.get('succeeded_rename', 0)}")
+                st.metric(label="📊 Extractions Réussies", value=f"{stats.get('succeeded_extraction', 0)}")
+            with col3:
+                 st.metric(label="❌ Échecs (Total)", value=f"{stats.get('failed', 0)}")
+                 # Afficher les détails des échecs s'il y en a
+                 failed_count = stats.get('failed', 0)
+                 if failed_count > 0:
+                     with st.expander(f"🔍 Voir détails des {failed_count} échec(s)"):
+                         df_failures = pd.DataFrame(stats.get('failures', []))
+                         if not df_failures.empty:
+                             df_failures.columns = ["Fichier", "Raison de l'échec"]
+                             st.table(df_failures)
+                         else:
+                             st.write("Aucun détail d'échec spécifique enregistré.")
+                 doublons = stats.get('doublons', [])
+                 if doublons:
+                     st.metric(label="🧬 Doublons ignorés", value=f"{len(doublons)}")
+                     with st.expander(f"🔍 Voir les {len(doublons)} doublon(s)"):
+                         st.dataframe(pd.DataFrame(doublons), hide_index=True, use_container_width=True)
+
+            if stats.get('modeles'):
+                with st.expander(f"🗂️ Modèles de rapport reconnus ({len(stats['modeles'])})"):
+                    st.caption("Documents extraits par modèle (choisi d'après la page 1) et durée moyenne d'analyse "
+                               "des documents analysés par ce traitement (hors cache et reprise).")
+                    st.dataframe(pd.DataFrame(stats['modeles']), hide_index=True, use_container_width=True)
+
+            col_cache1, col_cache2, col_memoire = st.columns(3)
+            if stats.get('cache_hits') is not None:
+                with col_cache1:
+                    st.metric(label="♻️ Cache : PDF déjà connus", value=f"{stats['cache_hits']}")
+                with col_cache2:
+                    st.metric(label="🆕 Cache : PDF analysés", value=f"{stats['cache_misses']}")
+            if stats.get('pic_memoire_mo') is not None:
+                with col_memoire:
+                    st.metric(label="🧠 Pic mémoire (Mo)", value=f"{stats['pic_memoire_mo']:.0f}",
+                              help="Mémoire résidente max pendant le lot : serveur + processus d'extraction.")
+
+            if stats.get('performance_etapes') is not None:
+                with st.expander("⏱️ Temps par étape et fichiers les plus lents"):
+                    st.caption("En parallèle, les temps par fichier s'additionnent sur tous les processus "
+                               "et peuvent dépasser la durée réelle du lot.")
+                    st.table(pd.DataFrame(stats['performance_etapes']))
+                    st.markdown(f"**{len(stats['performance_plus_lents'])} fichiers les plus lents**")
+                    st.dataframe(pd.DataFrame(stats['performance_plus_lents']), hide_index=True, use_container_width=True)
+
+
+        # --- Section Téléchargement ---
+        zip_path_final = st.session_state.get('zip_path')
+        excel_path_final = st.session_state.get('excel_path')
+
+        if zip_path_final and os.path.exists(zip_path_final):
+            st.divider()
+            st.subheader("3. Télécharger les résultats")
+            col_dl1, col_dl2 = st.columns(2) # Deux colonnes pour les boutons
+
+            with col_dl1:
+                bouton_telechargement(
+                    zip_path_final,
                     label="📥 Télécharger l'Archive ZIP (PDFs + Excel)",
-                    data=fp_zip,
                     file_name="rapports_greenprime_traites.zip", # Nom de fichier personnalisé
                     mime="application/zip",
                     use_container_width=True,
                     type="primary"
                 )
 
-        # Optionnel: Bouton séparé pour l'Excel si généré
-        if excel_path_final and os.path.exists(excel_path_final):
-             with col_dl2:
-                  with open(excel_path_final, "rb") as fp_excel:
-                     st.download_button(
+            # Optionnel: Bouton séparé pour l'Excel si généré
+            if excel_path_final and os.path.exists(excel_path_final):
+                 with col_dl2:
+                     bouton_telechargement(
+                         excel_path_final,
                          label="📊 Télécharger Fichier Excel seul",
-                         data=fp_excel,
                          file_name="recapitulatif_controles_greenprime.xlsx",
                          mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
                          use_container_width=True
                      )
-        elif st.session_state.get('all_extracted_data'): # Si on a extrait des données mais l'excel a échoué
-             with col_dl2:
-                 st.warning("Le fichier Excel n'a pas pu être généré ou inclus dans le ZIP.")
+            elif st.session_state.get('nb_lignes_extraites'): # Si on a extrait des données mais l'excel a échoué
+                 with col_dl2:
+                     st.warning("Le fichier Excel n'a pas pu être généré ou inclus dans le ZIP.")
+
+
+        elif st.session_state['processing_done']:
+            # Afficher un message si le traitement est fini mais rien à télécharger
+            st.info("ℹ️ Aucun fichier n'a été traité avec succès ou aucune donnée n'a été extraite. Aucun fichier à télécharger.")
 
+        # Archive et Excel téléchargés depuis des fichiers temporaires hors session : le gestionnaire de travaux
+        # les supprime quand le travail expire (DUREE_CONSERVATION_RESULTATS), les boutons disparaissent alors
 
-    elif st.session_state['processing_done']:
-        # Afficher un message si le traitement est fini mais rien à télécharger
-        st.info("ℹ️ Aucun fichier n'a été traité avec succès ou aucune donnée n'a été extraite. Aucun fichier à télécharger.")
 
-    # Nettoyage potentiel des fichiers temporaires du state (si nécessaire)
-    # Normalement, les TemporaryDirectory s'en chargent, mais si on stocke des chemins
-    # comme zip_path en dehors, il faudrait les supprimer explicitement après usage
-    # (peut-être à la fin de la session ou au prochain lancement)pip
\ No newline at end of file
+if __name__ == "__main__":
+    afficher_page()